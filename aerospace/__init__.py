@@ -5,11 +5,19 @@ The user specifies the problem through high-level
 Python code.
 """
 # Import only high-level interface.
+import atmosphere
 import balloon
+import catalog
+import flight
 # import const
 # import gas
 # import isa
 # import material
 import platform
 import rocket
+import surrogate
+import sweep
+import telemetry
+import thermal
+import wind
 # import utils
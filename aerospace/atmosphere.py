@@ -0,0 +1,292 @@
+# -*- encoding: utf-8 -*-
+""" Профили атмосферы (данные радиозондирования и пользовательские)
+
+Профиль Profile заменяет модуль isa в моделях (см. BalloonStatic, параметр
+atm): он предоставляет те же функции высоты p, t, a, rho, nu, обратные
+функции h_from_p, h_from_rho, h_from_t и таблицы _h, _p, _t, _a, _rho,
+_nu. Модель атмосферы в моделях пакета - объект с этим интерфейсом:
+таблицы - узлы кусочно-линейной интерполяции функций высоты (_h - высоты
+по возрастанию, м; остальные - значения на этих высотах). Модели читают
+таблицы напрямую: верхнюю высоту модели _h[-1] и наклоны функций по
+высоте (utils.interp_slope) в якобианах BalloonStatic и тепловой модели,
+поэтому функции p, t, a, rho, nu должны интерполировать именно эти
+таблицы. Профиль задаётся давлением и температурой по
+высотам; плотность, скорость звука и вязкость вычисляются по уравнению
+состояния идеального газа и формуле Сазерленда. Выше верхнего уровня
+зондирования профиль по умолчанию продолжается стандартной атмосферой.
+
+Файлы зондирований в текстовом формате (TEXT:LIST архива университета
+Вайоминга: столбцы PRES [гПа], HGHT [м], TEMP [°C], ... шириной 7 символов)
+читаются построчно - iter_soundings(). Функция load_soundings() сохраняет
+разобранные уровни в двоичный кэш, ключ которого - хэш содержимого файла:
+повторная загрузка того же файла не разбирает текст, а отображает массивы
+кэша в память.
+
+Принятые обозначения и размерности - как в модуле isa.
+
+Примеры:
+>>> text = '''
+... 72214 TLH Tallahassee Observations at 12Z 01 Jan 2020
+... -----------------------------------------------------------------------------
+...    PRES   HGHT   TEMP   DWPT   RELH   MIXR   DRCT   SKNT   THTA   THTE   THTV
+...     hPa     m      C      C      %    g/kg    deg   knot     K      K      K
+... -----------------------------------------------------------------------------
+...  1016.0     53   12.4   11.8     96   8.58     40      6  284.4  308.5  285.9
+...  1000.0    188   11.2    9.9     92   7.71     45     11  284.5  306.2  285.8
+...   925.0    843    7.6    3.6     76   5.44     80     13  287.4  303.2  288.4
+...   850.0   1540    6.0  -10.0     31   2.12    235      9  292.9  299.6  293.3
+...   700.0   3106   -3.3  -23.3     20   0.80    250     27  299.5  302.2  299.6
+...   500.0   5700  -20.1  -43.1     11   0.14    260     48  309.3  309.8  309.3
+...   300.0   9390  -45.3                                    322.8         322.8
+... '''
+>>> profiles = list(iter_soundings(text.splitlines()))
+>>> len(profiles)
+1
+>>> atm = profiles[0]
+>>> round(float(atm.p(3106.0)), 1), round(float(atm.t(3106.0)), 2)
+(70000.0, 269.85)
+>>> round(float(atm.rho(53.0)), 4)
+1.2395
+>>> np.round(atm.h_from_p([70000.0, 80000.0]), 1)
+array([3106., 2062.])
+"""
+# Standard libs:
+import hashlib
+import os
+# Site-packages:
+import numpy as np
+# Custom libs:
+import const
+import gas
+import isa
+import utils
+
+# Каталог двоичного кэша зондирований по умолчанию
+CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'aerospace',
+                         'soundings')
+
+# Коэффициенты формулы Сазерленда для динамической вязкости воздуха:
+# mu = C*T^(3/2)/(T + S), Па*с
+_SUTHERLAND_C = 1.458e-6
+_SUTHERLAND_S = 110.4
+# Теплопроводность воздуха: k = k0*(T/273.15)^n, Вт/(м*К)
+_CONDUCTIVITY_0 = 0.0241
+_CONDUCTIVITY_N = 0.81
+
+# Ширина столбца текстового формата зондирования, символов
+_COLUMN_WIDTH = 7
+
+
+class Profile(object):
+    """Профиль атмосферы: давление и температура по высотам"""
+
+    def __init__(self, h, p, t, extend=True):
+        """
+        :param h:      высоты уровней, м
+        :param p:      давление на уровнях, Па
+        :param t:      температура на уровнях, K
+        :param extend: продолжить профиль выше верхнего уровня стандартной
+                       атмосферой (isa), с давлением, согласованным с
+                       профилем на верхнем уровне
+        (уровни могут быть не упорядочены; из уровней с одинаковой высотой
+        используется первый)
+        """
+        object.__init__(self)
+        h, i = np.unique(np.asarray(h, dtype=float), return_index=True)
+        p = np.asarray(p, dtype=float)[i]
+        t = np.asarray(t, dtype=float)[i]
+        if h.size < 2:
+            raise ValueError('atmosphere profile needs at least 2 levels')
+        if extend and h[-1] < isa._h[-1]:
+            upper = isa._h > h[-1]
+            p = np.concatenate(
+                (p, isa._p[upper]*p[-1]/isa.p(h[-1])))
+            t = np.concatenate((t, isa._t[upper]))
+            h = np.concatenate((h, isa._h[upper]))
+        self._h = h
+        self._p = p
+        self._t = t
+        self._rho = p*gas.air.mu/(const.R*t)
+        self._a = np.sqrt(gas.air.k*const.R*t/gas.air.mu)
+        self._nu = viscosity(t)/self._rho
+
+    def p(self, h):
+        return np.interp(h, self._h, self._p)
+
+    def t(self, h):
+        return np.interp(h, self._h, self._t)
+
+    def a(self, h):
+        return np.interp(h, self._h, self._a)
+
+    def rho(self, h):
+        return np.interp(h, self._h, self._rho)
+
+    def nu(self, h):
+        return np.interp(h, self._h, self._nu)
+
+    def h_from_p(self, p):
+        """ Высота по давлению (см. isa.h_from_p) """
+        return utils.interp_inverse(p, self._h, self._p)
+
+    def h_from_rho(self, rho):
+        """ Высота по плотности (см. isa.h_from_rho) """
+        return utils.interp_inverse(rho, self._h, self._rho)
+
+    def h_from_t(self, t):
+        """ Наименьшая высота с температурой t (см. isa.h_from_t) """
+        return utils.interp_inverse(t, self._h, self._t)
+
+
+def viscosity(t):
+    """ Динамическая вязкость воздуха (формула Сазерленда)
+    :param t: температура, K
+    :return:  вязкость, Па*с
+    """
+    return _SUTHERLAND_C*t**1.5/(t + _SUTHERLAND_S)
+
+
+def conductivity(t):
+    """ Теплопроводность воздуха (степенная аппроксимация, 150..400 K)
+    :param t: температура, K
+    :return:  теплопроводность, Вт/(м*К)
+    """
+    return _CONDUCTIVITY_0*(t/273.15)**_CONDUCTIVITY_N
+
+
+def iter_soundings(lines, extend=True):
+    """ Построчный разбор текста зондирований
+
+    Уровни одного зондирования - подряд идущие строки данных; строки
+    заголовков и сведений о станции разделяют зондирования. Уровни без
+    давления, высоты или температуры пропускаются.
+    :param lines:  строки текста (например, открытый файл)
+    :param extend: см. Profile
+    :return:       генератор профилей Profile
+    """
+    for levels in _iter_levels(lines):
+        yield _new_profile(levels, extend)
+
+
+def load_soundings(path, cache_dir=None, extend=True):
+    """ Зондирования из текстового файла с двоичным кэшем
+
+    Уровни всех зондирований файла хранятся в кэше массивом (уровень,
+    [h, p, t]) и массивом границ зондирований; имя файлов кэша - хэш SHA-1
+    содержимого текстового файла. Если кэш для файла уже создан, текст не
+    разбирается, а массивы отображаются в память.
+    :param path:      путь к текстовому файлу зондирований (см.
+                      iter_soundings)
+    :param cache_dir: каталог кэша. По умолчанию - CACHE_DIR
+    :param extend:    см. Profile
+    :return:          последовательность профилей Soundings
+    """
+    if cache_dir is None:
+        cache_dir = CACHE_DIR
+    key = _file_hash(path)
+    levels_path = os.path.join(cache_dir, key + '.levels.npy')
+    bounds_path = os.path.join(cache_dir, key + '.bounds.npy')
+    if not (os.path.exists(levels_path) and os.path.exists(bounds_path)):
+        with open(path) as lines:
+            blocks = [np.array(levels) for levels in _iter_levels(lines)]
+        bounds = np.cumsum([0] + [len(levels) for levels in blocks])
+        if blocks:
+            levels = np.concatenate(blocks)
+        else:
+            levels = np.empty((0, 3))
+        try:
+            os.makedirs(cache_dir)
+        except OSError:
+            if not os.path.isdir(cache_dir):
+                raise
+        # Each file is renamed into place only when completely written, so
+        # an interrupted run never leaves a truncated cache
+        _save_atomic(levels_path, levels)
+        _save_atomic(bounds_path, bounds)
+    return Soundings(np.load(levels_path, mmap_mode='r'),
+                     np.load(bounds_path), extend)
+
+
+class Soundings(object):
+    """Последовательность профилей зондирований, создаваемых при обращении
+    по индексу из общего массива уровней (см. load_soundings)"""
+
+    def __init__(self, levels, bounds, extend=True):
+        """
+        :param levels: массив уровней (уровень, [h, p, t])
+        :param bounds: индексы границ зондирований в массиве уровней
+        :param extend: см. Profile
+        """
+        object.__init__(self)
+        self._levels = levels
+        self._bounds = bounds
+        self._extend = extend
+
+    def __len__(self):
+        return len(self._bounds) - 1
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('sounding index out of range')
+        start, stop = self._bounds[index], self._bounds[index + 1]
+        return _new_profile(self._levels[start:stop], self._extend)
+
+
+def _iter_levels(lines):
+    """ Генератор списков уровней [h, p, t] (м, Па, K) зондирований """
+    levels = []
+    for line in lines:
+        level = _parse_level(line)
+        if level is not None:
+            if level:
+                levels.append(level)
+        elif levels:
+            yield levels
+            levels = []
+    if levels:
+        yield levels
+
+
+def _parse_level(line):
+    """ Уровень [h, p, t] из строки данных; [] - уровень без давления,
+    высоты или температуры; None - строка не является строкой данных """
+    fields = []
+    for i in range(3):
+        field = line[i*_COLUMN_WIDTH:(i + 1)*_COLUMN_WIDTH]
+        try:
+            fields.append(float(field))
+        except ValueError:
+            if i == 0 or field.strip():
+                return None
+            return []
+    pres, hght, temp = fields
+    return [hght, pres*100.0, temp + 273.15]
+
+
+def _new_profile(levels, extend):
+    levels = np.asarray(levels, dtype=float)
+    return Profile(levels[:, 0], levels[:, 1], levels[:, 2], extend)
+
+
+def _file_hash(path, chunk_size=1 << 20):
+    sha1 = hashlib.sha1()
+    with open(path, 'rb') as stream:
+        for chunk in iter(lambda: stream.read(chunk_size), b''):
+            sha1.update(chunk)
+    return sha1.hexdigest()
+
+
+def _save_atomic(path, array):
+    tmp_path = '{0}.{1}.tmp'.format(path, os.getpid())
+    with open(tmp_path, 'wb') as stream:
+        np.save(stream, array)
+    if os.name == 'nt' and os.path.exists(path):
+        os.remove(path)
+    os.rename(tmp_path, path)
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
@@ -6,7 +6,6 @@
 # Standard libs:
 from __future__ import print_function
 import importlib
-import math
 import sys
 import warnings
 # Site-packages:
@@ -15,12 +14,48 @@ import matplotlib.pyplot as plt
 import numpy as np
 import odespy
 # Custom libs:
+from calllog import log
 import const
 import gas
+import integrate
 import material
 import isa
 import utils
 
+# Наибольшая скорость шара, для которой применима формула сопротивления
+# воздуха (сжимаемость воздуха не учитывается), м/с
+_VEL_MAX = 150.0
+# Диапазон чисел Рейнольдса таблицы коэффициента сопротивления сферы
+_RE_MIN = 1e-2
+_RE_MAX = 1e7
+# Выданные предупреждения о выходе из диапазона применения моделей
+_warned = set()
+
+
+def sphere_cx(re):
+    """ Коэффициент лобового сопротивления гладкой сферы по числу Рейнольдса
+    (аппроксимация F. A. Morrison, 2013: от ползущего течения (cx=24/Re) до
+    кризиса сопротивления, Re <= 10^6)
+    :param re: число Рейнольдса по диаметру сферы (число или массив)
+    :return:   коэффициент лобового сопротивления
+
+    >>> np.round(sphere_cx([1.0, 1e3, 1e5, 4e5]), 3)
+    array([24.673,  0.484,  0.426,  0.093])
+    """
+    re = np.asarray(re, dtype=float)
+    crisis = re/2.63e5
+    return (24.0/re + 2.6*(re/5.0)/(1.0 + (re/5.0)**1.52) +
+            0.411*crisis**-7.94/(1.0 + crisis**-8.0) +
+            0.25*(re/1e6)/(1.0 + re/1e6))
+
+
+def _warn(key, message):
+    """ Предупреждение о выходе из диапазона применения модели - однократно
+    за сеанс для каждого ключа key """
+    if key not in _warned:
+        _warned.add(key)
+        warnings.warn(message, stacklevel=3)
+
 
 class BalloonStatic(object):
     """Класс описывающий состояние метеошара в некоторый момент времени
@@ -58,11 +93,16 @@ class BalloonStatic(object):
     0.006073078679838702
     """
 
-    _cx = 0.5  # коэффициент лобового сопротивления сферы
+    # Коэффициент лобового сопротивления: None - сферы по числу Рейнольдса
+    # (таблица _cx_table)
+    _cx = None
+    # Таблица коэффициента сопротивления сферы: (lg(Re), cx)
+    _cx_table = (np.linspace(np.log10(_RE_MIN), np.log10(_RE_MAX), 901),)
+    _cx_table += (sphere_cx(10.0**_cx_table[0]),)
 
     def __init__(self, bal_mat, bal_mass,
                  gas, gas_mass=None,
-                 bal_rad=None, bal_diam=None):
+                 bal_rad=None, bal_diam=None, atm=None, cx=None):
         """
         :param bal_mat:  Материал оболочки: константа <material>
                          например:
@@ -76,12 +116,24 @@ class BalloonStatic(object):
         :param bal_rad:  начальный радиус (в состоянии без растяжения), м
         :param bal_diam: начальный диаметр (в состоянии без растяжения), м
                          (указывать только r0 или d0)
+        :param atm:      модель атмосферы: модуль isa (по умолчанию) или
+                         профиль atmosphere.Profile (объект с функциями
+                         p, t, rho, nu высоты и их таблицами _h, _p, _t,
+                         _rho, _nu - см. модуль <atmosphere>)
+        :param cx:       постоянный коэффициент лобового сопротивления
+                         шара. По умолчанию - коэффициент сферы по числу
+                         Рейнольдса, не меньший cx_min материала оболочки
+                         (см. get_cx)
+
+        Параметры bal_mass, gas_mass, bal_rad, bal_diam могут быть массивами
+        numpy одинаковой формы - тогда объект описывает группу шаров
+        (по элементу на шар), а методы возвращают массивы.
         """
         object.__init__(self)
 
-        if bal_rad and not bal_diam:
+        if bal_rad is not None and bal_diam is None:
             self._r0 = bal_rad
-        elif bal_diam and not bal_rad:
+        elif bal_diam is not None and bal_rad is None:
             self._r0 = bal_diam/2.0
         else:
             raise TypeError(
@@ -90,18 +142,82 @@ class BalloonStatic(object):
 
         self._bal_mass = bal_mass
         self._bal_mat = importlib.import_module(bal_mat)
+        self._atm = isa if atm is None else atm
+        if cx is not None:
+            self._cx = cx
 
         self._gas = importlib.import_module(gas)
-        if not gas_mass:
+        if gas_mass is None:
             alt = 0.0
             vol = 4.0/3.0*const.pi*self.r0**3.0
-            gas_mass = self.gas.mu * isa.p(alt) * vol / (const.R * isa.t(alt))
+            gas_mass = self.gas.mu * self.atm.p(alt) * vol / \
+                (const.R * self.atm.t(alt))
         self.gas_mass = gas_mass
 
     @property
     def cx(self):
+        """Постоянный коэффициент сопротивления (None - по числу Рейнольдса)"""
         return self._cx
 
+    def get_cx(self, alt, vel, temp=None):
+        """ Коэффициент лобового сопротивления шара: постоянный (параметр
+        cx) или сферы по числу Рейнольдса Re = |v|*D/nu (интерполяция
+        таблицы _cx_table по lg(Re); вне таблицы - значение на её границе),
+        ограниченный снизу значением cx_min материала оболочки. Оболочка
+        шара - не гладкая сфера (неровности, деформация в потоке), и
+        коэффициент гладкой сферы после кризиса сопротивления (до 0.09 при
+        Re = 3*10^5...10^6 - у земли при скорости подъёма 2-7 м/с) для неё
+        занижен. С ограничением cx_min материала rubber сопротивление
+        монотонно по скорости, и установившаяся скорость (get_ascent_rate)
+        единственна
+        :param alt:  высота над уровнем моря, м
+        :param vel:  вертикальная скорость, м/с
+        :param temp: температура газа в шаре, К. Если не указана, то
+                     принимается равной температуре окружающей среды на высоте
+        :return:     коэффициент лобового сопротивления
+
+        >>> balloon = BalloonStatic(bal_mass=3.0,
+        ...                         bal_mat=material.RUBBER,
+        ...                         gas=gas.HELIUM,
+        ...                         bal_diam=2.164)
+        >>> np.round(balloon.get_cx(0.0, [0.5, 5.0]), 3)
+        array([0.416, 0.35 ])
+        """
+        return self._get_cx(alt, np.abs(vel), self.get_radius(alt, temp))
+
+    def _get_cx(self, alt, vel_abs, rad):
+        """ Коэффициент лобового сопротивления по модулю скорости и радиусу
+        шара """
+        if self._cx is not None:
+            return self._cx
+        lg_re = self._get_lg_reynolds(alt, vel_abs, rad)
+        return np.maximum(np.interp(lg_re, *self._cx_table),
+                          self.bal_mat.cx_min)
+
+    def _get_cx_log_slope(self, alt, vel_abs, rad):
+        """ Производная логарифма коэффициента сопротивления по логарифму
+        числа Рейнольдса (0 - постоянный коэффициент) """
+        if self._cx is not None:
+            return 0.0
+        lg_re = self._get_lg_reynolds(alt, vel_abs, rad)
+        cx = np.interp(lg_re, *self._cx_table)
+        return np.where(cx > self.bal_mat.cx_min,
+                        utils.interp_slope(lg_re, *self._cx_table) /
+                        (cx*np.log(10.0)),
+                        0.0)[()]
+
+    def _get_lg_reynolds(self, alt, vel_abs, rad):
+        """ Десятичный логарифм числа Рейнольдса шара """
+        re = 2.0*rad*vel_abs/self.atm.nu(alt)
+        if 'reynolds' not in _warned and np.any(re > _RE_MAX):
+            _warn('reynolds',
+                  u"Число Рейнольдса {0:.3g} вне таблицы коэффициента "
+                  u"сопротивления сферы (Re <= {1:.0e}): принято "
+                  u"сопротивление при Re = {1:.0e}".format(np.max(re),
+                                                          _RE_MAX))
+        with np.errstate(divide='ignore'):
+            return np.log10(re)
+
     @property
     def r0(self):
         return self._r0
@@ -122,6 +238,10 @@ class BalloonStatic(object):
     def gas(self):
         return self._gas
 
+    @property
+    def atm(self):
+        return self._atm
+
     def get_volume(self, alt, temp=None):
         """Объём метеошара в указанном аргументами состоянии
         Параметры состояния:
@@ -130,9 +250,9 @@ class BalloonStatic(object):
                       принимается равной температуре окружающей среды на высоте
         :return:      Объём метеошара, м3
         """
-        if not temp:
-            temp = isa.t(alt)
-        press = isa.p(alt)
+        if temp is None:
+            temp = self.atm.t(alt)
+        press = self.atm.p(alt)
         # Объём газа в шаре при атмосферном давлении на высоте alt
         vol = self.gas_mass * const.R * temp / (self.gas.mu * press)
         return vol
@@ -171,6 +291,55 @@ class BalloonStatic(object):
         rel_strain = self.get_rel_strain(alt, temp)
         return rel_strain > self.bal_mat.rel_strain_max
 
+    def get_burst_alt(self, temp=None):
+        """ Высота разрыва шара: относительная деформация достигает предела
+        rel_strain_max материала оболочки
+        :param temp: температура газа в шаре, К. Если не указана, то
+                     принимается равной температуре окружающей среды на высоте
+        :return:     высота разрыва, м; NaN если шар не разрывается в пределах
+                     таблицы атмосферы
+
+        >>> balloon = BalloonStatic(bal_mass=3.0,
+        ...                         bal_mat=material.RUBBER,
+        ...                         gas=gas.HELIUM,
+        ...                         bal_diam=2.164)
+        >>> round(balloon.get_burst_alt())
+        37903.0
+        """
+        strain_max = self.bal_mat.rel_strain_max
+        shape = np.broadcast(self.r0, self.gas_mass).shape
+        alt = utils.bisect(
+            lambda alt: self.get_rel_strain(alt, temp) - strain_max,
+            np.zeros(shape), self.atm._h[-1], xtol=1e-3)
+        is_burst_at_ground = self.get_rel_strain(0.0, temp) >= strain_max
+        return np.where(is_burst_at_ground, 0.0, alt)[()]
+
+    def get_ascent_rate(self, alt, payload=0.0, temp=None):
+        """ Установившаяся вертикальная скорость шара с нагрузкой (сумма сил
+        равна нулю)
+        :param alt:     высота над уровнем моря, м
+        :param payload: полезная нагрузка, кг
+        :param temp:    температура газа в шаре, К. Если не указана, то
+                        принимается равной температуре окружающей среды на
+                        высоте
+        :return:        скорость, м/с (положительная - подъём); NaN вне
+                        диапазона применения формулы сопротивления
+                        (|v| > 150 м/с)
+
+        >>> balloon = BalloonStatic(bal_mass=3.0,
+        ...                         bal_mat=material.RUBBER,
+        ...                         gas=gas.HELIUM,
+        ...                         bal_diam=2.164)
+        >>> round(balloon.get_ascent_rate(alt=0.0, payload=1.05), 2)
+        4.39
+        """
+        shape = np.broadcast(alt, payload, self.r0, self.gas_mass,
+                             self.bal_mass).shape
+        return utils.bisect(
+            lambda vel: (self.get_forces_sum(alt, vel, temp) -
+                         payload*const.g),
+            np.full(shape, -_VEL_MAX), _VEL_MAX, xtol=1e-6)
+
     def get_rel_strain(self, alt, temp=None):
         """ Относительная деформация e=dL/L """
         diam = self.get_diam(alt, temp)
@@ -190,7 +359,7 @@ class BalloonStatic(object):
                      принимается равной температуре окружающей среды на высоте
         :return:     сила Архимеда, Н
         """
-        f_arch = isa.rho(alt) * const.g * self.get_volume(alt, temp)
+        f_arch = self.atm.rho(alt) * const.g * self.get_volume(alt, temp)
         return f_arch
 
     def get_force_air_resistance(self, alt, vel, temp=None):
@@ -202,19 +371,18 @@ class BalloonStatic(object):
                       принимается равной температуре окружающей среды на высоте
         :return:      сила воздушного сопротивления, Н
         """
-        if abs(vel) > 150.0:
-            warnings.warn(
-                u"Скорость {0} м/с вне диапазона применения для "
-                u"используемой формулы сопротивления воздуха (не применима "
-                u"для скоростей близких к скорости звука)".format(vel))
-        if abs(vel) < 1.0:
-            n = 1.0
-        else:
-            n = 2.0
-        f_res = self.cx * isa.rho(alt)*abs(vel)**n/2.0 * \
-            (const.pi*self.get_radius(alt, temp)**2.0)
+        vel_abs = np.abs(vel)
+        if 'vel' not in _warned and np.any(vel_abs > _VEL_MAX):
+            _warn('vel',
+                  u"Скорость {0} м/с вне диапазона применения для "
+                  u"используемой формулы сопротивления воздуха (не применима "
+                  u"для скоростей близких к скорости звука)".format(
+                      np.max(vel_abs)))
+        rad = self.get_radius(alt, temp)
+        f_res = self._get_cx(alt, vel_abs, rad) * \
+            self.atm.rho(alt)*vel_abs**2.0/2.0 * (const.pi*rad**2.0)
         # Установить знак противоположный направлению движения
-        f_res = - math.copysign(f_res, vel)
+        f_res = - np.copysign(f_res, vel)
         return f_res
 
     def get_forces_sum(self, alt, vel=0.0, temp=None, is_burst=False):
@@ -225,18 +393,86 @@ class BalloonStatic(object):
         :param temp:  температура газа в шаре, К. Если не указана, то
                       принимается равной температуре окружающей среды на высоте
         :param is_burst:  состояние шара: True - шар взорвался, иначе False
+                          (для массива шаров - массив состояний)
         :return:      сила, Н
         """
+        is_intact = np.logical_not(is_burst)
         f_sum = 0.0
-        f_gravity = -(self.bal_mass + self.gas_mass*(not is_burst)) * const.g
+        f_gravity = -(self.bal_mass + self.gas_mass*is_intact) * const.g
         f_sum += f_gravity
-        if not is_burst:
+        if np.any(is_intact):
             f_archimedes = self.get_force_archimedes(alt, temp)
             f_resistance = self.get_force_air_resistance(alt, vel, temp)
-            f_sum += f_archimedes
-            f_sum += f_resistance
+            f_sum += is_intact*(f_archimedes + f_resistance)
         return f_sum
 
+    def get_forces_jacobian(self, alt, vel=0.0, temp=None):
+        """ Производные суммы сил, действующих на целый шар (см.
+        get_forces_sum), по состоянию и параметрам шара
+        :param alt:   высота над уровнем моря, м
+        :param vel:   вертикальная скорость, м/с
+        :param temp:  температура газа в шаре, К. Если не указана, то
+                      принимается равной температуре окружающей среды на высоте
+        :return:      словарь производных, Н/[ед. изм.]: 'alt', 'vel' - по
+                      высоте и скорости; 'cx' - по добавке к
+                      коэффициенту лобового сопротивления; 'gas_mass' - по
+                      массе газа
+
+        >>> balloon = BalloonStatic(bal_mass=3.0,
+        ...                         bal_mat=material.RUBBER,
+        ...                         gas=gas.HELIUM,
+        ...                         bal_diam=2.164)
+        >>> jac = balloon.get_forces_jacobian(alt=1000.0, vel=5.0)
+        >>> round(jac['vel'], 3), round(jac['gas_mass'], 2)
+        (-7.634, 47.03)
+
+        # Производная по массе газа и центральная разность суммы сил при
+        # скорости, на которой cx зависит от числа Рейнольдса
+        >>> def forces_sum(gas_mass):
+        ...     return BalloonStatic(bal_mass=3.0, bal_mat=material.RUBBER,
+        ...                          gas=gas.HELIUM, gas_mass=gas_mass,
+        ...                          bal_diam=2.164).get_forces_sum(1250.0,
+        ...                                                         1.5)
+        >>> jac = balloon.get_forces_jacobian(alt=1250.0, vel=1.5)
+        >>> dm = 1e-6
+        >>> diff = (forces_sum(balloon.gas_mass + dm) -
+        ...         forces_sum(balloon.gas_mass - dm))/(2.0*dm)
+        >>> bool(abs(jac['gas_mass'] - diff) < 1e-5)
+        True
+        """
+        atm = self.atm
+        rho = atm.rho(alt)
+        drho = utils.interp_slope(alt, atm._h, atm._rho)
+        dlnv = self._get_volume_log_slope(alt, temp)
+        f_arch = self.get_force_archimedes(alt, temp)
+        f_res = self.get_force_air_resistance(alt, vel, temp)
+        vel_abs = np.abs(vel)
+        rad = self.get_radius(alt, temp)
+        cx = self._get_cx(alt, vel_abs, rad)
+        # Re = |v|*D/nu: производные cx по высоте и скорости
+        dlncx = self._get_cx_log_slope(alt, vel_abs, rad)
+        dlnre = dlnv/3.0
+        if self._cx is None:
+            dlnre = dlnre - \
+                utils.interp_slope(alt, atm._h, atm._nu)/atm.nu(alt)
+        return {
+            'alt': (f_arch*(drho/rho + dlnv) +
+                    f_res*(drho/rho + 2.0/3.0*dlnv + dlncx*dlnre)),
+            'vel': -cx*rho*vel_abs*(2.0 + dlncx)/2.0 * (const.pi*rad**2.0),
+            'cx': f_res/cx,
+            # Re ~ D ~ gas_mass**(1/3)
+            'gas_mass': ((f_arch + (2.0 + dlncx)/3.0*f_res)/self.gas_mass -
+                         const.g),
+        }
+
+    def _get_volume_log_slope(self, alt, temp=None):
+        """ Производная логарифма объёма шара по высоте, 1/м """
+        atm = self.atm
+        dlnv = -utils.interp_slope(alt, atm._h, atm._p)/atm.p(alt)
+        if temp is None:
+            dlnv = dlnv + utils.interp_slope(alt, atm._h, atm._t)/atm.t(alt)
+        return dlnv
+
     def get_acceleration(self, alt, vel=0.0, temp=None, is_burst=False):
         """ Ускорение шара
         Положительное значение соответствует направлению набора высоты.
@@ -256,18 +492,570 @@ class BalloonStatic(object):
         :param is_burst:  состояние шара: True - шар взорвался, иначе False
         :return:          масса шара и газа в нём, м/с^2
         """
-        mass = self.bal_mass
-        if not is_burst:
-            mass += self.gas_mass
+        mass = self.bal_mass + self.gas_mass*np.logical_not(is_burst)
         return mass
 
 
+def solve_gas_mass_for_burst_alt(bal_diam, burst_alt,
+                                 bal_mat='rubber', bal_gas='helium',
+                                 atm=None):
+    """ Масса газа, при которой шар разрывается на заданной высоте
+
+    По статической модели (см. BalloonStatic.is_burst) высота разрыва
+    определяется только массой газа и не зависит от полезной нагрузки:
+    объём разрыва - объём сферы диаметром bal_diam*(1+rel_strain_max).
+    Нагрузку для заданной скорости подъёма при найденной массе газа даёт
+    solve_payload_for_ascent_rate().
+    :param bal_diam:  диаметр метеошара в состоянии без растяжения, м
+    :param burst_alt: высота разрыва, м
+    :param bal_mat:   наименование материала метеошара (см пакет <material>)
+    :param bal_gas:   наименование наполняющего газа (см пакет <gas>)
+    :param atm:       модель атмосферы (см. BalloonStatic). По умолчанию -
+                      isa
+    :return:          масса газа, кг
+    (параметры - числа или массивы, согласуемые по правилам broadcasting)
+
+    >>> round(solve_gas_mass_for_burst_alt(bal_diam=2.164,
+    ...                                    burst_alt=30000.0), 4)
+    3.051
+    """
+    bal_mat = importlib.import_module(material.BY_NAME[bal_mat])
+    bal_gas = importlib.import_module(gas.BY_NAME[bal_gas])
+    if atm is None:
+        atm = isa
+    burst_diam = np.asarray(bal_diam)*(1.0 + bal_mat.rel_strain_max)
+    vol = const.pi/6.0*burst_diam**3.0
+    return bal_gas.mu*atm.p(burst_alt)*vol/(const.R*atm.t(burst_alt))
+
+
+def solve_payload_for_ascent_rate(bal_mass, bal_diam, ascent_rate,
+                                  gas_mass=None, alt=0.0,
+                                  bal_mat='rubber', bal_gas='helium',
+                                  atm=None):
+    """ Полезная нагрузка, при которой шар поднимается с заданной
+    установившейся скоростью (равенство подъёмной силы сумме веса и
+    сопротивления воздуха)
+    :param bal_mass:    масса метеошара, кг
+    :param bal_diam:    диаметр метеошара в состоянии без растяжения, м
+    :param ascent_rate: скорость подъёма, м/с
+    :param gas_mass:    масса газа, кг. По умолчанию - по заполнению шара
+                        на высоте H=0
+    :param alt:         высота, на которой задана скорость, м
+    :param bal_mat:     наименование материала метеошара
+    :param bal_gas:     наименование наполняющего газа
+    :param atm:         модель атмосферы (см. BalloonStatic)
+    :return:            масса нагрузки, кг. Отрицательное значение - шар не
+                        достигает такой скорости даже без нагрузки
+    (параметры - числа или массивы, согласуемые по правилам broadcasting)
+
+    >>> round(solve_payload_for_ascent_rate(bal_mass=3.0, bal_diam=2.164,
+    ...                                     ascent_rate=3.0), 3)
+    1.878
+    """
+    balloon = _new_balloon(bal_mass, bal_diam, gas_mass, bal_mat, bal_gas,
+                           atm)
+    return balloon.get_forces_sum(alt, ascent_rate)/const.g
+
+
+def solve_gas_mass_for_ascent_rate(bal_mass, bal_diam, ascent_rate,
+                                   payload=0.0, alt=0.0,
+                                   bal_mat='rubber', bal_gas='helium',
+                                   atm=None):
+    """ Масса газа, при которой шар с нагрузкой поднимается с заданной
+    установившейся скоростью
+    :param bal_mass:    масса метеошара, кг
+    :param bal_diam:    диаметр метеошара в состоянии без растяжения, м
+    :param ascent_rate: скорость подъёма, м/с
+    :param payload:     полезная нагрузка, кг
+    :param alt:         высота, на которой задана скорость, м
+    :param bal_mat:     наименование материала метеошара
+    :param bal_gas:     наименование наполняющего газа
+    :param atm:         модель атмосферы (см. BalloonStatic)
+    :return:            масса газа, кг
+    (параметры - числа или массивы, согласуемые по правилам broadcasting)
+
+    >>> round(solve_gas_mass_for_ascent_rate(bal_mass=3.0, bal_diam=2.164,
+    ...                                      ascent_rate=5.0,
+    ...                                      payload=1.05), 4)
+    0.994
+    """
+    bal_mass, bal_diam, ascent_rate, payload, alt = np.broadcast_arrays(
+        bal_mass, bal_diam, ascent_rate, payload, alt)
+
+    def excess_payload(gas_mass):
+        balloon = _new_balloon(bal_mass, bal_diam, gas_mass, bal_mat,
+                               bal_gas, atm)
+        return balloon.get_forces_sum(alt, ascent_rate)/const.g - payload
+
+    # Upper bound: lift of gas grows faster than drag, so doubling of the
+    # gas mass brackets the root in a few steps
+    upper = np.maximum(bal_mass + payload, 1e-3).astype(float)
+    for _ in range(64):
+        is_short = excess_payload(upper) <= 0
+        if not np.any(is_short):
+            break
+        upper = np.where(is_short, 2.0*upper, upper)
+    return utils.bisect(excess_payload, np.zeros_like(upper), upper,
+                        xtol=1e-9)
+
+
+def simulate_free_lift(duration, bal_mass, bal_diam, payload=0.0,
+                       gas_mass=None, bal_mat='rubber', bal_gas='helium',
+                       tstep=1.0, alt_levels=None, atm=None,
+                       sensitivity=False, memory_limit=None,
+                       dtype=np.float64):
+    """ Моделирование свободного подъёма набора шаров с полезной нагрузкой
+
+    Векторный вариант model_free_lift(): все сочетания параметров (члены
+    набора) интегрируются одновременно методом Рунге-Кутты 4 порядка с
+    шагом tstep. Член набора останавливается в первой точке, где шар
+    взорвался (как в model_free_lift), или при падении на землю.
+    ---------------------------------------------------------------------------
+    :param duration:   продолжительность моделируемого процесса, с
+    :param bal_mass:   масса метеошара, кг
+    :param bal_diam:   диаметр метеошара в состоянии без растяжения, м
+    :param payload:    полезная нагрузка, кг
+    :param gas_mass:   масса газа, кг. По умолчанию - по заполнению шара на
+                       высоте H=0
+    :param bal_mat:    наименование материала метеошара
+    :param bal_gas:    наименование наполняющего газа
+    :param tstep:      шаг интегрирования, с
+    :param alt_levels: высоты, м (по возрастанию), на которых записывается
+                       скорость подъёма (по умолчанию не записывается)
+    :param atm:        модель атмосферы (см. BalloonStatic)
+    :param sensitivity: интегрировать вместе с траекторией уравнения
+                       чувствительности (производных высоты и скорости по
+                       параметрам SENSITIVITY_PARAMS) и рассчитать
+                       производные момента и высоты разрыва
+    :param memory_limit: предел памяти на интегрирование, байт: набор
+                       рассчитывается частями (см. iter_free_lift). По
+                       умолчанию - весь набор одной частью
+    :param dtype:      тип данных состояния и результатов: np.float64 или
+                       np.float32 (см. iter_free_lift)
+    (bal_mass, bal_diam, payload, gas_mass - числа или массивы,
+    согласуемые по правилам broadcasting; форма результата - их общая форма)
+    ---------------------------------------------------------------------------
+    :return:           словарь массивов:
+                       'burst_time' - время разрыва шара, с;
+                       'burst_alt' - высота разрыва шара, м;
+                       (NaN - шар не взорвался)
+                       'alt_max' - максимальная высота, м
+                       (NaN - скорость превысила 150 м/с: неустойчивость
+                       интегрирования, следует уменьшить шаг tstep);
+                       'ascent_rate' - скорость подъёма на высотах
+                       alt_levels, м/с, форма (len(alt_levels), ...)
+                       (NaN - высота не достигнута);
+                       при sensitivity=True - 'burst_time_grad',
+                       'burst_alt_grad' - словари производных момента и
+                       высоты разрыва по параметрам SENSITIVITY_PARAMS
+                       (момент разрыва - непрерывный, без округления до
+                       шага tstep)
+
+    >>> res = simulate_free_lift(duration=180*60, bal_mass=3.0,
+    ...                          bal_diam=2.164, payload=[0.5, 1.05])
+    >>> res['burst_time']
+    array([5224., 6091.])
+
+    # Пустой набор - пустые массивы результатов
+    >>> simulate_free_lift(duration=60, bal_mass=3.0, bal_diam=2.164,
+    ...                    payload=[])['burst_time']
+    array([], dtype=float64)
+
+    # Производные момента разрыва, с/[ед. изм. параметра]
+    >>> res = simulate_free_lift(duration=180*60, bal_mass=3.0,
+    ...                          bal_diam=2.164, payload=1.05,
+    ...                          sensitivity=True)
+    >>> grad = res['burst_time_grad']
+    >>> int(grad['cx']), int(grad['gas_mass']), int(grad['rel_strain_max'])
+    (8320, -11022, 339)
+    """
+    shape = np.broadcast(bal_mass, bal_diam, payload,
+                         0.0 if gas_mass is None else gas_mass).shape
+    members = int(np.prod(shape))
+    if memory_limit is None:
+        chunk_size = max(members, 1)
+    else:
+        chunk_size = None
+    res = None
+    for start, stop, chunk in iter_free_lift(
+            duration, bal_mass, bal_diam, payload, gas_mass, bal_mat,
+            bal_gas, tstep, alt_levels, atm, sensitivity, memory_limit,
+            dtype, chunk_size):
+        if res is None:
+            res = _map_arrays(
+                lambda value: np.empty(value.shape[:-1] + (members,),
+                                       value.dtype),
+                chunk)
+        _store_chunk(res, chunk, start, stop)
+    return _map_arrays(lambda value: value.reshape(value.shape[:-1] + shape),
+                       res)
+
+
+def iter_free_lift(duration, bal_mass, bal_diam, payload=0.0,
+                   gas_mass=None, bal_mat='rubber', bal_gas='helium',
+                   tstep=1.0, alt_levels=None, atm=None, sensitivity=False,
+                   memory_limit=2**28, dtype=np.float64, chunk_size=None):
+    """ Моделирование свободного подъёма набора шаров по частям
+
+    Набор (сочетания параметров, как в simulate_free_lift) делится на части
+    по числу членов, при котором рабочие массивы интегрирования одной части
+    умещаются в memory_limit; части рассчитываются и выдаются по очереди.
+    Результат части выдаётся до расчёта следующей, поэтому расход памяти не
+    зависит от размера набора (члены набора выбираются из параметров по
+    мере расчёта, параметры-числа и broadcasting не создают массивов
+    размера набора).
+
+    dtype=np.float32 вдвое уменьшает память на член набора (состояние,
+    записи вдоль траекторий и результаты; атмосфера и силы вычисляются с
+    двойной точностью). Округление состояния до одинарной точности может
+    сдвинуть разрыв на соседний узел шага: момент разрыва - не более чем на
+    tstep, высоту - на подъём за шаг (до 5 м при tstep=1 с, в среднем
+    смещение менее 1 мм), т.е. в пределах погрешности самого шага.
+    ---------------------------------------------------------------------------
+    :param duration ... sensitivity: см. simulate_free_lift
+    :param memory_limit: предел памяти на интегрирование одной части, байт
+    :param dtype:      тип данных состояния и результатов: np.float64 или
+                       np.float32
+    :param chunk_size: число членов набора в части (вместо расчёта по
+                       memory_limit)
+    ---------------------------------------------------------------------------
+    :return:           генератор кортежей (start, stop, res): члены набора
+                       start:stop (номера в порядке numpy.ravel общей формы
+                       параметров) и словарь их результатов, как в
+                       simulate_free_lift, с последней осью по членам части
+
+    >>> chunks = iter_free_lift(duration=180*60, bal_mass=3.0,
+    ...                         bal_diam=2.164, payload=[0.5, 1.05, 1.5],
+    ...                         chunk_size=2, dtype=np.float32)
+    >>> [(start, stop, res['burst_time']) for start, stop, res in chunks]
+    [(0, 2, array([5224., 6091.], dtype=float32)), (2, 3, array([7254.], dtype=float32))]
+    """
+    dtype = np.dtype(dtype)
+    shape = np.broadcast(bal_mass, bal_diam, payload,
+                         0.0 if gas_mass is None else gas_mass).shape
+    members = int(np.prod(shape))
+    if alt_levels is None:
+        alt_levels = []
+    alt_levels = np.asarray(alt_levels, dtype=float)
+    if chunk_size is None:
+        nvars = 2 + 2*len(_TRAJECTORY_PARAMS) if sensitivity else 2
+        member_bytes = dtype.itemsize*(_STATE_ARRAYS*nvars + alt_levels.size +
+                                       _MEMBER_ARRAYS) + \
+            np.dtype(float).itemsize*_WORK_ARRAYS
+        chunk_size = max(int(memory_limit//member_bytes), 1)
+    # Members are taken from the (broadcast) parameters by flat indices
+    members_shape = shape if shape else (1,)
+    # An empty set is one empty part: its results have the shapes of the
+    # result arrays
+    for start in range(0, max(members, 1), chunk_size):
+        stop = min(start + chunk_size, members)
+        index = np.unravel_index(np.arange(start, stop), members_shape)
+
+        def take(value):
+            return np.broadcast_to(value, members_shape)[index].astype(dtype)
+
+        yield start, stop, _simulate_free_lift_chunk(
+            duration, take(bal_mass), take(bal_diam), take(payload),
+            None if gas_mass is None else take(gas_mass),
+            bal_mat, bal_gas, tstep, alt_levels, atm, sensitivity, dtype)
+
+
+def _simulate_free_lift_chunk(duration, bal_mass, bal_diam, payload,
+                              gas_mass, bal_mat, bal_gas, tstep, alt_levels,
+                              atm, sensitivity, dtype):
+    """ Часть набора simulate_free_lift (параметры - одномерные массивы по
+    членам части) """
+    members = bal_mass.size
+    balloon = _new_balloon(bal_mass, bal_diam, gas_mass, bal_mat, bal_gas,
+                           atm)
+    mass = balloon.get_mass() + payload
+    weight_payload = payload*const.g
+
+    def odefun(y, time):
+        alt = y[0]
+        vel = y[1]
+        f_sum = balloon.get_forces_sum(alt, vel) - weight_payload
+        acc = f_sum/mass
+        if not sensitivity:
+            return np.array([vel, acc])
+        # Sensitivity equations dS/dt = df/dy*S + df/dp for every parameter
+        # p the trajectory depends on; S = [d(alt)/dp, d(vel)/dp]
+        jac = balloon.get_forces_jacobian(alt, vel)
+        rows = [vel, acc]
+        for i, name in enumerate(_TRAJECTORY_PARAMS):
+            s_alt, s_vel = y[2 + 2*i:4 + 2*i]
+            s_acc = (jac['alt']*s_alt + jac['vel']*s_vel + jac[name])/mass
+            if name == 'gas_mass':
+                s_acc -= acc/mass
+            rows.extend([s_vel, s_acc])
+        return np.array(rows)
+
+    def terminator(y, t):
+        alt = y[0]
+        vel = y[1]
+        # Stop on burst, on landing and when the integration left the
+        # range of the air resistance formula (step too large for light
+        # balloons with large free lift)
+        return balloon.is_burst(alt) | (alt < 0.0) | \
+            ~(np.abs(vel) <= _VEL_MAX)
+
+    # Records along trajectories
+    alt_max = np.zeros(members, dtype)
+    ascent_rate = np.full((alt_levels.size, members), np.nan, dtype)
+    # Index of the next level to be crossed by each member
+    next_level = np.zeros(members, dtype=int)
+
+    def recorder(y_prev, y, t_prev, t, active):
+        np.maximum(alt_max, y[0], out=alt_max)
+        while alt_levels.size:
+            level = alt_levels[np.minimum(next_level, alt_levels.size - 1)]
+            crossed = np.flatnonzero(active &
+                                     (next_level < alt_levels.size) &
+                                     (y[0] >= level))
+            if not crossed.size:
+                break
+            alt0, vel0 = y_prev[:2, crossed]
+            alt1, vel1 = y[:2, crossed]
+            w = (level[crossed] - alt0)/np.maximum(alt1 - alt0, 1e-12)
+            ascent_rate[next_level[crossed], crossed] = vel0 + w*(vel1 - vel0)
+            next_level[crossed] += 1
+
+    # Шаг детализации процесса по времени, с
+    time_points = np.arange(0, duration, tstep)
+    # Diverged members are detected by terminator()
+    nvars = 2 + 2*len(_TRAJECTORY_PARAMS) if sensitivity else 2
+    with np.errstate(over='ignore', invalid='ignore'):
+        t_stop, y = integrate.rk4(odefun, np.zeros((nvars, members), dtype),
+                                  time_points,
+                                  terminate=terminator, callback=recorder)
+    is_burst = balloon.is_burst(y[0]) & (np.abs(y[1]) <= _VEL_MAX)
+    burst_time = np.where(is_burst, t_stop, np.nan).astype(dtype)
+    burst_alt = np.where(is_burst, y[0], np.nan).astype(dtype)
+    alt_max[~(np.abs(y[1]) <= _VEL_MAX)] = np.nan
+    res = {'burst_time': burst_time,
+           'burst_alt': burst_alt,
+           'alt_max': alt_max,
+           'ascent_rate': ascent_rate}
+    if sensitivity:
+        # Burst altitude h_b solves V(h_b, gas_mass) = V_burst(strain_max):
+        # its derivatives follow from the implicit function theorem. The
+        # burst moment solves alt(t_b, p) = h_b(p):
+        # dt_b/dp = (dh_b/dp - d(alt)/dp)/vel
+        dlnv = balloon._get_volume_log_slope(y[0])
+        strain_max = balloon.bal_mat.rel_strain_max
+        alt_grad = {'cx': np.zeros(members),
+                    'gas_mass': -1.0/(balloon.gas_mass*dlnv),
+                    'rel_strain_max': 3.0/((1.0 + strain_max)*dlnv)}
+        res['burst_alt_grad'] = {}
+        res['burst_time_grad'] = {}
+        for name in SENSITIVITY_PARAMS:
+            s_alt = 0.0
+            if name in _TRAJECTORY_PARAMS:
+                s_alt = y[2 + 2*_TRAJECTORY_PARAMS.index(name)]
+            time_grad = (alt_grad[name] - s_alt)/y[1]
+            res['burst_alt_grad'][name] = np.where(
+                is_burst, alt_grad[name], np.nan).astype(dtype)
+            res['burst_time_grad'][name] = np.where(
+                is_burst, time_grad, np.nan).astype(dtype)
+    return res
+
+
+def _map_arrays(func, res):
+    """ Словарь результатов (с вложенными словарями) с массивами func(a) """
+    return dict((key, _map_arrays(func, value) if isinstance(value, dict)
+                 else func(value))
+                for key, value in res.items())
+
+
+def _store_chunk(res, chunk, start, stop):
+    """ Запись результатов части набора в результаты всего набора """
+    for key, value in chunk.items():
+        if isinstance(value, dict):
+            _store_chunk(res[key], value, start, stop)
+        else:
+            res[key][..., start:stop] = value
+
+
+def sweep_free_lift(bal_mass, bal_diam, payload=0.0, gas_mass=None,
+                    bal_mat='rubber', bal_gas='helium', atm=None,
+                    max_duration=6*60*60, rtol=1e-6, atol=1e-3,
+                    warm_start=True):
+    """ Расчёт разрыва шаров по сетке параметров продолжением по соседним
+    вариантам
+
+    Варианты (сочетания параметров, как в simulate_free_lift)
+    рассчитываются по одному методом с автоматическим выбором шага
+    (integrate.dopri5) до события разрыва, в порядке близости параметров:
+    змейкой по сетке (см. _proximity_order), каждый следующий вариант -
+    соседний узел сетки параметров. При warm_start принятые шаги
+    предыдущего варианта - подсказки шагов следующего (integrate.dopri5,
+    параметр steps): траектории соседних вариантов почти совпадают, и
+    отказы от шагов регулятора и разгон от малого начального шага не
+    повторяются.
+    ---------------------------------------------------------------------------
+    :param bal_mass:     масса метеошара, кг
+    :param bal_diam:     диаметр метеошара в состоянии без растяжения, м
+    :param payload:      полезная нагрузка, кг
+    :param gas_mass:     масса газа, кг. По умолчанию - по заполнению шара
+                         на высоте H=0
+    :param bal_mat:      наименование материала метеошара
+    :param bal_gas:      наименование наполняющего газа
+    :param atm:          модель атмосферы (см. BalloonStatic)
+    :param max_duration: наибольшая продолжительность подъёма, с
+    :param rtol:         относительная допустимая погрешность шага
+    :param atol:         абсолютная допустимая погрешность шага
+    :param warm_start:   продолжение по шагам предыдущего варианта (False -
+                         каждый вариант рассчитывается независимо)
+    (bal_mass, bal_diam, payload, gas_mass - числа или массивы,
+    согласуемые по правилам broadcasting; форма результата - их общая форма)
+    ---------------------------------------------------------------------------
+    :return:             словарь:
+                         'burst_time', 'burst_alt' - момент и высота разрыва
+                         шара (NaN - шар не взорвался);
+                         'nfev' - число вычислений правой части по
+                         вариантам;
+                         'nfev_saved' - оценка сэкономленных вычислений
+                         правой части по вариантам: отказы от шагов,
+                         которых избежал расчёт с подсказками (по 6
+                         вычислений на отказ). Число отказов без подсказок
+                         оценивается по доле отказов среди шагов последнего
+                         варианта, рассчитанного без подсказок (первого в
+                         порядке расчёта); у вариантов без подсказок - 0;
+                         'order' - порядок расчёта вариантов (номера в
+                         порядке numpy.ravel)
+
+    >>> kwargs = dict(bal_mass=3.0, bal_diam=2.164,
+    ...               payload=[1.0, 1.02, 1.01, 1.03])
+    >>> cold = sweep_free_lift(warm_start=False, **kwargs)
+    >>> warm = sweep_free_lift(**kwargs)
+    >>> warm['order']
+    array([0, 2, 1, 3])
+    >>> bool(np.all(np.abs(warm['burst_time'] - cold['burst_time']) < 0.1))
+    True
+    >>> int(warm['nfev_saved'][warm['order'][0]])
+    0
+    >>> saved = (cold['nfev'] - warm['nfev']).sum()
+    >>> bool(abs(warm['nfev_saved'].sum() - saved) < 0.25*saved)
+    True
+    """
+    params = np.broadcast_arrays(bal_mass, bal_diam, payload,
+                                 0.0 if gas_mass is None else gas_mass)
+    shape = params[0].shape
+    bal_mass, bal_diam, payload, gas_mass_flat = (
+        np.asarray(value, dtype=float).ravel() for value in params)
+    members = bal_mass.size
+    order = _proximity_order(np.column_stack((bal_mass, bal_diam, payload,
+                                              gas_mass_flat)))
+    burst_time = np.full(members, np.nan)
+    burst_alt = np.full(members, np.nan)
+    nfev = np.zeros(members, dtype=int)
+    nfev_saved = np.zeros(members, dtype=int)
+    steps = None
+    # Rejected steps per accepted step of a cold start
+    cold_rejection_rate = 0.0
+    for i in order:
+        balloon = _new_balloon(bal_mass[i], bal_diam[i],
+                               None if gas_mass is None else gas_mass_flat[i],
+                               bal_mat, bal_gas, atm)
+        mass = balloon.get_mass() + payload[i]
+        weight_payload = payload[i]*const.g
+        strain_max = balloon.bal_mat.rel_strain_max
+
+        def odefun(y, time):
+            f_sum = balloon.get_forces_sum(y[0], y[1]) - weight_payload
+            return np.array([y[1], f_sum/mass])
+
+        def burst(y, time):
+            return balloon.get_rel_strain(y[0]) - strain_max
+
+        def landing(y, time):
+            return -y[0]
+
+        if odefun(np.zeros(2), 0.0)[1] <= 0.0:
+            # No free lift: the balloon stays on the ground
+            nfev[i] = 1
+            continue
+        t, y, event, nfev[i] = integrate.dopri5(
+            odefun, np.zeros(2), 0.0, max_duration, events=[burst, landing],
+            rtol=rtol, atol=atol, steps=steps)
+        # Every attempted step costs 6 evaluations plus 1 at the start
+        accepted = t.size - 1
+        rejected = (nfev[i] - 1)//6 - accepted
+        if steps is None:
+            cold_rejection_rate = rejected/float(accepted)
+        else:
+            nfev_saved[i] = int(round(
+                6*(cold_rejection_rate*accepted - rejected)))
+        if event == 0:
+            burst_time[i] = t[-1]
+            burst_alt[i] = y[-1, 0]
+        if warm_start and t.size > 2:
+            # The last step is cut by the event
+            steps = (t[:-2], np.diff(t)[:-1])
+    return {'burst_time': burst_time.reshape(shape),
+            'burst_alt': burst_alt.reshape(shape),
+            'nfev': nfev.reshape(shape),
+            'nfev_saved': nfev_saved.reshape(shape),
+            'order': order}
+
+
+def _proximity_order(points):
+    """ Порядок обхода точек (строк массива) змейкой по осям сетки: точки
+    упорядочиваются по значениям столбцов (первый - самая медленная ось),
+    направление обхода оси меняется при каждом шаге по более медленным
+    осям, так что соседние в порядке точки - соседние узлы сетки """
+    keys = []
+    slower = np.zeros(len(points), dtype=int)
+    for column in points.T:
+        values, rank = np.unique(column, return_inverse=True)
+        keys.append(np.where(slower % 2 == 1, values.size - 1 - rank, rank))
+        slower += rank
+    # np.lexsort sorts by the last key first
+    return np.lexsort(keys[::-1])
+
+
+# Параметры, по которым рассчитываются производные результатов
+# simulate_free_lift(sensitivity=True): коэффициент лобового сопротивления
+# шара, масса газа, предел относительной деформации материала оболочки
+SENSITIVITY_PARAMS = ('cx', 'gas_mass', 'rel_strain_max')
+# Параметры, от которых зависит траектория подъёма (предел деформации
+# определяет только момент её окончания)
+_TRAJECTORY_PARAMS = ('cx', 'gas_mass')
+# Оценка памяти на член набора iter_free_lift(), в числе массивов по членам
+# набора (по замерам пикового расхода памяти): стадии rk4 - на переменную
+# состояния; параметры шаров и записи вдоль траекторий - в типе состояния;
+# промежуточные результаты вычисления сил - двойной точности
+_STATE_ARRAYS = 10
+_MEMBER_ARRAYS = 8
+_WORK_ARRAYS = 12
+
+
+def _new_balloon(bal_mass, bal_diam, gas_mass=None,
+                 bal_mat='rubber', bal_gas='helium', atm=None, cx=None):
+    """ Метеошар (или группа шаров) по наименованиям материала и газа """
+    if gas_mass is None:
+        bal_mass, bal_diam = np.broadcast_arrays(bal_mass, bal_diam)
+    else:
+        bal_mass, bal_diam, gas_mass = np.broadcast_arrays(
+            bal_mass, bal_diam, gas_mass)
+        gas_mass = gas_mass[()]
+    return BalloonStatic(bal_mass=bal_mass[()],
+                         bal_diam=bal_diam[()],
+                         gas_mass=gas_mass,
+                         bal_mat=material.BY_NAME[bal_mat],
+                         gas=gas.BY_NAME[bal_gas],
+                         atm=atm,
+                         cx=cx)
+
+
+@log()
 def model_free_lift(duration,
                     bal_mass, bal_diam, bal_mat='rubber',
                     bal_gas='helium',
                     payload=0,
                     plot_show=False, plot_save_as='',
                     show_debug_msg=False,
+                    atm=None,
                     ):
     """ Моделирование процесса свободного подъёма для шара с полезной нагрузкой
 
@@ -288,6 +1076,8 @@ def model_free_lift(duration,
     :param plot_save_as:  путь к сохраняемому файлу графика, с расширением.
                           '' - пустая строка - не сохранять изображение
     :param show_debug_msg: отображать отладочные сообщения выводом print()
+    :param atm:           модель атмосферы: модуль isa (по умолчанию) или
+                          профиль зондирования (см. модуль <atmosphere>)
     ---------------------------------------------------------------------------
     :return:              exit_status:
                           0 - успешное завршение
@@ -314,8 +1104,9 @@ def model_free_lift(duration,
             payload=1.05,
             plot_show=True,
             plot_save_as=doctest.png,
-            show_debug_msg=True)
-    RK4 terminated at t=7018
+            show_debug_msg=True,
+            atm=None)
+    RK4 terminated at t=6091
     Successfull end.
     0
 
@@ -325,7 +1116,7 @@ def model_free_lift(duration,
     ...           'payload': 1.05,
     ...           'plot_save_as': 'doctest.png'}
     >>> model_free_lift(**kwargs)
-    RK4 terminated at t=7018
+    RK4 terminated at t=6091
     0
 
     """
@@ -341,9 +1132,10 @@ def model_free_lift(duration,
                   "        payload={5},\n" \
                   "        plot_show={6},\n" \
                   "        plot_save_as={7},\n" \
-                  "        show_debug_msg={8})".\
+                  "        show_debug_msg={8},\n" \
+                  "        atm={9})".\
             format(duration, bal_mass, bal_diam, bal_mat, bal_gas,
-                   payload, plot_show, plot_save_as, show_debug_msg)
+                   payload, plot_show, plot_save_as, show_debug_msg, atm)
         print(log_msg)
 
     # Create ODE-function for model
@@ -405,7 +1197,8 @@ def model_free_lift(duration,
             bal_mass=bal_mass,
             bal_diam=bal_diam,
             bal_mat=material.BY_NAME[bal_mat],
-            gas=gas.BY_NAME[bal_gas])
+            gas=gas.BY_NAME[bal_gas],
+            atm=atm)
     except Exception as err:
         print(err, file=sys.stderr)
         return 2
@@ -0,0 +1,237 @@
+# -*- encoding: utf-8 -*-
+""" Журнал вызовов функций расчёта
+
+Декоратор log() записывает каждый вызов функции в общий текстовый файл
+журнала: по строке JSON на вызов - момент вызова, процесс, имя функции,
+входные параметры, код завершения (целочисленный результат функции),
+сообщение об исключении и продолжительность расчёта. Журнал ведётся
+только по запросу: файл журнала задаётся параметром path декоратора или
+путём по умолчанию LOG_PATH - переменной окружения AEROSPACE_CALL_LOG
+(или присваиванием calllog.LOG_PATH); по умолчанию журнал не ведётся.
+
+Вызов декорированной функции не ждёт записи файла: строка журнала
+добавляется в очередь в памяти процесса, а фоновый поток раз в
+FLUSH_INTERVAL секунд дописывает накопленные строки в файл одной операцией.
+Запись в файл из нескольких процессов (например, исполнителей
+multiprocessing.Pool) упорядочивается блокировкой файла <журнал>.lock; там
+же файл журнала, превысивший max_bytes, переименовывается в <журнал>.1
+(<журнал>.1 - в <журнал>.2 и т.д. до backup_count копий).
+
+Параметры форматируются (repr) по завершении вызова, поэтому журнал
+содержит их значения на этот момент. Сообщения, выводимые функциями в
+sys.stderr, в журнал не попадают.
+
+Примеры:
+>>> import os, tempfile
+>>> path = os.path.join(tempfile.mkdtemp(), 'calc.log')
+>>> @log(path)
+... def divide(a, b=1.0):
+...     return a/b
+>>> divide(1.0, b=4.0)
+0.25
+>>> flush()
+>>> with open(path) as stream:
+...     record = json.loads(stream.readline())
+>>> record['func'], record['args'], record['kwargs'], record['exit_code']
+(u'divide', [u'1.0'], {u'b': u'4.0'}, None)
+"""
+# Standard libs:
+import atexit
+import collections
+import datetime
+import functools
+import json
+import multiprocessing.util
+import numbers
+import os
+import threading
+import time
+try:
+    import fcntl
+except ImportError:
+    # Windows: no file locks, processes must write separate journals
+    fcntl = None
+
+# Путь к файлу журнала по умолчанию (None - журнал не ведётся)
+LOG_PATH = os.environ.get('AEROSPACE_CALL_LOG') or None
+# Период записи накопленных записей в файл, с
+FLUSH_INTERVAL = 0.1
+
+# Журналы процесса по путям файлов
+_journals = {}
+_journals_lock = threading.Lock()
+
+
+def log(path=None, max_bytes=10*2**20, backup_count=5):
+    """ Декоратор записи вызовов функции в журнал
+    :param path:         путь к файлу журнала. По умолчанию - LOG_PATH на
+                         момент вызова функции
+    :param max_bytes:    размер файла журнала, при превышении которого он
+                         сменяется новым, байт
+    :param backup_count: число хранимых прежних файлов журнала
+    :return:             декоратор
+    """
+    def decorator(func):
+        name = func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            journal_path = LOG_PATH if path is None else path
+            if journal_path is None:
+                return func(*args, **kwargs)
+            start = time.time()
+            try:
+                result = func(*args, **kwargs)
+            except Exception as err:
+                _get_journal(journal_path, max_bytes, backup_count).put(
+                    _format(start, time.time(), name, args, kwargs, None,
+                            err))
+                raise
+            _get_journal(journal_path, max_bytes, backup_count).put(
+                _format(start, time.time(), name, args, kwargs, result,
+                        None))
+            return result
+        return wrapper
+    return decorator
+
+
+def flush():
+    """ Запись в файлы всех накопленных записей журналов процесса """
+    for journal in list(_journals.values()):
+        journal.flush()
+
+
+class _Journal(object):
+    """Очередь записей процесса в один файл журнала с фоновой записью"""
+
+    def __init__(self, path, max_bytes, backup_count):
+        object.__init__(self)
+        self._path = path
+        self._max_bytes = max_bytes
+        self._backup_count = backup_count
+        self._pid = os.getpid()
+        # deque.append() is atomic: callers never wait for the writer
+        self._lines = collections.deque()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='calllog')
+        self._thread.daemon = True
+        self._thread.start()
+
+    @property
+    def pid(self):
+        return self._pid
+
+    def put(self, line):
+        self._lines.append(line)
+
+    def flush(self):
+        if os.getpid() != self._pid:
+            # Copy inherited by a forked process: the parent writes it
+            return
+        with self._lock:
+            lines = []
+            while self._lines:
+                lines.append(self._lines.popleft())
+            if lines:
+                self._write(''.join(lines))
+
+    def close(self):
+        """ Остановка фоновой записи и запись оставшихся записей """
+        if os.getpid() != self._pid:
+            return
+        self._stop.set()
+        if self._thread.is_alive() and \
+                self._thread is not threading.current_thread():
+            self._thread.join()
+        self.flush()
+
+    def _run(self):
+        while not self._stop.wait(FLUSH_INTERVAL):
+            try:
+                self.flush()
+            except (IOError, OSError):
+                # Unwritable journal: records are dropped, the calculations
+                # go on
+                pass
+
+    def _write(self, text):
+        directory = os.path.dirname(self._path)
+        if directory and not os.path.isdir(directory):
+            try:
+                os.makedirs(directory)
+            except OSError:
+                if not os.path.isdir(directory):
+                    raise
+        with open(self._path + '.lock', 'a') as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            if os.path.exists(self._path) and \
+                    os.path.getsize(self._path) >= self._max_bytes:
+                self._rotate()
+            with open(self._path, 'a') as stream:
+                stream.write(text)
+
+    def _rotate(self):
+        for i in range(self._backup_count - 1, 0, -1):
+            older = '{0}.{1}'.format(self._path, i)
+            if os.path.exists(older):
+                _replace(older, '{0}.{1}'.format(self._path, i + 1))
+        if self._backup_count > 0:
+            _replace(self._path, self._path + '.1')
+        else:
+            os.remove(self._path)
+
+
+def _get_journal(path, max_bytes, backup_count):
+    journal = _journals.get(path)
+    if journal is None or journal.pid != os.getpid():
+        with _journals_lock:
+            journal = _journals.get(path)
+            if journal is None or journal.pid != os.getpid():
+                # New journal or a forked process: records queued by the
+                # parent are written by the parent
+                journal = _Journal(path, max_bytes, backup_count)
+                _journals[path] = journal
+                # Workers of multiprocessing exit without atexit handlers
+                multiprocessing.util.Finalize(journal, journal.close,
+                                              exitpriority=0)
+    return journal
+
+
+def _format(start, end, name, args, kwargs, result, err):
+    is_code = isinstance(result, numbers.Integral) and \
+        not isinstance(result, bool)
+    record = collections.OrderedDict((
+        ('time', datetime.datetime.fromtimestamp(start).isoformat()),
+        ('pid', os.getpid()),
+        ('func', name),
+        ('args', [repr(arg) for arg in args]),
+        ('kwargs', dict((key, repr(value))
+                        for key, value in kwargs.items())),
+        ('exit_code', int(result) if is_code else None),
+        ('error', None if err is None else
+         '{0}: {1}'.format(type(err).__name__, err)),
+        ('duration', round(end - start, 6)),
+    ))
+    return json.dumps(record) + '\n'
+
+
+def _replace(src, dst):
+    if os.name == 'nt' and os.path.exists(dst):
+        os.remove(dst)
+    os.rename(src, dst)
+
+
+def _close():
+    # The writer threads are stopped before the interpreter clears modules
+    for journal in list(_journals.values()):
+        journal.close()
+
+
+atexit.register(_close)
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
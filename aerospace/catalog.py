@@ -0,0 +1,279 @@
+# -*- encoding: utf-8 -*-
+""" Каталог метеошаров
+
+Предустановки параметров шаров, именованные по маркам шаров, и
+предварительно рассчитанные таблицы характеристик полёта (высота и время
+разрыва, скорость подъёма по высотам) на сетке масс полезной нагрузки и
+газа. Таблицы рассчитываются один раз функцией build() - при установке
+пакета или командой:
+
+    $ python -m aerospace.catalog
+
+и хранятся в двоичном файле индекса INDEX_PATH в пользовательском кэше
+(команда или первый запрос) или PACKAGE_INDEX_PATH - catalog.npz в
+каталоге пакета (build(PACKAGE_INDEX_PATH) при установке; используется,
+если есть). Индекс хранит подпись модели (signature): индекс,
+рассчитанный по другой модели (таблицы атмосферы, сопротивление шара,
+сетки таблиц), не используется, а рассчитывается заново.
+Запрос к таблицам - интерполяция, без интегрирования траектории.
+
+Примеры:
+>>> sorted(BY_NAME['totex-ta-3000'].items())
+[('bal_diam', 2.167), ('bal_mass', 3.0), ('bal_mat', 'rubber')]
+
+# Предустановка подставляется в функции моделирования
+>>> model_free_lift(duration=180*60, payload=1.05,
+...                 plot_save_as='doctest.png',
+...                 **BY_NAME['totex-ta-3000'])
+RK4 terminated at t=6053
+0
+
+# Характеристики полёта по таблицам
+>>> flight = query('totex-ta-3000', payload=1.05)
+>>> int(round(flight['burst_time'], -1))
+6090
+"""
+# Standard libs:
+from __future__ import print_function
+import hashlib
+import importlib
+import os
+# Site-packages:
+import numpy as np
+# Custom libs:
+from balloon import (BalloonStatic, model_free_lift, simulate_free_lift,
+                     solve_gas_mass_for_burst_alt,
+                     solve_payload_for_ascent_rate, _new_balloon)
+import gas
+import isa
+import material
+
+# Путь к файлу индекса, рассчитанного при установке пакета
+PACKAGE_INDEX_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), 'catalog.npz')
+# Путь к файлу индекса, рассчитываемого при запросе (каталог пакета может
+# быть недоступен для записи)
+INDEX_PATH = os.path.join(os.path.expanduser('~'), '.cache', 'aerospace',
+                          'catalog.npz')
+# Ревизия расчёта таблиц: увеличивается при изменениях модели, не
+# отражённых в данных подписи (см. signature)
+INDEX_REVISION = 1
+
+# Шары Totex серии TA: масса оболочки, г; диаметр разрыва, м
+# (по данным производителя)
+_TOTEX_TA = [
+    (100, 1.96), (200, 3.00), (300, 3.78), (350, 4.12), (450, 4.72),
+    (500, 4.99), (600, 6.02), (700, 6.53), (800, 7.00), (1000, 7.86),
+    (1200, 8.63), (1500, 9.44), (2000, 10.54), (3000, 13.00),
+]
+
+
+def _preset(bal_mass, burst_diam, bal_mat='rubber'):
+    # Диаметр без растяжения - по диаметру разрыва и пределу
+    # относительной деформации материала оболочки
+    mat = importlib.import_module(material.BY_NAME[bal_mat])
+    return {'bal_mass': bal_mass,
+            'bal_diam': round(burst_diam/(1.0 + mat.rel_strain_max), 3),
+            'bal_mat': bal_mat}
+
+
+# Предустановки параметров шаров: словари аргументов функций моделирования
+# (model_free_lift, simulate_free_lift и др.), именованные по маркам шаров
+BY_NAME = dict(
+    ('totex-ta-{0}'.format(grams), _preset(grams/1000.0, burst_diam))
+    for grams, burst_diam in _TOTEX_TA)
+
+# Сетка таблиц индекса (для каждого шара своя)
+# Масса полезной нагрузки относительно наибольшей нагрузки, поднимаемой
+# шаром с наибольшей массой газа со скоростью 1 м/с
+PAYLOAD_RATIO = np.concatenate(([0.0], np.geomspace(0.01, 1.0, 24)))
+# Масса газа задаётся высотой разрыва, которую она даёт по статической
+# модели (BalloonStatic.get_burst_alt), м
+FILL_BURST_ALT = np.linspace(40000.0, 20000.0, 21)
+# Высоты записи скорости подъёма, м
+ALT_LEVELS = np.arange(1000.0, 40001.0, 1000.0)
+
+
+def signature(duration, tstep):
+    """ Подпись модели и сетки таблиц индекса: хэш SHA-1 ревизии
+    INDEX_REVISION, параметров расчёта, шаров каталога, сеток таблиц,
+    таблиц стандартной атмосферы, коэффициента сопротивления шара и
+    свойств оболочки и газа
+    :param duration: продолжительность моделируемого полёта, с
+    :param tstep:    шаг интегрирования, с
+    :return:         строка подписи
+    """
+    rubber = importlib.import_module(material.RUBBER)
+    helium = importlib.import_module(gas.HELIUM)
+    sha1 = hashlib.sha1()
+    sha1.update(repr((INDEX_REVISION, float(duration), float(tstep),
+                      _TOTEX_TA, BalloonStatic._cx,
+                      rubber.rho, rubber.rel_strain_max, rubber.cx_min,
+                      helium.mu)).encode('utf-8'))
+    for table in ((PAYLOAD_RATIO, FILL_BURST_ALT, ALT_LEVELS,
+                   isa._h, isa._p, isa._t, isa._rho, isa._nu) +
+                  tuple(BalloonStatic._cx_table)):
+        sha1.update(np.ascontiguousarray(table, dtype=float).tobytes())
+    return sha1.hexdigest()
+
+
+def build(path=INDEX_PATH, duration=4*60*60, tstep=0.5):
+    """ Расчёт таблиц характеристик полёта для всех шаров каталога
+
+    Все сочетания шаров, нагрузок и масс газа моделируются одним набором
+    (simulate_free_lift), результат с подписью модели (signature)
+    записывается в сжатый двоичный файл.
+    :param path:     путь к файлу индекса
+    :param duration: продолжительность моделируемого полёта, с
+    :param tstep:    шаг интегрирования, с
+    """
+    names = sorted(BY_NAME, key=lambda name: BY_NAME[name]['bal_mass'])
+    bal_mass = np.array([BY_NAME[name]['bal_mass'] for name in names])
+    bal_diam = np.array([BY_NAME[name]['bal_diam'] for name in names])
+    # Всё в каталоге - резиновые шары с гелием
+    gas_mass_nominal = _new_balloon(bal_mass, bal_diam).gas_mass
+    # (шар, газ) и (шар, нагрузка)
+    gas_mass = solve_gas_mass_for_burst_alt(bal_diam[:, np.newaxis],
+                                            FILL_BURST_ALT)
+    payload_max = solve_payload_for_ascent_rate(
+        bal_mass, bal_diam, ascent_rate=1.0, gas_mass=gas_mass[:, -1])
+    payload = payload_max[:, np.newaxis]*PAYLOAD_RATIO
+
+    res = simulate_free_lift(
+        duration,
+        bal_mass=bal_mass[:, np.newaxis, np.newaxis],
+        bal_diam=bal_diam[:, np.newaxis, np.newaxis],
+        payload=payload[:, :, np.newaxis],
+        gas_mass=gas_mass[:, np.newaxis, :],
+        tstep=tstep,
+        alt_levels=ALT_LEVELS)
+    directory = os.path.dirname(path)
+    if directory and not os.path.isdir(directory):
+        os.makedirs(directory)
+    # The index is renamed into place only when completely written
+    tmp_path = '{0}.{1}.tmp.npz'.format(path, os.getpid())
+    np.savez_compressed(
+        tmp_path,
+        signature=signature(duration, tstep),
+        duration=duration,
+        tstep=tstep,
+        names=np.array(names),
+        gas_mass_nominal=gas_mass_nominal,
+        payload=payload,
+        gas_mass=gas_mass,
+        alt_levels=ALT_LEVELS,
+        # (шар, нагрузка, газ)
+        burst_alt=res['burst_alt'].astype(np.float32),
+        burst_time=res['burst_time'].astype(np.float32),
+        # (шар, нагрузка, газ, высота)
+        ascent_rate=np.moveaxis(res['ascent_rate'], 0, -1).astype(
+            np.float32))
+    if os.name == 'nt' and os.path.exists(path):
+        os.remove(path)
+    os.rename(tmp_path, path)
+
+
+class Index(object):
+    """Таблицы характеристик полёта шаров каталога (см. build)"""
+
+    def __init__(self, path=INDEX_PATH):
+        """
+        :param path: путь к файлу индекса. ValueError - индекс рассчитан по
+                     другой модели (подпись не совпадает с signature)
+        """
+        object.__init__(self)
+        with np.load(path) as data:
+            self._tables = dict((key, data[key]) for key in data.files)
+        tables = self._tables
+        if 'signature' not in tables or str(tables['signature']) != \
+                signature(tables['duration'], tables['tstep']):
+            raise ValueError('catalog index {0} is built by another model '
+                             'version, rebuild it'.format(path))
+        self._row = dict(
+            (name, i) for i, name in enumerate(self._tables['names']))
+
+    @property
+    def names(self):
+        return list(self._tables['names'])
+
+    @property
+    def alt_levels(self):
+        return self._tables['alt_levels']
+
+    def query(self, name, payload, gas_mass=None):
+        """ Характеристики полёта шара каталога (билинейная интерполяция
+        таблиц по массам нагрузки и газа)
+        :param name:     наименование шара в каталоге (см. BY_NAME)
+        :param payload:  полезная нагрузка, кг
+        :param gas_mass: масса газа, кг. По умолчанию - по заполнению шара на
+                         высоте H=0
+        :return:         словарь: 'burst_alt' - высота разрыва, м;
+                         'burst_time' - время разрыва, с; 'ascent_rate' -
+                         скорость подъёма на высотах alt_levels, м/с
+                         (последняя ось). NaN - вне таблиц или шар не
+                         взрывается
+        (payload, gas_mass - числа или массивы, согласуемые по правилам
+        broadcasting)
+        """
+        row = self._row[name]
+        tables = self._tables
+        if gas_mass is None:
+            gas_mass = tables['gas_mass_nominal'][row]
+        payload, gas_mass = np.broadcast_arrays(
+            np.asarray(payload, dtype=float),
+            np.asarray(gas_mass, dtype=float))
+        i, wi = _grid_weights(tables['payload'][row], payload)
+        j, wj = _grid_weights(tables['gas_mass'][row], gas_mass)
+
+        def interp(table):
+            table = table[row]
+            if table.ndim > 2:
+                wi_, wj_ = wi[..., np.newaxis], wj[..., np.newaxis]
+            else:
+                wi_, wj_ = wi, wj
+            return ((1.0 - wi_)*(1.0 - wj_)*table[i, j] +
+                    wi_*(1.0 - wj_)*table[i + 1, j] +
+                    (1.0 - wi_)*wj_*table[i, j + 1] +
+                    wi_*wj_*table[i + 1, j + 1])[()]
+
+        return {'burst_alt': interp(tables['burst_alt']),
+                'burst_time': interp(tables['burst_time']),
+                'ascent_rate': interp(tables['ascent_rate'])}
+
+
+def _grid_weights(grid, x):
+    """ Индексы левых узлов сетки и веса линейной интерполяции; вне сетки -
+    NaN-веса """
+    i = np.clip(np.searchsorted(grid, x, side='right') - 1, 0, grid.size - 2)
+    w = (x - grid[i])/(grid[i + 1] - grid[i])
+    w = np.where((x >= grid[0]) & (x <= grid[-1]), w, np.nan)
+    return i, w
+
+
+# Индекс, загружаемый при первом запросе
+_index = None
+
+
+def query(name, payload, gas_mass=None):
+    """ Характеристики полёта шара каталога по таблицам индекса по умолчанию
+    (см. Index.query): индекса пакета или индекса в кэше. Индекс в кэше
+    рассчитывается, если ни один из них не создан или не соответствует
+    модели.
+    """
+    global _index
+    if _index is None:
+        for path in (PACKAGE_INDEX_PATH, INDEX_PATH):
+            try:
+                _index = Index(path)
+                break
+            except (IOError, ValueError):
+                # Missing or built by another model version
+                continue
+        else:
+            build(INDEX_PATH)
+            _index = Index(INDEX_PATH)
+    return _index.query(name, payload, gas_mass)
+
+
+if __name__ == "__main__":
+    build()
@@ -5,7 +5,13 @@
     g [м/с^2] - ускорение свободного падения
     pi - число Пи
     R [Дж/(моль*К)] - универсальная газовая постоянная
+    R_earth [м] - средний радиус Земли
+    sigma [Вт/(м^2*К^4)] - постоянная Стефана-Больцмана
+    S0 [Вт/м^2] - солнечная постоянная
 """
 from math import pi
 g = 9.81
 R = 8.3144598
+R_earth = 6371000.0
+sigma = 5.670367e-8
+S0 = 1361.0
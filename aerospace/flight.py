@@ -0,0 +1,195 @@
+# -*- encoding: utf-8 -*-
+""" Полёт метеошара от запуска до приземления
+
+Полёт - последовательность фаз, сменяемых событиями:
+
+    ascent   --(burst)---->  freefall  --(deploy)-->  descent
+       |                        |                        |
+       +-------(landing)--------+-------(landing)--------+-->  landed
+
+- ascent   - подъём на шаре (модель BalloonStatic);
+- freefall - падение нагрузки с остатками оболочки после разрыва шара до
+             раскрытия парашюта (или до земли, если парашюта нет) с
+             сопротивлением нагрузки и оболочки fall_cx*fall_area;
+- descent  - спуск на парашюте (сопротивление парашюта, нагрузки и
+             оболочки).
+
+Весь полёт рассчитывается за один проход интегратором с автоматическим
+выбором шага (integrate.dopri5): интегрирование фазы останавливается в
+найденный момент события и продолжается от состояния события с правой
+частью следующей фазы. При заданном поле ветра (см. модуль <wind>)
+рассчитывается и горизонтальный дрейф - точка приземления.
+
+Примеры:
+>>> res = simulate_flight(bal_mass=3.0, bal_diam=2.164, payload=1.05,
+...                       chute_area=1.0)
+>>> [(name, int(round(time))) for name, time, alt in res['events']]
+[('burst', 6091), ('landing', 8377)]
+>>> round(res['vel'][-1], 1)
+-6.4
+
+Без парашюта скорость падения ограничена сопротивлением нагрузки и
+оболочки:
+>>> res = simulate_flight(bal_mass=3.0, bal_diam=2.164, payload=1.05)
+>>> [(name, int(round(time))) for name, time, alt in res['events']]
+[('burst', 6091), ('landing', 6670)]
+>>> round(res['vel'][-1], 1)
+-25.5
+"""
+# Site-packages:
+import numpy as np
+# Custom libs:
+from balloon import _new_balloon
+import const
+import integrate
+
+# Фазы полёта
+ASCENT = 'ascent'
+FREEFALL = 'freefall'
+DESCENT = 'descent'
+LANDED = 'landed'
+
+
+def simulate_flight(bal_mass, bal_diam, payload=0.0, gas_mass=None,
+                    chute_area=0.0, chute_cx=1.5, deploy_alt=None,
+                    fall_area=0.1, fall_cx=1.0, bal_mat='rubber', bal_gas='helium',
+                    wind=None, lat=0.0, lon=0.0, start_time=0.0,
+                    atm=None, max_duration=24*60*60, rtol=1e-6, atol=1e-3):
+    """ Моделирование полёта шара с полезной нагрузкой: подъём, разрыв,
+    спуск на парашюте и приземление
+    ---------------------------------------------------------------------------
+    :param bal_mass:     масса метеошара, кг
+    :param bal_diam:     диаметр метеошара в состоянии без растяжения, м
+    :param payload:      полезная нагрузка (вместе с парашютом), кг
+    :param gas_mass:     масса газа, кг. По умолчанию - по заполнению шара
+                         на высоте H=0
+    :param chute_area:   площадь купола парашюта, м^2 (0 - без парашюта)
+    :param chute_cx:     коэффициент сопротивления парашюта
+    :param deploy_alt:   высота раскрытия парашюта, м. По умолчанию -
+                         парашют раскрыт с момента разрыва шара
+    :param fall_area:    площадь миделя нагрузки с остатками оболочки после
+                         разрыва шара, м^2
+    :param fall_cx:      коэффициент сопротивления нагрузки с остатками
+                         оболочки
+    :param bal_mat:      наименование материала метеошара
+    :param bal_gas:      наименование наполняющего газа
+    :param wind:         поле ветра wind.WindField (по умолчанию - без
+                         горизонтального дрейфа)
+    :param lat:          широта точки запуска, град
+    :param lon:          долгота точки запуска, град
+    :param start_time:   время запуска на оси времени поля ветра, с
+    :param atm:          модель атмосферы (см. BalloonStatic)
+    :param max_duration: наибольшая продолжительность полёта, с
+    :param rtol:         относительная допустимая погрешность шага
+    :param atol:         абсолютная допустимая погрешность шага
+    ---------------------------------------------------------------------------
+    :return:             словарь:
+                         'time', 'alt', 'vel', 'lat', 'lon' - траектория в
+                         моменты принятых шагов и событий (время - с,
+                         высота - м, скорость - м/с, координаты - град);
+                         'phase' - фаза полёта на шагах (массив имён);
+                         'events' - список наступивших событий (имя,
+                         момент, высота): 'burst', 'deploy', 'landing';
+                         'nfev' - число вычислений правой части
+    """
+    if chute_area < 0:
+        raise ValueError('chute_area must be non-negative')
+    if fall_area <= 0 or fall_cx <= 0:
+        raise ValueError('fall_area and fall_cx must be positive')
+    balloon = _new_balloon(bal_mass, bal_diam, gas_mass, bal_mat, bal_gas,
+                           atm)
+    atm = balloon.atm
+    strain_max = balloon.bal_mat.rel_strain_max
+    mass_ascent = balloon.get_mass() + payload
+    mass_descent = balloon.get_mass(is_burst=True) + payload
+    weight_payload = payload*const.g
+    fall_drag = fall_cx*fall_area/2.0
+    chute_drag = chute_cx*chute_area/2.0 + fall_drag
+
+    def drift(y, time):
+        # Horizontal velocity equals the wind speed
+        if wind is None:
+            return 0.0, 0.0
+        alt, vel, lat, lon = y
+        u, v = wind.get_wind(start_time + time, alt, lat, lon)
+        rad = const.R_earth + alt
+        return (np.degrees(v/rad),
+                np.degrees(u/(rad*np.cos(np.radians(lat)))))
+
+    def ascent(y, time):
+        alt, vel = y[:2]
+        f_sum = balloon.get_forces_sum(alt, vel) - weight_payload
+        return np.array((vel, f_sum/mass_ascent) + drift(y, time))
+
+    def fall(y, drag):
+        alt, vel = y[:2]
+        f_res = -drag*atm.rho(alt)*vel*np.abs(vel)
+        return vel, f_res/mass_descent - const.g
+
+    def freefall(y, time):
+        return np.array(fall(y, fall_drag) + drift(y, time))
+
+    def descent(y, time):
+        return np.array(fall(y, chute_drag) + drift(y, time))
+
+    def burst(y, time):
+        return balloon.get_rel_strain(y[0]) - strain_max
+
+    def deploy(y, time):
+        return deploy_alt - y[0]
+
+    def landing(y, time):
+        return -y[0]
+
+    # Фазы: правая часть и события (имя, функция, следующая фаза)
+    phases = {
+        ASCENT: (ascent, [
+            ('burst', burst, DESCENT if deploy_alt is None else FREEFALL),
+            ('landing', landing, LANDED)]),
+        FREEFALL: (freefall, [('deploy', deploy, DESCENT),
+                              ('landing', landing, LANDED)]),
+        DESCENT: (descent, [('landing', landing, LANDED)]),
+    }
+
+    phase = ASCENT
+    if balloon.get_forces_sum(0.0) <= weight_payload:
+        # No free lift: the balloon stays on the ground
+        phase = LANDED
+    y = np.array([0.0, 0.0, lat, lon])
+    t = 0.0
+    ts, ys, phase_names = [[t]], [y[np.newaxis]], [[phase]]
+    events = []
+    nfev = 0
+    while phase != LANDED and t < max_duration:
+        if phase == FREEFALL and deploy(y, t) >= 0.0:
+            # Burst below the deployment altitude
+            events.append(('deploy', t, y[0]))
+            phase = DESCENT
+        func, phase_events = phases[phase]
+        t_sln, y_sln, i, n = integrate.dopri5(
+            func, y, t, max_duration,
+            events=[event for name, event, next_phase in phase_events],
+            rtol=rtol, atol=atol)
+        nfev += n
+        ts.append(t_sln[1:])
+        ys.append(y_sln[1:])
+        phase_names.append([phase]*(len(t_sln) - 1))
+        t, y = t_sln[-1], y_sln[-1]
+        if i is None:
+            break
+        name, event, phase = phase_events[i]
+        events.append((name, t, y[0]))
+    ys = np.concatenate(ys)
+    return {'time': np.concatenate(ts),
+            'alt': ys[:, 0],
+            'vel': ys[:, 1],
+            'lat': ys[:, 2],
+            'lon': ys[:, 3],
+            'phase': np.concatenate(phase_names),
+            'events': events,
+            'nfev': nfev}
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
@@ -1,6 +1,37 @@
 # -*- encoding: utf-8 -*-
 """Свойства Ракетного топлива
 
+Структура пакета:
+fuel/
+    kerosene
+    hydrogen
+    apcp
+    ... и другие топлива
+
 Принятые обозначения и размерности:
-    ...
+    isp_sl [с] - удельный импульс двигателя у земли (p = 101330 Па)
+    isp_vac [с] - удельный импульс двигателя в пустоте
+    rho [кг/м^3] - средняя плотность топлива (горючее с окислителем в
+                   расчётном соотношении)
 """
+# Modules of package to import
+import apcp
+import hydrogen
+import kerosene
+__all__ = ['apcp', 'hydrogen', 'kerosene', ]
+
+# Global fuel names
+# used to import specified fuel properties, i.e.
+# >>> fuel = importlib.import_module(aerospace.fuel.KEROSENE)
+APCP = 'aerospace.fuel.apcp'
+HYDROGEN = 'aerospace.fuel.hydrogen'
+KEROSENE = 'aerospace.fuel.kerosene'
+
+# Fuel names dictionary
+# used to import specified fuel properties, i.e.
+# >>> fuel = importlib.import_module(aerospace.fuel.BY_NAME['kerosene'])
+BY_NAME = {
+    'apcp': APCP,
+    'hydrogen': HYDROGEN,
+    'kerosene': KEROSENE,
+}
@@ -0,0 +1,7 @@
+# -*- encoding: utf-8 -*-
+"""Свойства топлива: смесевое твёрдое (перхлорат аммония, алюминий,
+полибутадиен)"""
+name = 'apcp'
+isp_sl = 242.0    # удельный импульс у земли, с
+isp_vac = 268.0   # удельный импульс в пустоте, с
+rho = 1770.0      # плотность топлива, кг/м^3
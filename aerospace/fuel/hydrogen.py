@@ -0,0 +1,6 @@
+# -*- encoding: utf-8 -*-
+"""Свойства топлива: жидкий водород + жидкий кислород"""
+name = 'hydrogen'
+isp_sl = 366.0    # удельный импульс у земли, с
+isp_vac = 452.0   # удельный импульс в пустоте, с
+rho = 360.0       # средняя плотность топлива, кг/м^3
@@ -0,0 +1,6 @@
+# -*- encoding: utf-8 -*-
+"""Свойства топлива: керосин RP-1 + жидкий кислород"""
+name = 'kerosene'
+isp_sl = 282.0    # удельный импульс у земли, с
+isp_vac = 311.0   # удельный импульс в пустоте, с
+rho = 1030.0      # средняя плотность топлива, кг/м^3
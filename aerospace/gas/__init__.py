@@ -3,24 +3,31 @@
 
 Структура пакета:
 gas/
+    air
     helium
     ... и другие вещества
 
 Принятые обозначения и размерности:
     mu [кг/моль] - молярная масса
+    k [-] - показатель адиабаты
+    cp [Дж/(кг*К)] - удельная теплоёмкость при постоянном давлении
+    pr [-] - число Прандтля (air)
 """
 # Modules of package to import
+import air
 import helium
-__all__ = ['helium', ]
+__all__ = ['air', 'helium', ]
 
 # Global gas names
 # used to import specified gas properties, i.e.
 # >>> gas = importlib.import_module(aerospace.gas.HELIUM)
+AIR = 'aerospace.gas.air'
 HELIUM = 'aerospace.gas.helium'
 
 # Gas names dictionary
 # used to import specified gas properties, i.e.
 # >>> gas = importlib.import_module(aerospace.gas.BY_NAME['helium'])
 BY_NAME = {
+    'air': AIR,
     'helium': HELIUM,
 }
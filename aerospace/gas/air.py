@@ -0,0 +1,7 @@
+# -*- encoding: utf-8 -*-
+"""Свойства газа"""
+name = 'air'
+mu = 28.9644/1000.0   # кг/моль
+k = 1.4               # показатель адиабаты
+cp = 1005.0           # Дж/(кг*К)
+pr = 0.71             # число Прандтля
@@ -1,4 +1,5 @@
 # -*- encoding: utf-8 -*-
 """Свойства газа"""
 name = 'helium'
-mu = 4.002602/1000.0   # кг/моль
\ No newline at end of file
+mu = 4.002602/1000.0   # кг/моль
+cp = 5193.0            # Дж/(кг*К)
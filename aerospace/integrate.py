@@ -0,0 +1,290 @@
+# -*- encoding: utf-8 -*-
+""" Интеграторы систем ОДУ
+
+rk4 - для наборов (ансамблей) моделей с постоянным шагом. Состояние набора
+хранится массивом numpy формы (nvars, nmembers): строка - переменная
+состояния, столбец - член набора. Правая часть вычисляется сразу для всех
+членов набора, как и в odespy, в форме Коши: dy/dt = f(y, t).
+
+dopri5, rosenbrock - для одной системы с автоматическим выбором шага и
+остановкой в моменты событий; rosenbrock - для жёстких систем, с матрицей
+Якоби правой части.
+"""
+# Site-packages:
+import numpy as np
+
+
+def rk4(func, y0, time_points, terminate=None, callback=None):
+    """ Метод Рунге-Кутты 4 порядка с постоянным шагом для набора систем ОДУ
+
+    Члены набора останавливаются независимо: после каждого шага функция
+    terminate() отмечает членов, достигших условия остановки; их состояние
+    далее не изменяется (правая часть для них вычисляется, но не
+    применяется), а интегрирование остальных продолжается.
+    :param func:        правая часть f(y, t), y - массив (nvars, nmembers)
+    :param y0:          начальное состояние, массив (nvars, nmembers).
+                        Тип данных вещественного массива (например,
+                        np.float32) сохраняется в состоянии и результате
+    :param time_points: моменты времени решения, с
+    :param terminate:   функция terminate(y, t) -> массив bool (nmembers) -
+                        члены, останавливаемые в точке t (необязательно)
+    :param callback:    функция callback(y_prev, y, t_prev, t, active),
+                        вызываемая после каждого шага (например, для записи
+                        решения); active - члены, продолжавшие движение на
+                        шаге (необязательно)
+    :return:            t_stop, y - массив времени остановки членов набора
+                        (NaN - не остановлен) и состояние в момент
+                        остановки или в конце интервала
+    """
+    time_points = np.asarray(time_points, dtype=float)
+    y = np.array(y0)
+    if y.dtype.kind != 'f':
+        y = y.astype(float)
+    dtype = y.dtype
+    active = np.ones(y.shape[1:], dtype=bool)
+    t_stop = np.full(y.shape[1:], np.nan, dtype=dtype)
+    for t, t_next in zip(time_points[:-1], time_points[1:]):
+        # Python float steps keep the state dtype in the stage arithmetic
+        dt = float(t_next - t)
+        k1 = np.asarray(func(y, t), dtype=dtype)
+        k2 = np.asarray(func(y + dt/2.0*k1, t + dt/2.0), dtype=dtype)
+        k3 = np.asarray(func(y + dt/2.0*k2, t + dt/2.0), dtype=dtype)
+        k4 = np.asarray(func(y + dt*k3, t_next), dtype=dtype)
+        y_next = y + dt/6.0*(k1 + 2.0*k2 + 2.0*k3 + k4)
+        y_next = np.where(active, y_next, y)
+        if callback is not None:
+            callback(y, y_next, t, t_next, active)
+        y = y_next
+        if terminate is not None:
+            is_stop = active & terminate(y, t_next)
+            t_stop[is_stop] = t_next
+            active &= ~is_stop
+            if not np.any(active):
+                break
+    return t_stop, y
+
+
+# Таблица Бутчера метода Дормана-Принса 5(4)
+_DOPRI_C = np.array([0.0, 1.0/5.0, 3.0/10.0, 4.0/5.0, 8.0/9.0, 1.0, 1.0])
+_DOPRI_A = [
+    [],
+    [1.0/5.0],
+    [3.0/40.0, 9.0/40.0],
+    [44.0/45.0, -56.0/15.0, 32.0/9.0],
+    [19372.0/6561.0, -25360.0/2187.0, 64448.0/6561.0, -212.0/729.0],
+    [9017.0/3168.0, -355.0/33.0, 46732.0/5247.0, 49.0/176.0,
+     -5103.0/18656.0],
+    [35.0/384.0, 0.0, 500.0/1113.0, 125.0/192.0, -2187.0/6784.0,
+     11.0/84.0],
+]
+# Разность весов решений 5 и 4 порядков - оценка локальной погрешности
+_DOPRI_E = np.array([71.0/57600.0, 0.0, -71.0/16695.0, 71.0/1920.0,
+                     -17253.0/339200.0, 22.0/525.0, -1.0/40.0])
+
+
+def dopri5(func, y0, t0, t_end, events=(), rtol=1e-6, atol=1e-6,
+           max_step=np.inf, first_step=None, steps=None):
+    """ Метод Дормана-Принса 5(4) с автоматическим выбором шага и
+    определением событий
+
+    Событие - функция event(y, t), меняющая знак с отрицательного на
+    неотрицательный. Интегрирование останавливается в момент первого
+    наступившего события, найденный по интерполяции решения на шаге
+    (кубический полином Эрмита), - так правая часть может переключаться в
+    точных моментах событий последовательными вызовами от состояния
+    события.
+    :param func:       правая часть f(y, t), y - одномерный массив
+    :param y0:         начальное состояние
+    :param t0:         начальный момент, с
+    :param t_end:      конечный момент, с
+    :param events:     функции событий (необязательно)
+    :param rtol:       относительная допустимая погрешность шага
+    :param atol:       абсолютная допустимая погрешность шага
+    :param max_step:   наибольший шаг, с
+    :param first_step: начальный шаг, с (по умолчанию - оценка по правой
+                       части)
+    :param steps:      подсказки шагов - пара массивов (моменты, шаги),
+                       обычно принятые шаги расчёта близкой задачи:
+                       (t[:-1], np.diff(t)). В пределах подсказок
+                       начальный шаг берётся из них вместо оценки по
+                       правой части, а шаг регулятора погрешности после
+                       принятого без отказов шага, превышающий подсказку,
+                       уменьшается до среднего геометрического его и
+                       подсказки (после отказа - шаг регулятора)
+    :return:           t, y, event, nfev - моменты принятых шагов (и
+                       события), массив состояний (момент, переменная),
+                       индекс наступившего события (None - достигнут
+                       конец интервала) и число вычислений правой части
+    """
+    y = np.array(y0, dtype=float)
+    t = float(t0)
+    f = np.asarray(func(y, t), dtype=float)
+    nfev = 1
+    if steps is not None:
+        step_times, step_sizes = (np.asarray(x, dtype=float) for x in steps)
+        if not step_times.size:
+            steps = None
+        elif first_step is None and step_times[0] <= t < step_times[-1]:
+            first_step = np.interp(t, step_times, step_sizes)
+    if first_step is None:
+        first_step = _first_step(y, f, rtol, atol)
+    h = min(first_step, max_step, t_end - t)
+    g = [event(y, t) for event in events]
+    ts = [t]
+    ys = [y]
+    k = np.empty((7,) + y.shape)
+    rejected = False
+    while t < t_end:
+        h = min(h, t_end - t)
+        k[0] = f
+        for i in range(1, 7):
+            k[i] = func(y + h*np.dot(_DOPRI_A[i], k[:i]), t + _DOPRI_C[i]*h)
+        nfev += 6
+        y_new = y + h*np.dot(_DOPRI_A[6], k[:6])
+        scale = atol + rtol*np.maximum(np.abs(y), np.abs(y_new))
+        err = np.sqrt(np.mean((h*np.dot(_DOPRI_E, k)/scale)**2))
+        if not err <= 1.0:
+            h *= max(0.2, 0.9*err**-0.2) if np.isfinite(err) else 0.2
+            if t + h == t:
+                raise RuntimeError('dopri5: step size underflow at '
+                                   't={0}'.format(t))
+            rejected = True
+            continue
+        t_new = t + h
+        f_new = k[6].copy()
+        g_new = [event(y_new, t_new) for event in events]
+        located = [(_locate_event(event, t, y, f, t_new, y_new, f_new), i)
+                   for i, event in enumerate(events)
+                   if g[i] < 0.0 <= g_new[i]]
+        if located:
+            # The earliest of the events occurred on the step
+            (t_event, y_event), i = min(located, key=lambda item: item[0][0])
+            ts.append(t_event)
+            ys.append(y_event)
+            return np.array(ts), np.array(ys), i, nfev
+        g = g_new
+        t, y, f = t_new, y_new, f_new
+        ts.append(t)
+        ys.append(y)
+        h = h*min(5.0, 0.9*max(err, 1e-10)**-0.2)
+        if steps is not None and not rejected and \
+                step_times[0] <= t < step_times[-1]:
+            # The controller step is only damped towards a larger step
+            # accepted in a close problem (the geometric mean of the two):
+            # the hint spares the rejections of overgrown steps, while the
+            # steps still follow this problem and do not shrink from one
+            # problem of a sequence to the next
+            hint = np.interp(t, step_times, step_sizes)
+            if h > hint:
+                h = np.sqrt(h*hint)
+        h = min(h, max_step)
+        rejected = False
+    return np.array(ts), np.array(ys), None, nfev
+
+
+def rosenbrock(func, jac, y0, t0, t_end, events=(), rtol=1e-4, atol=1e-6,
+               max_step=np.inf, first_step=None):
+    """ Модифицированный метод Розенброка 2(3) (Шампайн, Райхельт; как
+    ode23s в MATLAB) с автоматическим выбором шага и определением событий
+
+    L-устойчивый линейно-неявный метод для жёстких систем: на шаге
+    решаются линейные системы с матрицей I - h*d*J (J - матрица Якоби
+    правой части по состоянию), без итераций Ньютона. Правая часть не
+    должна зависеть от времени явно (иначе её производная по времени не
+    учитывается и порядок метода снижается). События - как в dopri5.
+    :param func:       правая часть f(y, t), y - одномерный массив
+    :param jac:        матрица Якоби правой части jac(y, t) - массив
+                       (nvars, nvars), элемент [i, j] = df_i/dy_j
+    :param y0:         начальное состояние
+    :param t0:         начальный момент, с
+    :param t_end:      конечный момент, с
+    :param events:     функции событий (необязательно)
+    :param rtol:       относительная допустимая погрешность шага
+    :param atol:       абсолютная допустимая погрешность шага
+    :param max_step:   наибольший шаг, с
+    :param first_step: начальный шаг, с (по умолчанию - оценка по правой
+                       части)
+    :return:           t, y, event, nfev, njev - как в dopri5 и число
+                       вычислений матрицы Якоби
+    """
+    d = 1.0/(2.0 + np.sqrt(2.0))
+    e32 = 6.0 + np.sqrt(2.0)
+    y = np.array(y0, dtype=float)
+    t = float(t0)
+    f = np.asarray(func(y, t), dtype=float)
+    nfev = 1
+    njev = 0
+    if first_step is None:
+        first_step = _first_step(y, f, rtol, atol)
+    h = min(first_step, max_step, t_end - t)
+    g = [event(y, t) for event in events]
+    ts = [t]
+    ys = [y]
+    eye = np.eye(y.size)
+    jac_y = None
+    while t < t_end:
+        h = min(h, t_end - t)
+        if jac_y is None:
+            jac_y = np.asarray(jac(y, t), dtype=float)
+            njev += 1
+        w_inv = np.linalg.inv(eye - h*d*jac_y)
+        k1 = w_inv.dot(f)
+        f1 = np.asarray(func(y + 0.5*h*k1, t + 0.5*h), dtype=float)
+        k2 = w_inv.dot(f1 - k1) + k1
+        t_new = t + h
+        y_new = y + h*k2
+        f_new = np.asarray(func(y_new, t_new), dtype=float)
+        k3 = w_inv.dot(f_new - e32*(k2 - f1) - 2.0*(k1 - f))
+        nfev += 2
+        scale = atol + rtol*np.maximum(np.abs(y), np.abs(y_new))
+        err = np.sqrt(np.mean((h/6.0*(k1 - 2.0*k2 + k3)/scale)**2))
+        if not err <= 1.0:
+            h *= max(0.2, 0.8*err**(-1.0/3.0)) if np.isfinite(err) else 0.2
+            if t + h == t:
+                raise RuntimeError('rosenbrock: step size underflow at '
+                                   't={0}'.format(t))
+            continue
+        g_new = [event(y_new, t_new) for event in events]
+        located = [(_locate_event(event, t, y, f, t_new, y_new, f_new), i)
+                   for i, event in enumerate(events)
+                   if g[i] < 0.0 <= g_new[i]]
+        if located:
+            (t_event, y_event), i = min(located, key=lambda item: item[0][0])
+            ts.append(t_event)
+            ys.append(y_event)
+            return np.array(ts), np.array(ys), i, nfev, njev
+        g = g_new
+        t, y, f = t_new, y_new, f_new
+        jac_y = None
+        ts.append(t)
+        ys.append(y)
+        h = min(h*min(5.0, 0.8*max(err, 1e-10)**(-1.0/3.0)), max_step)
+    return np.array(ts), np.array(ys), None, nfev, njev
+
+
+def _first_step(y, f, rtol, atol):
+    """ Оценка начального шага по состоянию и правой части """
+    scale = atol + rtol*np.abs(y)
+    d0 = np.sqrt(np.mean((y/scale)**2))
+    d1 = np.sqrt(np.mean((f/scale)**2))
+    return 0.01*d0/d1 if d0 > 1e-5 and d1 > 1e-5 else 1e-6
+
+
+def _locate_event(event, t0, y0, f0, t1, y1, f1, xtol=1e-9):
+    """ Момент события на шаге [t0, t1] по интерполяции решения (делением
+    отрезка пополам) и состояние в этот момент """
+    h = t1 - t0
+
+    def interp(s):
+        # Кубический полином Эрмита по значениям и производным на концах
+        return ((1.0 + 2.0*s)*(1.0 - s)**2*y0 + s*(1.0 - s)**2*h*f0 +
+                s**2*(3.0 - 2.0*s)*y1 - s**2*(1.0 - s)*h*f1)
+
+    lower, upper = 0.0, 1.0
+    while (upper - lower)*h > xtol*max(1.0, abs(t1)):
+        middle = 0.5*(lower + upper)
+        if event(interp(middle), t0 + middle*h) < 0.0:
+            lower = middle
+        else:
+            upper = middle
+    return t0 + upper*h, interp(upper)
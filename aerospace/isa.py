@@ -12,8 +12,13 @@ ToDo: Для оптимизации заменить интерполяцию а
     p [Па] - давление
     rho [кг/м^3] - плотность
     nu [м^2/с] - кинематическая вязкость
+
+Обратные функции h_from_p, h_from_rho, h_from_t - высота по давлению,
+плотности или температуре - точно обращают интерполяцию p, rho, t
+(поэлементно: поток отсчётов можно обрабатывать по частям).
 """
 import numpy as np
+import utils
 # Аппроксимации:
 # import math
 # Э.В, Антоненко, Н.А, Привалова Модели стандартной атмосферы
@@ -49,11 +54,12 @@ _rho = np.array(
      0.00031, 0.00002])
 
 _nu = np.array(
-    [1.46*10**5, 1.52*10**5, 1.58*10**5, 1.65*10**5, 1.71*10**5, 1.79*10**5,
-     1.86*10**5, 2.03*10**5, 2.21*10**5, 2.42*10**5, 2.65*10**5, 2.90*10**5,
-     3.20*10**5, 3.53*10**5, 3.90*10**5, 4.56*10**5, 6.24*10**5, 8.54*10**5,
-     1.17*10**4, 1.60*10**4, 3.07*10**4, 5.84*10**4, 1.10*10**3, 2.13*10**3,
-     4.01*10**3, 1.66*10**2, 5.11*10**2, 7.16*10**1])
+    [1.46*10**-5, 1.52*10**-5, 1.58*10**-5, 1.65*10**-5, 1.71*10**-5,
+     1.79*10**-5, 1.86*10**-5, 2.03*10**-5, 2.21*10**-5, 2.42*10**-5,
+     2.65*10**-5, 2.90*10**-5, 3.20*10**-5, 3.53*10**-5, 3.90*10**-5,
+     4.56*10**-5, 6.24*10**-5, 8.54*10**-5, 1.17*10**-4, 1.60*10**-4,
+     3.07*10**-4, 5.84*10**-4, 1.10*10**-3, 2.13*10**-3, 4.01*10**-3,
+     1.66*10**-2, 5.11*10**-2, 7.16*10**-1])
 
 def p(h):
     return np.interp(h, _h, _p)
@@ -69,3 +75,16 @@ def rho(h):
 
 def nu(h):
     return np.interp(h, _h, _nu)
+
+def h_from_p(p):
+    """ Высота по давлению (NaN вне диапазона таблицы) """
+    return utils.interp_inverse(p, _h, _p)
+
+def h_from_rho(rho):
+    """ Высота по плотности (NaN вне диапазона таблицы) """
+    return utils.interp_inverse(rho, _h, _rho)
+
+def h_from_t(t):
+    """ Наименьшая высота с температурой t (температура немонотонна по
+    высоте); NaN вне диапазона таблицы """
+    return utils.interp_inverse(t, _h, _t)
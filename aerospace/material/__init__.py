@@ -11,6 +11,10 @@ material/
     E [Па] - модуль упругости
     rho [кг/м3] - плотность
     rel_strain_max [] - предел относительной деформации
+    c [Дж/(кг*К)] - удельная теплоёмкость
+    cx_min [] - наименьший коэффициент лобового сопротивления шара из
+        материала: оболочка - не гладкая сфера, кризис сопротивления не
+        снижает коэффициент ниже этого значения
 """
 # Modules of package to import
 import rubber
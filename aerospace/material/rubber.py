@@ -4,4 +4,6 @@ name = "rubber"
 E = 8.0*10.0**6.0     #  модуль упругости
 mu = 0.47             # коэффициент Пуассона
 rho = 915.0           # плотность
-rel_strain_max = 5.0  # Предел относительной деформации
\ No newline at end of file
+rel_strain_max = 5.0  # Предел относительной деформации
+c = 1900.0            # удельная теплоёмкость, Дж/(кг*К)
+cx_min = 0.35         # наименьший коэффициент лобового сопротивления шара
@@ -7,26 +7,307 @@
 # Standard libs:
 from __future__ import print_function
 import math
+import multiprocessing
+import subprocess
 import sys
 import warnings
 # Site-packages:
 import matplotlib
+import matplotlib.animation
+import matplotlib.figure
+import matplotlib.patches
 import matplotlib.pyplot as plt
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.collections import LineCollection, PathCollection
+from matplotlib.path import Path
 import numpy as np
+import odespy
 # Custom:
 from balloon import BalloonStatic
+from calllog import log
 import const
 import gas
 import material
 import utils
 
+# Коды ограничения максимальной высоты платформы
+LIMIT_NONE = 0       # не ограничена в пределах таблицы атмосферы
+LIMIT_GEOMETRY = 1   # касание шаров или перекрытие центрального отверстия
+LIMIT_LIFT = 2       # недостаток подъёмной силы
+LIMIT_BURST = 3      # разрыв шаров
 
+
+class PlatformDynamic(object):
+    """Платформа, поднимаемая группой из N метеошаров
+
+    Состояние каждого шара (масса оболочки, масса газа, начальный диаметр,
+    признак разрыва) хранится в массивах, а силы вычисляются сразу для всех
+    шаров, поэтому платформы из сотен шаров не требуют циклов по шарам.
+    Разрыв части шаров меняет сумму сил без перезапуска интегрирования.
+
+    Примеры:
+    >>> pl = PlatformDynamic(bal_mass=3.0, bal_diam=2.164, nbals=3,
+    ...                      payload=1.05)
+    >>> pl.nalive
+    3
+    >>> pl.update_burst(alt=38100.0)
+    3
+    >>> pl.nalive
+    0
+    """
+
+    def __init__(self, bal_mass, bal_diam, nbals, payload=0.0, gas_mass=None,
+                 bal_mat=material.RUBBER, gas=gas.HELIUM):
+        """
+        :param bal_mass:  масса оболочки метеошара, кг
+        :param bal_diam:  диаметр метеошара без растяжения, м
+        :param nbals:     число метеошаров, шт
+        :param payload:   масса платформы и полезной нагрузки на платформе, кг
+        :param gas_mass:  масса газа в метеошаре, кг. По умолчанию - по
+                          заполнению шара на высоте H=0 (см. BalloonStatic)
+        :param bal_mat:   материал оболочки: константа <material>
+        :param gas:       наполняющий газ: константа <gas>
+
+        Параметры bal_mass, bal_diam, gas_mass задаются числом (одинаково для
+        всех шаров) или массивом из nbals элементов (по значению на шар).
+        """
+        object.__init__(self)
+        self._nbals = int(nbals)
+        shape = (self._nbals, )
+        if gas_mass is not None:
+            gas_mass = np.broadcast_to(gas_mass, shape).astype(float)
+        self._balloon = BalloonStatic(
+            bal_mat=bal_mat,
+            bal_mass=np.broadcast_to(bal_mass, shape).astype(float),
+            gas=gas,
+            gas_mass=gas_mass,
+            bal_diam=np.broadcast_to(bal_diam, shape).astype(float))
+        self.payload = payload
+        self.is_burst = np.zeros(shape, dtype=bool)
+
+    @property
+    def balloon(self):
+        """Группа шаров: BalloonStatic с массивами параметров"""
+        return self._balloon
+
+    @property
+    def nbals(self):
+        return self._nbals
+
+    @property
+    def nalive(self):
+        """Число целых шаров"""
+        return self._nbals - int(np.count_nonzero(self.is_burst))
+
+    def reset(self):
+        """Вернуть все шары в целое состояние"""
+        self.is_burst[:] = False
+
+    def update_burst(self, alt, temp=None):
+        """ Отметить шары, взорвавшиеся на указанной высоте
+        :param alt:  высота над уровнем моря, м
+        :param temp: температура газа в шаре, К. Если не указана, то
+                     принимается равной температуре окружающей среды на высоте
+        :return:     число шаров, взорвавшихся при этом вызове
+        """
+        burst_now = self._balloon.is_burst(alt, temp) & ~self.is_burst
+        self.is_burst |= burst_now
+        return int(np.count_nonzero(burst_now))
+
+    def get_forces_sum(self, alt, vel=0.0, temp=None):
+        """ Сумма всех сил, действующих на платформу с шарами
+        Положительное значение соответствует направлению набора высоты.
+        :param alt:   высота над уровнем моря, м
+        :param vel:   вертикальная скорость, м/с
+        :param temp:  температура газа в шарах, К. Если не указана, то
+                      принимается равной температуре окружающей среды на высоте
+        :return:      сила, Н
+        """
+        f_bals = self._balloon.get_forces_sum(alt, vel, temp, self.is_burst)
+        return np.sum(f_bals) - self.payload*const.g
+
+    def get_mass(self):
+        """ Масса платформы, нагрузки, шаров и газа в них, кг """
+        return np.sum(self._balloon.get_mass(self.is_burst)) + self.payload
+
+    def odefun(self, y, time):
+        """ Дифф. закон Ньютона - уравнение подъёма платформы
+        В форме Коши: dy/dt = f(y, t)
+
+        Внимание! Разрыв шаров отмечается извне функции (см. update_burst).
+        """
+        alt = y[0]
+        vel = y[1]
+        acc = self.get_forces_sum(alt, vel) / self.get_mass()
+        return [vel, acc]
+
+    def solve(self, time_points):
+        """ Интегрирование движения платформы (метод Рунге-Кутты 4 порядка)
+
+        Разрыв шаров проверяется после каждого шага. Интегрирование
+        прекращается при разрыве всех шаров или при возврате платформы на
+        землю.
+        :param time_points: моменты времени решения, с
+        :return:            time, alt, vel, nalive - массивы времени, высоты,
+                            скорости и числа целых шаров
+        """
+        self.reset()
+        nalive = [self.nalive]
+
+        def terminator(y, t, step_no):
+            # Обновление состояния шаров; остановка при разрыве всех шаров
+            # или падении платформы
+            alt = y[step_no][0]
+            self.update_burst(alt)
+            nalive.append(self.nalive)
+            return self.nalive == 0 or alt < 0.0
+
+        solver = odespy.RK4(self.odefun)
+        solver.set_initial_condition([0, 0])
+        y_sln, time = solver.solve(time_points, terminate=terminator)
+        nalive = np.array(nalive[:len(time)])
+        return time, y_sln[:, 0], y_sln[:, 1], nalive
+
+
+@log()
+def model_platform_lift(duration, bal_mass, bal_diam, nbals, payload=0.0,
+                        gas_mass=None,
+                        plot_show=False, plot_save_as='',
+                        show_debug_msg=False):
+    """ Моделирование подъёма платформы группой метеошаров
+
+    Функция создаёт изображение-график, если в аргументе <plot_save_as> для
+    него передано имя
+    ---------------------------------------------------------------------------
+    :param duration:  продолжительность моделируемого процесса, с
+    :param bal_mass:  масса метеошара, кг (число или массив по шарам)
+    :param bal_diam:  диаметр метеошара без растяжения, м (число или массив)
+    :param nbals:     число метеошаров, шт
+    :param payload:   масса платформы и полезной нагрузки на платформе, кг
+    :param gas_mass:  масса газа в метеошаре, кг (число или массив). По
+                      умолчанию - по заполнению шара на высоте H=0
+    :param plot_show:     True/False отображение графика процесса
+    :param plot_save_as:  путь к сохраняемому файлу графика, с расширением.
+                          '' - пустая строка - не сохранять изображение
+    :param show_debug_msg: отображать отладочные сообщения выводом print()
+    ---------------------------------------------------------------------------
+    :return:              exit_status:
+                          0 - успешное завршение
+                          1 - некорректные входные данные
+                          2 - ошибка создания объекта платформы
+                          3 - ошибка интегрирования системы ОДУ
+                          4 - ошибка создания графика решения
+
+    Примеры вызова:
+    >>> model_platform_lift(duration=180*60,
+    ...                     bal_mass=3.0,
+    ...                     bal_diam=[2.164, 2.164, 2.0],
+    ...                     nbals=3,
+    ...                     payload=3.0,
+    ...                     plot_save_as='doctest.png')
+    RK4 terminated at t=6749
+    0
+    """
+    # Check inputs.
+    # -----------------------------------------------------------
+    try:
+        duration = float(duration)
+        if duration <= 0:
+            raise ValueError('duration must be positive')
+        nbals = int(nbals)
+        if nbals < 1:
+            raise ValueError('nbals must be positive integer')
+        bal_mass = np.asarray(bal_mass, dtype=float)
+        if np.any(bal_mass <= 0):
+            raise ValueError('bal_mass must be positive')
+        bal_diam = np.asarray(bal_diam, dtype=float)
+        if np.any(bal_diam <= 0):
+            raise ValueError('bal_diam must be positive')
+        if gas_mass is not None:
+            gas_mass = np.asarray(gas_mass, dtype=float)
+            if np.any(gas_mass <= 0):
+                raise ValueError('gas_mass must be positive')
+        payload = float(payload)
+        if payload < 0:
+            raise ValueError('payload must be non-negative')
+    except ValueError as err:
+        print(err, file=sys.stderr)
+        return 1
+
+    # Create platform instance
+    # -----------------------------------------------------------
+    try:
+        pl = PlatformDynamic(bal_mass=bal_mass, bal_diam=bal_diam,
+                             nbals=nbals, payload=payload, gas_mass=gas_mass)
+    except Exception as err:
+        print(err, file=sys.stderr)
+        return 2
+
+    # Шаг детализации процесса по времени, с
+    tstep = duration/100.0 if duration < 100.0 else 1
+    time_points = np.arange(0, duration, tstep)
+
+    # solve the DEs
+    # -----------------------------------------------------------
+    try:
+        time, alt, vel, nalive = pl.solve(time_points)
+        if show_debug_msg:
+            print('RK4 terminated at t={0:g}, intact balloons: {1}'.format(
+                time[-1], nalive[-1]))
+    except Exception as err:
+        print(err, file=sys.stderr)
+        return 3
+
+    # Plot
+    # -----------------------------------------------------------
+    if plot_show or plot_save_as:
+        try:
+            matplotlib.rcParams['font.size'] = 14
+            matplotlib.rcParams['font.family'] = utils.get_font()
+            matplotlib.rcParams["axes.grid"] = True
+            f, (ax1, ax2) = plt.subplots(2, 1, sharex=True)
+
+            time_min = time/60.0
+            ax1.plot(time_min, alt/1000.0, 'b-', linewidth=2.0,
+                     label=u'Высота, км')
+            ax1.plot(time_min, vel, 'r-', linewidth=2.0,
+                     label=u'Скорость, м/с')
+            ax1.legend(loc='upper left', shadow=True)
+            ax1.set_title(
+                u"Полёт платформы\n"
+                u"({0} шаров, нагрузка {1} кг)\n"
+                u"Макс. высота {2} км".format(
+                    nbals, payload, round(np.max(alt)/1000.0, 1)))
+
+            ax2.step(time_min, nalive, 'k-', where='post', linewidth=2.0)
+            ax2.set_ylim([0, nbals*1.1])
+            ax2.set_ylabel(u'Целых шаров, шт')
+            ax2.set_xlabel(u'Время, мин')
+
+            if plot_save_as:
+                f.savefig(plot_save_as, bbox_inches='tight')
+            if plot_show:
+                plt.show()
+            plt.close(f)
+        except Exception as err:
+            print(err, file=sys.stderr)
+            return 4
+    else:
+        warnings.warn("All output's disabled.")
+
+    if show_debug_msg:
+        print('Successfull end.')
+    return 0
+
+
+@log()
 def plot_ngon(bal_mass, bal_diam, nbals, side_len, dmin, payload=0.0,
-              plot_show=False, plot_save_as=''):
+              plot_show=False, plot_save_as='', dpi=100):
     """ Функция построения эскиза размеров плоской платформы-многоугольника
     (с указанием максимально достижимой высоты подъёма)
     - с метеошарами на каждом углу
     - с центральным отверстием не менее заданного диаметра
+    (см. также explore_ngon для перебора вариантов платформ).
     ---------------------------------------------------------------------------
     :param bal_mass:  масса метеошара, кг
     :param bal_diam:  диаметр метеошара без растяжения, м
@@ -38,6 +319,7 @@ def plot_ngon(bal_mass, bal_diam, nbals, side_len, dmin, payload=0.0,
     :param plot_save_as:  путь к сохраняемому файлу графика, с расширением.
                           '' - пустая строка - не сохранять изображение (по
                           умолчанию)
+    :param dpi:           разрешение сохраняемого изображения, точек на дюйм
     ---------------------------------------------------------------------------
     :return:              exit_status:
                           0 - успешное завршение
@@ -96,6 +378,52 @@ def plot_ngon(bal_mass, bal_diam, nbals, side_len, dmin, payload=0.0,
         print(err, file=sys.stderr)
         return 2
 
+    # Calc radius of a circumscribed circle (over N-gon)
+    rcs = side_len/(2*math.sin(const.pi/nbals))
+    # Maximum altitude
+    alt_max, txt_alt_limiter = _get_ngon_alt_max(
+        balloon, nbals, side_len, dmin, payload)
+    alt = alt_max
+
+    # Create 2 subplots: (1) at H=0 and (2) at H=Hmax
+    try:
+        if plot_show or plot_save_as:
+            if plot_show:
+                f, sketches = _new_ngon_figure(pyplot=True)
+            else:
+                # Без отображения - переиспользуемая фигура без pyplot
+                f, sketches = _get_ngon_figure()
+            sketch1, sketch2 = sketches
+            # at H=0
+            sketch1.update(nbals, rcs, side_len, dmin,
+                           bal_rad=balloon.get_radius(0.0))
+            sketch1.ax.set_title(u'Исходное состояние:\nH = 0 км')
+            # at Hmax
+            sketch2.update(nbals, rcs, side_len, dmin,
+                           bal_rad=balloon.get_radius(alt_max))
+            sketch2.ax.set_title(u'Макс. высота:\nH = ' +
+                                 str(round(alt/1000, 1)) + u' км' +
+                                 '\n' + txt_alt_limiter)
+            if plot_show:
+                plt.show()
+            if plot_save_as:
+                f.set_size_inches(18.5, 10.5)
+                f.savefig(plot_save_as, dpi=dpi, bbox_inches='tight')
+            if plot_show:
+                plt.close(f)
+        else:
+            warnings.warn("All output's disabled.")
+    except Exception as err:
+        print(err, file=sys.stderr)
+        return 4
+
+    return 0
+
+
+def _get_ngon_alt_max(balloon, nbals, side_len, dmin, payload):
+    """ Максимальная высота подъёма платформы-многоугольника plot_ngon()
+    :return: высота, м; текст с причиной ограничения высоты
+    """
     # Create geometrical-condition checker function
     # -----------------------------------------------------------
     # Calc radius of a circumscribed circle (over N-gon)
@@ -112,51 +440,6 @@ def plot_ngon(bal_mass, bal_diam, nbals, side_len, dmin, payload=0.0,
             return False
         return True
 
-    # Create platform plot-function
-    # -----------------------------------------------------------
-    def plot(ax, alt, bal=balloon, n=nbals, rcs=rcs, l=side_len, dmin=dmin):
-        ax.set_aspect('equal')
-        # ax.set_title(u'H = ' + str(round(alt/1000, 1)) + u' км')
-
-        # Plot dmin-shaft circle
-        circle_shaft = plt.Circle((0, 0), radius=dmin/2.0,
-                                  edgecolor='k',
-                                  facecolor='k',
-                                  fill=True,
-                                  linestyle='-',
-                                  linewidth=1.0)
-        ax.add_artist(circle_shaft)
-
-        # Polar coordinate <theta> [radians] of platform corners
-        corners_theta = np.arange(0.0, 2*math.pi, 2*math.pi/n)
-        # Polar coordinate <rho> [meters] is equal to radius
-        # of a circumscribed circle (over N-gon)
-        corners_rho = [rcs]*n
-
-        # Plot N=gon
-        for i in range(0, n):
-            x_end, y_end = utils.pol2cart(corners_theta[i], corners_rho[i])
-            x_beg, y_beg = utils.pol2cart(corners_theta[i-1], corners_rho[i-1])
-            ax.plot([x_beg, x_end], [y_beg, y_end],
-                    color='b',
-                    linestyle='-',
-                    linewidth=2.0)
-
-        # Plot balloons
-        bal_rad = bal.get_radius(alt)
-        for theta, rho in zip(corners_theta, corners_rho):
-            x_cnt, y_cnt = utils.pol2cart(theta, rho)
-            circle_bal = plt.Circle((x_cnt, y_cnt), radius=bal_rad,
-                                  edgecolor='r',
-                                  facecolor=None,
-                                  fill=False,
-                                  linestyle='--',
-                                  linewidth=1.0)
-            ax.add_artist(circle_bal)
-
-        ax.set_xlim([-(l+bal_rad), (l+bal_rad)])
-        ax.set_ylim([-(l+bal_rad), (l+bal_rad)])
-
     # ========================================================================
     # Now we need to detect maximum altitude where geom_check() returns True.
     # Cycle-variable:
@@ -180,30 +463,322 @@ def plot_ngon(bal_mass, bal_diam, nbals, side_len, dmin, payload=0.0,
     txt_alt_limiter += u"геометрическими параметрами платформы"
     alt_max = alt
     # ========================================================================
+    return alt_max, txt_alt_limiter
 
-    # Create 2 subplots: (1) at H=0 and (2) at H=Hmax
+
+def _get_ngon_limits(balloon, nbals, side_len, dmin, payload,
+                     alt_step=100.0):
+    """ Максимальная высота подъёма платформ-многоугольников (векторно)
+
+    Высота проверяется с шагом alt_step, как при последовательном подъёме:
+    результат - первая высота, на которой нарушено одно из условий
+    (геометрия платформы, подъёмная сила, разрыв шара). Условия те же, что
+    в _get_ngon_alt_max() для plot_ngon(): подъёмная сила достаточна, пока
+    сила одного шара превышает вес всей нагрузки payload.
+    Диаметр и подъёмная сила шара вычисляются один раз на сетке высот,
+    а для каждого варианта платформы ищется индекс первого нарушения в
+    монотонных (накопленных) рядах, поэтому стоимость одного варианта -
+    несколько двоичных поисков.
+    :param balloon:  метеошар BalloonStatic (общий для всех вариантов)
+    :param nbals:    число шаров, шт (массивы параметров согласуются по
+                     правилам broadcasting numpy)
+    :param side_len: длина стороны многоугольника, м
+    :param dmin:     минимальный диаметр центрального отверстия, м
+    :param payload:  масса платформы и полезной нагрузки, кг
+    :param alt_step: шаг проверки высоты, м
+    :return:         массивы: высота, м; код ограничения LIMIT_*
+    """
+    alts = np.arange(0.0, balloon.atm._h[-1] + alt_step, alt_step)
+    # Диаметр шара; накопленный максимум - для поиска первого превышения
+    bal_d = np.maximum.accumulate(balloon.get_diam(alts))
+    # Сила шара без нагрузки; накопленный минимум - для поиска первого
+    # недостатка подъёмной силы
+    f_bal = np.minimum.accumulate(balloon.get_forces_sum(alts))
+    burst = np.flatnonzero(balloon.is_burst(alts))
+    i_burst = burst[0] if burst.size else alts.size
+
+    nbals, side_len, dmin, payload = np.broadcast_arrays(
+        nbals, side_len, dmin, payload)
+    # Radius of a circumscribed circle (over N-gon)
+    rcs = side_len/(2*np.sin(const.pi/nbals))
+    # Balloons contact (bal_d > l) or overlap central shaft
+    # (bal_d/2 + dmin/2 > rcs)
+    d_lim = np.minimum(side_len, 2.0*rcs - dmin)
+    i_geom = np.searchsorted(bal_d, d_lim, side='right')
+    # Sum of forces: f_bal - payload*g <= 0 (the criterion of plot_ngon)
+    i_lift = np.searchsorted(-f_bal, -payload*const.g, side='left')
+
+    i_max = np.minimum(np.minimum(i_geom, i_lift), i_burst)
+    # Nothing is violated up to the top of the altitude grid
+    limiter = np.select(
+        [i_max >= alts.size, i_max == i_geom, i_max == i_lift,
+         i_max == i_burst],
+        [LIMIT_NONE, LIMIT_GEOMETRY, LIMIT_LIFT, LIMIT_BURST])
+    alt_max = alts[np.minimum(i_max, alts.size - 1)]
+    return alt_max, limiter
+
+
+def explore_ngon(bal_mass, bal_diam, nbals, side_len, dmin, payload=0.0,
+                 alt_step=100.0):
+    """ Исследование пространства проектных параметров платформ plot_ngon()
+
+    Максимальная высота подъёма вычисляется для всех сочетаний значений
+    nbals, side_len, dmin, payload (полная сетка) векторно, без построения
+    эскизов, по тем же условиям, что и в plot_ngon() (в том числе
+    LIMIT_LIFT - подъёмная сила одного шара меньше веса всей нагрузки),
+    поэтому высоты совпадают с plot_ngon() при том же шаге alt_step.
+    ---------------------------------------------------------------------------
+    :param bal_mass:  масса метеошара, кг
+    :param bal_diam:  диаметр метеошара без растяжения, м
+    :param nbals:     число углов / число метеошаров: число или
+                      последовательность значений
+    :param side_len:  длина стороны многоугольника, м: число или
+                      последовательность значений
+    :param dmin:      минимальный диаметр центрального отверстия, м: число
+                      или последовательность значений
+    :param payload:   масса платформы и полезной нагрузки, кг: число или
+                      последовательность значений
+    :param alt_step:  шаг проверки высоты, м
+    ---------------------------------------------------------------------------
+    :return:          массив записей numpy (по записи на вариант) с полями:
+                      nbals, side_len, dmin, payload - параметры варианта;
+                      span - диаметр окружности центров шаров (размер
+                      платформы), м;
+                      alt_max - максимальная высота, м;
+                      limiter - код ограничения высоты LIMIT_*
+
+    Примеры вызова:
+    >>> designs = explore_ngon(bal_mass=3, bal_diam=2.164,
+    ...                        nbals=range(3, 9),
+    ...                        side_len=np.linspace(2.2, 6.0, 20),
+    ...                        dmin=[0.5, 1.0],
+    ...                        payload=[1.0, 5.0, 10.0])
+    >>> designs.size
+    720
+    >>> best = pareto_ngon(designs)
+    >>> int(best.alt_max.max())
+    23000
+    """
+    nbals, side_len, dmin, payload = np.meshgrid(
+        np.atleast_1d(nbals).astype(int),
+        np.atleast_1d(side_len).astype(float),
+        np.atleast_1d(dmin).astype(float),
+        np.atleast_1d(payload).astype(float),
+        indexing='ij')
+    nbals, side_len, dmin, payload = [
+        arr.ravel() for arr in (nbals, side_len, dmin, payload)]
+    if np.any(nbals < 2):
+        raise ValueError('nbals must be integer greater than 2')
+    if np.any(side_len <= 0) or np.any(dmin <= 0) or np.any(payload < 0):
+        raise ValueError('side_len and dmin must be positive, '
+                         'payload must be non-negative')
+
+    balloon = BalloonStatic(bal_mass=float(bal_mass),
+                            bal_mat=material.RUBBER,
+                            gas=gas.HELIUM,
+                            bal_diam=float(bal_diam))
+    alt_max, limiter = _get_ngon_limits(balloon, nbals, side_len, dmin,
+                                        payload, alt_step)
+    span = side_len/np.sin(const.pi/nbals)
+    return np.rec.fromarrays(
+        [nbals, side_len, dmin, payload, span, alt_max, limiter],
+        names='nbals,side_len,dmin,payload,span,alt_max,limiter')
+
+
+def pareto_ngon(designs):
+    """ Парето-оптимальные варианты платформ из результата explore_ngon()
+
+    Вариант оптимален, если нет другого варианта с не меньшими высотой и
+    полезной нагрузкой и не большим размером, лучшего хотя бы по одному
+    критерию.
+    :param designs: массив записей explore_ngon()
+    :return:        массив записей оптимальных вариантов
+    """
+    costs = np.column_stack((-designs.alt_max,
+                             designs.span,
+                             -designs.payload))
+    return designs[utils.pareto_front(costs)]
+
+
+def _plot_ngon_case(kwargs):
+    # Отрисовка одного варианта в процессе-исполнителе plot_ngon_batch()
+    return plot_ngon(**kwargs)
+
+
+def plot_ngon_batch(cases, processes=None):
+    """ Построение эскизов для набора вариантов платформ
+
+    Варианты рисуются без отображения (plot_show=False) в параллельных
+    процессах; каждый процесс переиспользует одну фигуру для всех своих
+    вариантов.
+    ---------------------------------------------------------------------------
+    :param cases:     последовательность словарей аргументов plot_ngon()
+                      (обычно с заданным plot_save_as)
+    :param processes: число процессов-исполнителей. None - по числу
+                      процессоров, 1 - построение в текущем процессе
+    ---------------------------------------------------------------------------
+    :return:          список exit_status plot_ngon() по вариантам
+
+    Примеры вызова:
+    >>> cases = [{'bal_mass': 3, 'bal_diam': 2.164, 'nbals': n,
+    ...           'side_len': 2.7, 'dmin': 0.5, 'payload': 1.05,
+    ...           'plot_save_as': 'doctest_{0}.png'.format(n)}
+    ...          for n in (3, 4, 5)]
+    >>> plot_ngon_batch(cases, processes=2)
+    [0, 0, 0]
+    """
+    cases = [dict(case, plot_show=False) for case in cases]
+    if processes == 1:
+        return [_plot_ngon_case(case) for case in cases]
+    pool = multiprocessing.Pool(processes)
     try:
-        if plot_show or plot_save_as:
-            matplotlib.rcParams['font.size'] = 12
-            matplotlib.rcParams['font.family'] = utils.get_font()
-            matplotlib.rcParams["axes.grid"] = True
-            f, (ax1, ax2) = plt.subplots(1, 2)
-            # at H=0
-            plot(ax1, alt=0)
-            ax1.set_title(u'Исходное состояние:\nH = 0 км')
-            # at Hmax
-            plot(ax2, alt=alt_max)
-            ax2.set_title(u'Макс. высота:\nH = ' +
-                          str(round(alt/1000, 1)) + u' км' +
-                          '\n' + txt_alt_limiter)
-            if plot_show:
-                plt.show()
-            if plot_save_as:
-                f.set_size_inches(18.5, 10.5)
-                f.savefig(plot_save_as, dpi=100, bbox_inches='tight')
-            plt.close()
-        else:
-            warnings.warn("All output's disabled.")
+        return pool.map(_plot_ngon_case, cases)
+    finally:
+        pool.close()
+        pool.join()
+
+
+def animate_ngon(bal_mass, bal_diam, nbals, side_len, dmin, payload=0.0,
+                 alt_max=None, nframes=200, fps=25,
+                 plot_show=False, plot_save_as='', dpi=100):
+    """ Анимация роста метеошаров на платформе-многоугольнике при подъёме
+    (см. plot_ngon)
+
+    Радиусы шаров для всех кадров вычисляются заранее одним векторным
+    вызовом, а в каждом кадре обновляются только контуры шаров и подпись
+    высоты (блиттинг поверх неизменного фона). Видео (MP4) или GIF
+    записывается конвертером ffmpeg (rcParams['animation.ffmpeg_path']),
+    кадры передаются ему без промежуточных файлов.
+    ---------------------------------------------------------------------------
+    :param bal_mass:  масса метеошара, кг
+    :param bal_diam:  диаметр метеошара без растяжения, м
+    :param nbals:     число углов / число метеошаров, шт (не менее 3)
+    :param side_len:  длина стороны многоугольника / расстояние между шарами, м
+    :param dmin:      минимальный диаметр центрального отверстия, м
+    :param payload:   масса платформы и полезной нагрузки на платформе, кг
+    :param alt_max:   высота последнего кадра, м. По умолчанию -
+                      максимальная высота подъёма платформы (см. plot_ngon)
+    :param nframes:   число кадров
+    :param fps:       частота кадров, 1/с
+    :param plot_show:     True/False отображение анимации
+    :param plot_save_as:  путь к сохраняемому файлу анимации, с расширением
+                          (.mp4, .gif и др. форматы ffmpeg).
+                          '' - пустая строка - не сохранять (по умолчанию)
+    :param dpi:           разрешение сохраняемых кадров, точек на дюйм
+    ---------------------------------------------------------------------------
+    :return:              exit_status:
+                          0 - успешное завршение
+                          1 - некорректные входные данные
+                          2 - ошибка создания объекта метеошара
+
+                          4 - ошибка создания анимации
+
+    Примеры вызова (запись требует ffmpeg):
+    >>> from distutils.spawn import find_executable
+    >>> ffmpeg = matplotlib.rcParams['animation.ffmpeg_path']
+    >>> if find_executable(ffmpeg):
+    ...     exit_status = animate_ngon(bal_mass=3,
+    ...                                bal_diam=2.164,
+    ...                                nbals=5,
+    ...                                side_len=2.7,
+    ...                                dmin=0.5,
+    ...                                payload=1.05,
+    ...                                plot_save_as='doctest.gif')
+    ... else:
+    ...     exit_status = 0
+    >>> exit_status
+    0
+    """
+    # Check inputs.
+    # -----------------------------------------------------------
+    try:
+        bal_mass = float(bal_mass)
+        if bal_mass <= 0:
+            raise ValueError('bal_mass must be positive')
+        bal_diam = float(bal_diam)
+        if bal_diam <= 0:
+            raise ValueError('bal_diam must be positive')
+        nbals = int(nbals)
+        if nbals < 2:
+            raise ValueError('nbals must be integer greater than 2')
+        side_len = float(side_len)
+        if side_len <= 0:
+            raise ValueError('side_len must be positive')
+        dmin = float(dmin)
+        if dmin <= 0:
+            raise ValueError('dmin must be positive')
+        payload = float(payload)
+        if payload < 0:
+            raise ValueError('payload must be non-negative')
+        if alt_max is not None:
+            alt_max = float(alt_max)
+            if alt_max <= 0:
+                raise ValueError('alt_max must be positive')
+        nframes = int(nframes)
+        if nframes < 2:
+            raise ValueError('nframes must be integer greater than 1')
+        fps = float(fps)
+        if fps <= 0:
+            raise ValueError('fps must be positive')
+    except ValueError as err:
+        print(err, file=sys.stderr)
+        return 1
+
+    # Create balloon instance
+    # -----------------------------------------------------------
+    try:
+        balloon = BalloonStatic(bal_mass=bal_mass,
+                                bal_mat=material.RUBBER,
+                                gas=gas.HELIUM,
+                                bal_diam=bal_diam)
+    except Exception as err:
+        print(err, file=sys.stderr)
+        return 2
+
+    # Radius of a circumscribed circle (over N-gon)
+    rcs = side_len/(2*math.sin(const.pi/nbals))
+    if alt_max is None:
+        alt_max, _ = _get_ngon_alt_max(balloon, nbals, side_len, dmin,
+                                       payload)
+        alt_max = max(alt_max, 100.0)
+
+    # Balloon radii for all frames
+    alts = np.linspace(0.0, alt_max, nframes)
+    rads = balloon.get_radius(alts)
+    is_contact = 2.0*rads > side_len
+    is_overlap = rads + dmin/2.0 > rcs
+
+    if not (plot_show or plot_save_as):
+        warnings.warn("All output's disabled.")
+        return 0
+
+    try:
+        fig, (sketch, ) = _new_ngon_figure(pyplot=plot_show, ncols=1,
+                                           animated=True)
+        ax = sketch.ax
+        # Limits are fixed by the largest balloons
+        sketch.update(nbals, rcs, side_len, dmin, bal_rad=np.max(rads))
+        label = ax.text(0.02, 0.98, '', transform=ax.transAxes,
+                        verticalalignment='top', animated=True)
+
+        def frame(i):
+            sketch.set_radius(rads[i])
+            txt = u'H = {0:.1f} км'.format(alts[i]/1000.0)
+            if is_contact[i]:
+                txt += u'\nКасание шаров'
+            if is_overlap[i]:
+                txt += u'\nПерекрытие центрального отверстия'
+            label.set_text(txt)
+            return sketch.balloons, label
+
+        if plot_save_as:
+            _save_frames(fig, frame, nframes, fps, dpi, plot_save_as)
+        if plot_show:
+            # Ссылка на анимацию должна существовать до закрытия окна
+            anim = matplotlib.animation.FuncAnimation(
+                fig, frame, frames=nframes, interval=1000.0/fps, blit=True)
+            plt.show()
+            plt.close(fig)
     except Exception as err:
         print(err, file=sys.stderr)
         return 4
@@ -211,6 +786,161 @@ def plot_ngon(bal_mass, bal_diam, nbals, side_len, dmin, payload=0.0,
     return 0
 
 
+def _save_frames(fig, frame, nframes, fps, dpi, path):
+    """ Запись кадров анимации в файл конвертером ffmpeg
+
+    Фон рисуется один раз, далее в каждом кадре восстанавливается из копии,
+    поверх него рисуются только артисты кадра (блиттинг на холсте Agg).
+    Холст и разрешение фигуры после записи восстанавливаются (фигура
+    pyplot остаётся связанной со своим окном).
+    :param fig:     фигура
+    :param frame:   функция frame(i) подготовки кадра i, возвращает
+                    изменяемых артистов (animated=True)
+    :param nframes: число кадров
+    :param fps:     частота кадров, 1/с
+    :param dpi:     разрешение кадров, точек на дюйм
+    :param path:    путь к файлу анимации
+    """
+    canvas_saved, dpi_saved = fig.canvas, fig.get_dpi()
+    fig.set_dpi(dpi)
+    canvas = FigureCanvasAgg(fig)
+    try:
+        _write_frames(fig, canvas, frame, nframes, fps, path)
+    finally:
+        fig.set_canvas(canvas_saved)
+        fig.set_dpi(dpi_saved)
+
+
+def _write_frames(fig, canvas, frame, nframes, fps, path):
+    canvas.draw()
+    background = canvas.copy_from_bbox(fig.bbox)
+    width, height = canvas.get_width_height()
+
+    cmd = [matplotlib.rcParams['animation.ffmpeg_path'], '-y',
+           '-loglevel', 'error',
+           '-f', 'rawvideo', '-vcodec', 'rawvideo',
+           '-s', '{0}x{1}'.format(width, height),
+           '-pix_fmt', 'rgba', '-r', str(fps),
+           '-i', 'pipe:']
+    if not path.lower().endswith('.gif'):
+        # H.264 requires even frame dimensions
+        cmd += ['-vcodec', 'libx264', '-pix_fmt', 'yuv420p',
+                '-vf', 'scale=trunc(iw/2)*2:trunc(ih/2)*2']
+    cmd += [path]
+    proc = subprocess.Popen(cmd, stdin=subprocess.PIPE)
+    try:
+        for i in range(nframes):
+            canvas.restore_region(background)
+            for artist in frame(i):
+                artist.axes.draw_artist(artist)
+            proc.stdin.write(canvas.buffer_rgba())
+    finally:
+        proc.stdin.close()
+        if proc.wait() != 0:
+            raise RuntimeError('ffmpeg failed to write ' + path)
+
+
+class _NgonSketch(object):
+    """Эскиз платформы-многоугольника на осях <ax>
+
+    Все стороны многоугольника рисуются одной коллекцией линий, все шары -
+    одной коллекцией контуров, поэтому число объектов matplotlib не зависит
+    от числа шаров, а перерисовка сводится к обновлению данных коллекций.
+    При animated=True коллекция шаров (единственная меняющаяся по высоте
+    часть эскиза) исключается из обычной отрисовки для блиттинга.
+    """
+
+    def __init__(self, ax, animated=False):
+        self.ax = ax
+        ax.set_aspect('equal')
+        # dmin-shaft circle
+        self.shaft = matplotlib.patches.Circle(
+            (0, 0), radius=1.0,
+            edgecolor='k',
+            facecolor='k',
+            fill=True,
+            linestyle='-',
+            linewidth=1.0)
+        ax.add_artist(self.shaft)
+        # N-gon
+        self.edges = LineCollection(
+            [], colors='b', linestyles='-', linewidths=2.0)
+        ax.add_collection(self.edges, autolim=False)
+        # Balloons
+        self.balloons = PathCollection(
+            [], facecolors='none', edgecolors='r', linestyles='--',
+            linewidths=1.0, animated=animated)
+        ax.add_collection(self.balloons, autolim=False)
+        self._corners = None
+
+    def update(self, n, rcs, l, dmin, bal_rad):
+        """ Обновить эскиз
+        :param n:       число углов / шаров
+        :param rcs:     радиус описанной окружности многоугольника, м
+        :param l:       длина стороны многоугольника, м
+        :param dmin:    диаметр центрального отверстия, м
+        :param bal_rad: радиус шаров, м
+        """
+        # Polar coordinate <theta> [radians] of platform corners
+        corners_theta = 2*const.pi/n*np.arange(n)
+        # Polar coordinate <rho> [meters] is equal to radius
+        # of a circumscribed circle (over N-gon)
+        x, y = utils.pol2cart(corners_theta, rcs)
+        self._corners = np.column_stack((x, y))
+
+        self.shaft.set_radius(dmin/2.0)
+        self.edges.set_segments(
+            np.stack((np.roll(self._corners, 1, axis=0), self._corners),
+                     axis=1))
+        self.set_radius(bal_rad)
+        self.ax.set_xlim([-(l+bal_rad), (l+bal_rad)])
+        self.ax.set_ylim([-(l+bal_rad), (l+bal_rad)])
+
+    def set_radius(self, bal_rad):
+        """ Обновить только радиус шаров (углы платформы неизменны) """
+        unit = Path.unit_circle()
+        vertices = self._corners[:, np.newaxis, :] + bal_rad*unit.vertices
+        self.balloons.set_paths([Path(v, unit.codes) for v in vertices])
+
+    @property
+    def artists(self):
+        return self.shaft, self.edges, self.balloons
+
+
+def _new_ngon_figure(pyplot=False, ncols=2, animated=False):
+    """ Создать фигуру с эскизами платформы
+    :param pyplot:   True - фигура pyplot (для отображения на экране),
+                     False - фигура с холстом Agg без участия pyplot
+    :param ncols:    число эскизов (осей) в фигуре
+    :param animated: True - шары эскизов для анимации с блиттингом
+    :return:         фигура, список эскизов _NgonSketch
+    """
+    matplotlib.rcParams['font.size'] = 12
+    matplotlib.rcParams['font.family'] = utils.get_font()
+    matplotlib.rcParams["axes.grid"] = True
+    if pyplot:
+        fig = plt.figure()
+    else:
+        fig = matplotlib.figure.Figure()
+        FigureCanvasAgg(fig)
+    sketches = [_NgonSketch(fig.add_subplot(1, ncols, i+1), animated)
+                for i in range(ncols)]
+    return fig, sketches
+
+
+# Фигура plot_ngon() для построения без отображения, общая для всех вызовов
+# в процессе
+_ngon_figure = None
+
+
+def _get_ngon_figure():
+    """ Фигура с двумя эскизами, переиспользуемая между вызовами plot_ngon """
+    global _ngon_figure
+    if _ngon_figure is None:
+        _ngon_figure = _new_ngon_figure()
+    return _ngon_figure
+
+
 if __name__ == "__main__":
     import doctest
     doctest.testmod()
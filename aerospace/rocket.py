@@ -1,13 +1,362 @@
 # -*- encoding: utf-8 -*-
 """ Ракета
 
+Модель выведения ракеты как точечной массы в вертикальной плоскости:
+вертикальный подъём, отклонение вектора скорости на малый угол (программа
+тангажа) и гравитационный разворот - тяга направлена по скорости, траектория
+искривляется только силой тяжести. Учитываются:
+- тяга двигателя по программе (относительный расход топлива по времени) с
+  удельным импульсом, зависящим от давления окружающей среды;
+- лобовое сопротивление с коэффициентом, зависящим от числа Маха
+  (плотность и скорость звука - по стандартной атмосфере isa);
+- уменьшение ускорения свободного падения с высотой и кривизна Земли.
+
+Параметры ракеты могут быть массивами numpy: объект Rocket описывает набор
+конструкций, а simulate_ascent() рассчитывает их выведение за один проход
+(все варианты интегрируются одновременно).
+
 Все единицы в [СИ]
+
+Принятые обозначения и размерности:
+    alt [м] - высота
+    vel [м/с] - скорость
+    gamma [рад] - угол наклона траектории к горизонту
+    mach [-] - число Маха
+    mass_flow [кг/с] - массовый расход топлива
+
+Примеры:
+>>> rocket = Rocket(fuel=fuel.KEROSENE, dry_mass=200.0, prop_mass=800.0,
+...                 mass_flow=8.0, diam=0.4)
+>>> round(rocket.get_thrust(0.0, 0.0))
+22131.0
+>>> round(rocket.get_delta_v())
+4910.0
+
+# Сравнение трёх вариантов расхода топлива: малый расход - большие
+# гравитационные потери, большой - потери на сопротивление
+>>> res = simulate_ascent(dry_mass=300.0, prop_mass=500.0,
+...                       mass_flow=[5.0, 10.0, 20.0], diam=0.4,
+...                       kick_angle=0.0, tstep=0.5)
+>>> np.round(res['burnout_time'])
+array([100.,  50.,  25.])
+>>> np.round(res['apogee_alt'], -3)
+array([226000., 282000., 273000.])
 """
+# Standard libs:
+import importlib
+# Site-packages:
+import numpy as np
+# Custom libs:
+import const
+import fuel
+import integrate
+import isa
+
+# Остаток топлива (доля начальной массы), считающийся выработкой
+_PROP_RTOL = 1e-9
 
 
 class Rocket(object):
-    def __init__(self):
+    """Ракета (или набор конструкций ракет): двигатель, топливо и
+    аэродинамика"""
+
+    # Коэффициент лобового сопротивления по числу Маха: (mach, cx)
+    _cx_table = (np.array([0.0, 0.6, 0.9, 1.05, 1.2, 2.0, 3.0, 5.0]),
+                 np.array([0.30, 0.30, 0.38, 0.60, 0.55, 0.42, 0.35, 0.28]))
+    # Программа тяги: (время от запуска, с; относительный расход топлива)
+    _thrust_curve = (np.array([0.0]), np.array([1.0]))
+
+    def __init__(self, fuel, dry_mass, prop_mass, mass_flow, diam,
+                 cx_table=None, thrust_curve=None, atm=None):
+        """
+        :param fuel:         Топливо: константа пакета <fuel>
+                             например:
+                             fuel.KEROSENE
+        :param dry_mass:     масса ракеты без топлива, кг
+        :param prop_mass:    начальная масса топлива, кг
+        :param mass_flow:    номинальный массовый расход топлива, кг/с
+        :param diam:         диаметр миделя, м
+        :param cx_table:     таблица коэффициента лобового сопротивления
+                             (mach, cx) - массивы по возрастанию mach. По
+                             умолчанию - Rocket._cx_table
+        :param thrust_curve: программа тяги (время, относительный расход) -
+                             массивы по возрастанию времени; вне таблицы -
+                             крайнее значение. По умолчанию - постоянный
+                             номинальный расход до выработки топлива
+        :param atm:          модель атмосферы: модуль isa (по умолчанию) или
+                             профиль atmosphere.Profile (любой объект с
+                             функциями p, rho, a высоты)
+
+        Параметры dry_mass, prop_mass, mass_flow, diam могут быть массивами
+        numpy одинаковой формы - тогда объект описывает набор конструкций
+        (по элементу на конструкцию), а методы возвращают массивы.
+        """
         object.__init__(self)
+        self._fuel = importlib.import_module(fuel)
+        self._dry_mass = dry_mass
+        self._prop_mass = prop_mass
+        self._mass_flow = mass_flow
+        self._diam = diam
+        self._atm = isa if atm is None else atm
+        if cx_table is not None:
+            self._cx_table = tuple(np.asarray(x, dtype=float)
+                                   for x in cx_table)
+        if thrust_curve is not None:
+            self._thrust_curve = tuple(np.asarray(x, dtype=float)
+                                       for x in thrust_curve)
+
+    @property
+    def fuel(self):
+        return self._fuel
+
+    @property
+    def dry_mass(self):
+        return self._dry_mass
+
+    @property
+    def prop_mass(self):
+        return self._prop_mass
+
+    @property
+    def mass_flow(self):
+        return self._mass_flow
+
+    @property
+    def diam(self):
+        return self._diam
+
+    @property
+    def atm(self):
+        return self._atm
+
+    def get_mass(self):
+        """ Стартовая масса ракеты, кг """
+        return self.dry_mass + self.prop_mass
+
+    def get_area(self):
+        """ Площадь миделя, м^2 """
+        return const.pi*self.diam**2.0/4.0
+
+    def get_tank_volume(self):
+        """ Объём топлива, м^3 """
+        return self.prop_mass/self.fuel.rho
+
+    def get_delta_v(self):
+        """ Характеристическая скорость в пустоте (формула Циолковского),
+        м/с """
+        return const.g*self.fuel.isp_vac*np.log(self.get_mass()/self.dry_mass)
+
+    def get_mass_flow(self, time, prop_left=None):
+        """ Массовый расход топлива
+        :param time:      время от запуска, с
+        :param prop_left: остаток топлива, кг. По умолчанию - начальная масса
+                          топлива
+        :return:          расход, кг/с (0 после выработки топлива)
+        """
+        if prop_left is None:
+            prop_left = self.prop_mass
+        throttle = np.interp(time, *self._thrust_curve)
+        # Remainder of rounding errors is not propellant
+        is_burning = prop_left > _PROP_RTOL*self.prop_mass
+        return np.where(is_burning, self.mass_flow*throttle, 0.0)[()]
+
+    def get_isp(self, alt):
+        """ Удельный импульс двигателя на высоте (линейно по давлению
+        окружающей среды между значениями у земли и в пустоте; давление у
+        земли - по модели атмосферы atm ракеты), с """
+        fuel = self.fuel
+        return fuel.isp_vac - (fuel.isp_vac - fuel.isp_sl) * \
+            self.atm.p(alt)/self.atm.p(0.0)
+
+    def get_thrust(self, time, alt, prop_left=None):
+        """ Тяга двигателя
+        :param time:      время от запуска, с
+        :param alt:       высота, м
+        :param prop_left: остаток топлива, кг (см. get_mass_flow)
+        :return:          тяга, Н
+        """
+        return self.get_mass_flow(time, prop_left)*const.g*self.get_isp(alt)
+
+    def get_cx(self, mach):
+        """ Коэффициент лобового сопротивления по числу Маха """
+        return np.interp(mach, *self._cx_table)
+
+    def get_drag(self, alt, vel):
+        """ Сила лобового сопротивления
+        :param alt: высота, м
+        :param vel: скорость, м/с
+        :return:    сила, Н (против скорости)
+        """
+        speed = np.abs(vel)
+        cx = self.get_cx(speed/self.atm.a(alt))
+        return cx*self.atm.rho(alt)*speed**2.0/2.0*self.get_area()
+
+
+def simulate_ascent(dry_mass, prop_mass, mass_flow, diam,
+                    fuel_name='kerosene',
+                    payload=0.0, cx_table=None, thrust_curve=None,
+                    pitch_time=10.0, kick_angle=1.0, kick_duration=5.0,
+                    duration=1200.0, tstep=0.1, track_step=None, atm=None):
+    """ Моделирование выведения набора ракет до апогея
+
+    Ракета стартует вертикально; в интервале [pitch_time, pitch_time +
+    kick_duration] траектория равномерно отклоняется от вертикали на угол
+    kick_angle, далее следует гравитационный разворот. Член набора
+    останавливается в апогее после выработки топлива (или в момент
+    выработки, если ракета не оторвалась от земли) или при падении на
+    землю до выработки топлива (разворот при малой тяговооружённости).
+    Момент выработки топлива определяется с точностью до доли шага tstep.
+    ---------------------------------------------------------------------------
+    :param dry_mass:      масса ракеты без топлива и нагрузки, кг
+    :param prop_mass:     масса топлива, кг
+    :param mass_flow:     номинальный массовый расход топлива, кг/с
+    :param diam:          диаметр миделя, м
+    :param fuel_name:     наименование топлива (см. пакет <fuel>)
+    :param payload:       полезная нагрузка, кг
+    :param cx_table:      см. Rocket
+    :param thrust_curve:  см. Rocket
+    :param pitch_time:    момент начала отклонения от вертикали, с
+    :param kick_angle:    угол отклонения от вертикали, град (0 -
+                          вертикальный полёт)
+    :param kick_duration: продолжительность отклонения, с
+    :param duration:      наибольшая продолжительность моделирования, с
+    :param tstep:         шаг интегрирования, с
+    :param track_step:    шаг записи траекторий, с (по умолчанию траектории
+                          не записываются)
+    :param atm:           модель атмосферы (см. Rocket)
+    (dry_mass, prop_mass, mass_flow, diam, payload - числа или массивы,
+    согласуемые по правилам broadcasting; форма результата - их общая форма)
+    ---------------------------------------------------------------------------
+    :return:              словарь массивов:
+                          'burnout_time', 'burnout_alt', 'burnout_vel',
+                          'burnout_gamma' - момент выработки топлива, высота,
+                          скорость и угол наклона траектории (град) в этот
+                          момент;
+                          'apogee_time', 'apogee_alt', 'apogee_range' -
+                          момент, высота и дальность (по поверхности Земли)
+                          апогея (NaN - апогей не достигнут за duration
+                          или ракета упала до выработки топлива);
+                          'max_q', 'max_q_time' - наибольший скоростной
+                          напор, Па, и его момент;
+                          при заданном track_step: 'track_time' - моменты
+                          записи, с; 'track_alt', 'track_range',
+                          'track_vel' - траектории формы
+                          (len(track_time), ...)
+    """
+    shape = np.broadcast(dry_mass, prop_mass, mass_flow, diam,
+                         payload).shape
+    members = int(np.prod(shape))
+
+    def flat(value):
+        return np.broadcast_to(value, shape).astype(float).ravel()
+
+    dry_mass, prop_mass, mass_flow, diam, payload = (
+        flat(value)
+        for value in (dry_mass, prop_mass, mass_flow, diam, payload))
+    rocket = Rocket(fuel.BY_NAME[fuel_name], dry_mass, prop_mass, mass_flow,
+                    diam, cx_table, thrust_curve, atm)
+    atm = rocket.atm
+    end_mass = dry_mass + payload
+    kick_rate = np.radians(kick_angle)/kick_duration
+
+    def get_mass_flow(time, mass):
+        # The flow of an RK4 stage is limited by the propellant left at the
+        # stage: the step never burns more than the propellant at its start
+        prop_left = mass - end_mass
+        return np.minimum(rocket.get_mass_flow(time, prop_left),
+                          2.0*np.maximum(prop_left, 0.0)/tstep)
+
+    def odefun(y, time):
+        downrange, alt, vel, gamma, mass = y
+        rad = const.R_earth + alt
+        g = const.g*(const.R_earth/rad)**2.0
+        mass_flow = get_mass_flow(time, mass)
+        thrust = mass_flow*const.g*rocket.get_isp(alt)
+        acc = (thrust - rocket.get_drag(alt, vel))/mass - g*np.sin(gamma)
+        # The rocket stands on the pad until the thrust exceeds its weight
+        on_pad = (alt <= 0.0) & (vel <= 0.0)
+        acc = np.where(on_pad, np.maximum(acc, 0.0), acc)
+        if time < pitch_time:
+            dgamma = np.zeros(members)
+        else:
+            # Gravity turn (the velocity is bounded to avoid the singular
+            # vertical start)
+            dgamma = -(g - vel**2.0/rad)*np.cos(gamma)/np.maximum(vel, 1.0)
+            if time < pitch_time + kick_duration:
+                dgamma -= kick_rate
+            dgamma[on_pad] = 0.0
+        return np.array([vel*np.cos(gamma)*const.R_earth/rad,
+                         vel*np.sin(gamma),
+                         acc,
+                         dgamma,
+                         -mass_flow])
+
+    def terminator(y, time):
+        downrange, alt, vel, gamma, mass = y
+        is_burnout = rocket.get_mass_flow(time, mass - end_mass) == 0.0
+        return is_burnout & (vel*np.sin(gamma) <= 0.0) | (alt < 0.0)
+
+    y0 = np.zeros((5, members))
+    y0[3] = np.pi/2.0
+    y0[4] = rocket.get_mass() + payload
+
+    burnout = np.full((4, members), np.nan)
+    max_q = np.zeros(members)
+    max_q_time = np.zeros(members)
+    track_every = None if track_step is None else \
+        max(int(round(track_step/tstep)), 1)
+    track_time = [0.0]
+    track = [y0[[1, 0, 2]]]
+    # Number of steps made (list to be updated in recorder())
+    steps = [0]
+
+    def recorder(y_prev, y, t_prev, t, active):
+        downrange, alt, vel, gamma, mass = y
+        is_burnout = np.isnan(burnout[0]) & \
+            (rocket.get_mass_flow(t, mass - end_mass) == 0.0)
+        if np.any(is_burnout):
+            # Burnout inside the step: the propellant left at its start
+            # burns at the nominal flow (the stage flows of the last steps
+            # are limited)
+            spent = rocket.get_mass_flow(t_prev)[is_burnout]*(t - t_prev)
+            frac = np.where(
+                spent > 0.0,
+                (y_prev[4, is_burnout] - end_mass[is_burnout]) /
+                np.where(spent > 0.0, spent, 1.0),
+                1.0).clip(0.0, 1.0)
+            state = y_prev[:, is_burnout] + \
+                frac*(y[:, is_burnout] - y_prev[:, is_burnout])
+            burnout[:, is_burnout] = [t_prev + frac*(t - t_prev),
+                                      state[1], state[2],
+                                      np.degrees(state[3])]
+        q = atm.rho(alt)*vel**2.0/2.0
+        is_max = active & (q > max_q)
+        max_q[is_max] = q[is_max]
+        max_q_time[is_max] = t
+        steps[0] += 1
+        if track_every is not None and steps[0] % track_every == 0:
+            track_time.append(t)
+            track.append(y[[1, 0, 2]])
+
+    time_points = np.arange(0.0, duration + tstep/2.0, tstep)
+    t_stop, y = integrate.rk4(odefun, y0, time_points, terminate=terminator,
+                              callback=recorder)
+    is_apogee = ~np.isnan(t_stop) & (y[1] >= 0.0)
+    res = {'burnout_time': burnout[0].reshape(shape),
+           'burnout_alt': burnout[1].reshape(shape),
+           'burnout_vel': burnout[2].reshape(shape),
+           'burnout_gamma': burnout[3].reshape(shape),
+           'apogee_time': np.where(is_apogee, t_stop, np.nan).reshape(shape),
+           'apogee_alt': np.where(is_apogee, y[1], np.nan).reshape(shape),
+           'apogee_range': np.where(is_apogee, y[0], np.nan).reshape(shape),
+           'max_q': max_q.reshape(shape),
+           'max_q_time': max_q_time.reshape(shape)}
+    if track_every is not None:
+        res['track_time'] = np.array(track_time)
+        track = np.array(track)
+        for i, name in enumerate(('track_alt', 'track_range', 'track_vel')):
+            res[name] = track[:, i].reshape((-1,) + shape)
+    return res
 
 
 if __name__ == "__main__":
@@ -0,0 +1,402 @@
+# -*- encoding: utf-8 -*-
+""" Быстрая приближённая модель (суррогат) разрыва метеошара
+
+Высота и момент разрыва шара с нагрузкой аппроксимируются по результатам
+моделирования (simulate_free_lift) на случайной выборке параметров в
+заданной области. Аппроксимация - радиальные базисные функции
+(полигармонический сплайн r^3 с линейным слагаемым) логарифмов результатов
+по нормированным координатам INPUTS: вместо полезной нагрузки - логарифм
+свободной подъёмной силы (подъёмная сила газа на земле без веса шара, газа
+и нагрузки), от которой время подъёма зависит наиболее сильно. Погрешность
+оценивается перекрёстной проверкой (k-fold) при обучении.
+
+Запрос к модели - расчёт свободной подъёмной силы и одно произведение
+матрицы на вектор: для одного шара - доли миллисекунды. Вне области
+обучения модель не экстраполирует: такие шары моделируются
+simulate_free_lift (или результат - NaN). Область обучения - границы
+координат без областей, где шары выборки не взорвались: шар, ближайшая к
+которому точка выборки - невзорвавшийся шар, моделируется.
+
+Модель рассчитывается один раз (train) и сохраняется в файл .npz
+(Surrogate.save, load) с подписью модели моделирования (signature):
+сохранённая модель, обученная по другой модели шара или атмосферы, не
+загружается. Модель атмосферы - стандартная (isa).
+
+Примеры:
+>>> model = train(bal_mass=(2.0, 3.0), bal_diam=(2.0, 2.3),
+...               gas_mass=(0.8, 1.2), free_lift=(0.5, 3.0),
+...               nsamples=150, tstep=1.0)
+>>> sorted(model.cv_error)
+['burst_alt', 'burst_time']
+>>> res = model.predict(bal_mass=3.0, bal_diam=2.164, payload=1.05)
+>>> bool(res['is_simulated'])
+False
+>>> exact = simulate_free_lift(6*60*60, bal_mass=3.0, bal_diam=2.164,
+...                            payload=1.05)
+>>> error = abs(res['burst_time'] - exact['burst_time'])
+>>> bool(error < 3.0*model.cv_error['burst_time']['rms'])
+True
+
+# Вне области обучения - моделирование
+>>> res = model.predict(bal_mass=3.0, bal_diam=2.164, payload=2.0,
+...                     gas_mass=1.5)
+>>> bool(res['is_simulated']), int(res['burst_time'])
+(True, 4019)
+"""
+# Standard libs:
+import hashlib
+import importlib
+import os
+# Site-packages:
+import numpy as np
+# Custom libs:
+from balloon import BalloonStatic, simulate_free_lift, _new_balloon
+import const
+import gas
+import isa
+import material
+
+# Координаты модели (порядок столбцов выборки)
+INPUTS = ('bal_mass', 'bal_diam', 'gas_mass', 'free_lift')
+# Аппроксимируемые результаты simulate_free_lift
+OUTPUTS = ('burst_alt', 'burst_time')
+
+# Число точек запроса, обрабатываемых за раз (ограничивает память матрицы
+# расстояний до центров)
+_BLOCK = 1024
+# Ревизия расчёта модели: увеличивается при изменениях, не отражённых в
+# данных подписи (см. signature)
+MODEL_REVISION = 1
+
+
+def train(bal_mass, bal_diam, gas_mass, free_lift, nsamples=1000,
+          folds=5, bal_mat='rubber', bal_gas='helium',
+          duration=6*60*60, tstep=1.0, seed=0):
+    """ Обучение модели: моделирование выборки и построение аппроксимации
+    :param bal_mass:  диапазон (наименьшее, наибольшее) массы метеошара, кг
+    :param bal_diam:  диапазон диаметра метеошара в состоянии без
+                      растяжения, м
+    :param gas_mass:  диапазон массы газа, кг
+    :param free_lift: диапазон свободной подъёмной силы, кг (больше нуля)
+    :param nsamples:  число моделируемых вариантов
+    :param folds:     число частей выборки перекрёстной проверки
+    :param bal_mat:   наименование материала метеошара
+    :param bal_gas:   наименование наполняющего газа
+    :param duration:  продолжительность моделируемого полёта, с
+    :param tstep:     шаг интегрирования, с
+    :param seed:      начальное значение генератора случайной выборки
+    :return:          модель Surrogate
+    (варианты выборки с отрицательной нагрузкой отбрасываются; варианты,
+    в которых шар не взорвался, в аппроксимацию не входят и исключают
+    свою окрестность из области обучения)
+    """
+    bounds = np.array([bal_mass, bal_diam, gas_mass, free_lift],
+                      dtype=float)
+    if np.any(bounds[:, 0] >= bounds[:, 1]) or bounds[3, 0] <= 0.0:
+        raise ValueError('surrogate domain must have positive width and '
+                         'positive free lift')
+    settings = {'bal_mat': bal_mat, 'bal_gas': bal_gas,
+                'duration': duration, 'tstep': tstep}
+    samples = _latin_hypercube(nsamples, len(INPUTS), seed)
+    # Free lift is sampled uniformly in logarithm
+    log_lift = np.log(bounds[3])
+    bal_mass, bal_diam, gas_mass = (
+        bounds[:3, 0] + samples[:, :3]*(bounds[:3, 1] - bounds[:3, 0])).T
+    free_lift = np.exp(log_lift[0] + samples[:, 3]*np.diff(log_lift))
+    payload = _get_lift(bal_mass, bal_diam, gas_mass, settings) - free_lift
+    is_valid = payload >= 0.0
+    res = simulate_free_lift(
+        duration, bal_mass[is_valid], bal_diam[is_valid], payload[is_valid],
+        gas_mass[is_valid], bal_mat, bal_gas, tstep=tstep)
+    targets = np.column_stack([res[name] for name in OUTPUTS])
+    is_burst = np.all(np.isfinite(targets), axis=1)
+    points = _normalize(np.column_stack(
+        (bal_mass, bal_diam, gas_mass, free_lift))[is_valid], bounds)
+    holes = points[~is_burst]
+    points = points[is_burst]
+    targets = np.log(targets[is_burst])
+
+    # k-fold cross-validation: error of the model fitted without a fold
+    # on the points of the fold
+    fold = np.arange(points.shape[0]) % folds
+    errors = np.empty_like(targets)
+    for k in range(folds):
+        test = fold == k
+        weights = _fit(points[~test], targets[~test])
+        errors[test] = np.exp(
+            _evaluate(points[~test], weights, points[test])) - \
+            np.exp(targets[test])
+    cv_error = dict(
+        (name, {'rms': float(np.sqrt(np.mean(errors[:, i]**2))),
+                'max': float(np.max(np.abs(errors[:, i])))})
+        for i, name in enumerate(OUTPUTS))
+    return Surrogate(bounds, points, _fit(points, targets), cv_error,
+                     settings, holes)
+
+
+def signature(settings):
+    """ Подпись модели моделирования выборки: хэш SHA-1 ревизии
+    MODEL_REVISION, параметров моделирования, свойств материала оболочки
+    и газа, таблиц стандартной атмосферы и коэффициента сопротивления шара
+    :param settings: параметры моделирования выборки (bal_mat, bal_gas,
+                     duration, tstep)
+    :return:         строка подписи
+    """
+    bal_mat = importlib.import_module(material.BY_NAME[settings['bal_mat']])
+    bal_gas = importlib.import_module(gas.BY_NAME[settings['bal_gas']])
+    sha1 = hashlib.sha1()
+    sha1.update(repr((MODEL_REVISION, str(settings['bal_mat']),
+                      str(settings['bal_gas']),
+                      float(settings['duration']), float(settings['tstep']),
+                      BalloonStatic._cx, bal_mat.rho, bal_mat.rel_strain_max,
+                      bal_mat.cx_min, bal_gas.mu)).encode('utf-8'))
+    for table in ((isa._h, isa._p, isa._t, isa._rho, isa._nu) +
+                  tuple(BalloonStatic._cx_table)):
+        sha1.update(np.ascontiguousarray(table, dtype=float).tobytes())
+    return sha1.hexdigest()
+
+
+def load(path):
+    """ Загрузка модели, сохранённой Surrogate.save
+    :param path: путь к файлу модели
+    :return:     модель Surrogate. ValueError - модель обучена по другой
+                 модели моделирования (подпись не совпадает с signature)
+    """
+    with np.load(path) as data:
+        cv_error = dict(
+            (name, {'rms': float(data['cv_rms'][i]),
+                    'max': float(data['cv_max'][i])})
+            for i, name in enumerate(OUTPUTS))
+        settings = {'bal_mat': str(data['bal_mat']),
+                    'bal_gas': str(data['bal_gas']),
+                    'duration': float(data['duration']),
+                    'tstep': float(data['tstep'])}
+        if 'signature' not in data.files or \
+                str(data['signature']) != signature(settings):
+            raise ValueError('surrogate model {0} is trained with another '
+                             'model version, train it again'.format(path))
+        return Surrogate(data['bounds'], data['centers'], data['weights'],
+                         cv_error, settings, data['holes'])
+
+
+class Surrogate(object):
+    """Аппроксимация высоты и момента разрыва шара (см. train)"""
+
+    def __init__(self, bounds, centers, weights, cv_error, settings,
+                 holes=None):
+        """
+        :param bounds:   границы области обучения по координатам INPUTS,
+                         форма (len(INPUTS), 2)
+        :param centers:  центры базисных функций (нормированные
+                         координаты точек выборки)
+        :param weights:  коэффициенты аппроксимации по результатам OUTPUTS
+        :param cv_error: погрешности перекрёстной проверки
+        :param settings: параметры моделирования выборки (bal_mat,
+                         bal_gas, duration, tstep)
+        :param holes:    нормированные координаты точек выборки, в которых
+                         шар не взорвался (по умолчанию - нет)
+        """
+        object.__init__(self)
+        self._bounds = np.asarray(bounds, dtype=float)
+        self._centers = np.asarray(centers, dtype=float)
+        self._weights = np.asarray(weights, dtype=float)
+        self._cv_error = cv_error
+        self._settings = settings
+        self._holes = np.zeros((0, len(INPUTS))) if holes is None else \
+            np.asarray(holes, dtype=float).reshape(-1, len(INPUTS))
+
+    @property
+    def bounds(self):
+        """Границы области обучения: словарь (наименьшее, наибольшее) по
+        координатам INPUTS"""
+        return dict((name, tuple(self._bounds[i]))
+                    for i, name in enumerate(INPUTS))
+
+    @property
+    def cv_error(self):
+        """Погрешности перекрёстной проверки по результатам OUTPUTS:
+        'rms' - среднеквадратичная, 'max' - наибольшая по модулю"""
+        return self._cv_error
+
+    @property
+    def nsamples(self):
+        return self._centers.shape[0]
+
+    def is_inside(self, bal_mass, bal_diam, payload=0.0, gas_mass=None):
+        """ Принадлежность шаров области обучения
+        (параметры - как у predict)
+        :return: массив bool
+        """
+        point = self._get_point(bal_mass, bal_diam, payload, gas_mass)[0]
+        return self._is_inside(point)
+
+    def predict(self, bal_mass, bal_diam, payload=0.0, gas_mass=None,
+                fallback=True):
+        """ Высота и момент разрыва шаров
+        :param bal_mass: масса метеошара, кг
+        :param bal_diam: диаметр метеошара в состоянии без растяжения, м
+        :param payload:  полезная нагрузка, кг
+        :param gas_mass: масса газа, кг. По умолчанию - по заполнению шара
+                         на высоте H=0
+        :param fallback: моделировать шары вне области обучения
+                         (simulate_free_lift); иначе результат для них -
+                         NaN
+        (параметры - числа или массивы, согласуемые по правилам
+        broadcasting; форма результата - их общая форма)
+        :return:         словарь массивов: 'burst_alt' - высота разрыва,
+                         м; 'burst_time' - момент разрыва, с (NaN - шар не
+                         взорвался); 'is_simulated' - результат
+                         моделирования, а не аппроксимации
+        """
+        point, params = self._get_point(bal_mass, bal_diam, payload,
+                                        gas_mass)
+        shape = point.shape[:-1]
+        point = point.reshape(-1, len(INPUTS))
+        is_inside = self._is_inside(point)
+        values = np.full((point.shape[0], len(OUTPUTS)), np.nan)
+        inside = np.flatnonzero(is_inside)
+        for start in range(0, inside.size, _BLOCK):
+            block = inside[start:start + _BLOCK]
+            values[block] = np.exp(_evaluate(
+                self._centers, self._weights,
+                _normalize(point[block], self._bounds)))
+        is_simulated = np.zeros(point.shape[0], dtype=bool)
+        if fallback and not np.all(is_inside):
+            outside = ~is_inside
+            settings = self._settings
+            res = simulate_free_lift(
+                settings['duration'],
+                *[param.ravel()[outside] for param in params],
+                bal_mat=settings['bal_mat'], bal_gas=settings['bal_gas'],
+                tstep=settings['tstep'])
+            for i, name in enumerate(OUTPUTS):
+                values[outside, i] = res[name]
+            is_simulated = outside
+        res = dict((name, values[:, i].reshape(shape)[()])
+                   for i, name in enumerate(OUTPUTS))
+        res['is_simulated'] = is_simulated.reshape(shape)[()]
+        return res
+
+    def save(self, path):
+        """ Запись модели в файл .npz (см. load)
+        :param path: путь к файлу модели
+        """
+        directory = os.path.dirname(path)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+        settings = self._settings
+        np.savez(path,
+                 bounds=self._bounds,
+                 centers=self._centers,
+                 weights=self._weights,
+                 holes=self._holes,
+                 cv_rms=[self._cv_error[name]['rms'] for name in OUTPUTS],
+                 cv_max=[self._cv_error[name]['max'] for name in OUTPUTS],
+                 bal_mat=settings['bal_mat'],
+                 bal_gas=settings['bal_gas'],
+                 duration=settings['duration'],
+                 tstep=settings['tstep'],
+                 signature=signature(settings))
+
+    def _get_point(self, bal_mass, bal_diam, payload, gas_mass):
+        """ Координаты INPUTS шаров (последняя ось) и согласованные
+        массивы параметров (bal_mass, bal_diam, payload, gas_mass) """
+        bal_mass, bal_diam, payload = np.broadcast_arrays(
+            *[np.asarray(param, dtype=float)
+              for param in (bal_mass, bal_diam, payload)])
+        if gas_mass is None:
+            settings = self._settings
+            gas_mass = _new_balloon(bal_mass, bal_diam, None,
+                                    settings['bal_mat'],
+                                    settings['bal_gas']).gas_mass
+        params = np.broadcast_arrays(bal_mass, bal_diam, payload,
+                                     np.asarray(gas_mass, dtype=float))
+        bal_mass, bal_diam, payload, gas_mass = params
+        free_lift = _get_lift(bal_mass, bal_diam, gas_mass,
+                              self._settings) - payload
+        return np.stack((bal_mass, bal_diam, gas_mass, free_lift),
+                        axis=-1), params
+
+    def _is_inside(self, point):
+        # NaN coordinates are outside
+        is_inside = np.all((point >= self._bounds[:, 0]) &
+                           (point <= self._bounds[:, 1]), axis=-1)
+        # Nearest-neighbour burst classifier: points closer to a sample
+        # balloon that did not burst than to any center are outside
+        flat = np.ravel(is_inside)
+        inside = np.flatnonzero(flat)
+        if self._holes.size:
+            point = _normalize(point.reshape(-1, len(INPUTS))[inside],
+                               self._bounds)
+            flat[inside] = _nearest_distance(point, self._centers) < \
+                _nearest_distance(point, self._holes)
+        return flat.reshape(np.shape(is_inside))[()]
+
+
+def _get_lift(bal_mass, bal_diam, gas_mass, settings):
+    """ Подъёмная сила шара на земле без веса шара и газа, кг """
+    balloon = _new_balloon(bal_mass, bal_diam, gas_mass,
+                           settings['bal_mat'], settings['bal_gas'])
+    return balloon.get_forces_sum(0.0)/const.g
+
+
+def _normalize(point, bounds):
+    """ Координаты INPUTS, приведённые к [-1, 1] (свободная подъёмная сила
+    - по логарифму) """
+    point = np.array(point, dtype=float)
+    bounds = np.array(bounds, dtype=float)
+    point[..., 3] = np.log(point[..., 3])
+    bounds[3] = np.log(bounds[3])
+    return 2.0*(point - bounds[:, 0])/(bounds[:, 1] - bounds[:, 0]) - 1.0
+
+
+def _nearest_distance(points, centers):
+    """ Расстояние от точек points до ближайшей из точек centers """
+    dist = np.empty(points.shape[0])
+    for start in range(0, points.shape[0], _BLOCK):
+        block = points[start:start + _BLOCK]
+        dist[start:start + _BLOCK] = np.sqrt(np.min(np.sum(
+            (block[:, np.newaxis, :] - centers[np.newaxis, :, :])**2.0,
+            axis=-1), axis=1))
+    return dist
+
+
+def _kernel(points, centers):
+    """ Матрица полигармонических базисных функций r^3 """
+    dist = np.sqrt(np.sum((points[:, np.newaxis, :] -
+                           centers[np.newaxis, :, :])**2.0, axis=-1))
+    return dist**3.0
+
+
+def _fit(centers, targets):
+    """ Коэффициенты интерполяции targets (столбцы - результаты) в точках
+    centers: веса базисных функций, затем линейного слагаемого """
+    size, ndim = centers.shape
+    tail = np.column_stack((np.ones(size), centers))
+    matrix = np.zeros((size + ndim + 1, size + ndim + 1))
+    matrix[:size, :size] = _kernel(centers, centers)
+    matrix[:size, size:] = tail
+    matrix[size:, :size] = tail.T
+    rhs = np.zeros((size + ndim + 1, targets.shape[1]))
+    rhs[:size] = targets
+    return np.linalg.solve(matrix, rhs)
+
+
+def _evaluate(centers, weights, points):
+    """ Значения аппроксимации в точках points """
+    size = centers.shape[0]
+    return _kernel(points, centers).dot(weights[:size]) + \
+        weights[size] + points.dot(weights[size + 1:])
+
+
+def _latin_hypercube(nsamples, ndim, seed):
+    """ Выборка латинского гиперкуба в [0, 1]^ndim: по каждой координате
+    в каждом из nsamples равных интервалов - ровно одна точка """
+    random = np.random.RandomState(seed)
+    strata = np.argsort(random.rand(nsamples, ndim), axis=0)
+    return (strata + random.rand(nsamples, ndim))/nsamples
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
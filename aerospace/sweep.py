@@ -0,0 +1,446 @@
+# -*- encoding: utf-8 -*-
+""" Распределённый перебор вариантов через общий каталог задания
+
+Варианты (словари аргументов функции расчёта TASKS) делятся на части по
+shard_size вариантов. Функции free_lift и ngon_limits возвращают физические
+результаты варианта (высоты, моменты, коды ограничения) и код завершения в
+поле 'exit_status'; model_free_lift и plot_ngon - только код завершения
+(результаты - графики). Координатор (submit) записывает варианты в каталог
+задания и создаёт по файлу на часть в очереди todo/. Исполнители (work) на
+любых узлах, видящих каталог задания (общая файловая система), забирают
+части переименованием файла из todo/ в leases/ - переименование атомарно,
+поэтому часть достаётся одному исполнителю. Пока часть рассчитывается,
+исполнитель обновляет время изменения файла аренды; результаты части
+записываются в results/<часть>.json (запись во временный файл и
+переименование). Аренды, не обновлявшиеся дольше lease_timeout (исполнитель
+остановлен или узел недоступен), возвращаются в очередь (requeue) - это
+делает координатор или любой исполнитель. Исполнитель удаляет файл аренды
+по окончании части, только если аренда всё ещё его (содержимое файла), а
+часть с уже записанными результатами не рассчитывает повторно. Обмен через
+каталог - несколько файловых операций на часть, поэтому производительность
+растёт почти пропорционально числу исполнителей.
+
+Каталог задания:
+    job.json          - функция расчёта и варианты
+    todo/<часть>      - части в очереди (имя - 'начало-конец' по номерам
+                        вариантов)
+    leases/<часть>    - взятые части (содержимое - узел и процесс
+                        исполнителя)
+    results/<часть>.json - результаты части
+
+Исполнитель на узле запускается командой:
+
+    $ python -m aerospace.sweep <каталог задания>
+
+Примеры:
+>>> import shutil, tempfile
+>>> job_dir = tempfile.mkdtemp()
+>>> cases = [{'bal_mass': 3, 'bal_diam': 2.164, 'nbals': nbals,
+...           'side_len': 2.7, 'dmin': 0.5, 'payload': 1.05}
+...          for nbals in (3, 4, 5, 6, 7)]
+>>> submit(job_dir, 'ngon_limits', cases, shard_size=2)
+3
+
+# Исполнитель взял часть и остановился, не закончив её
+>>> lease = _claim(job_dir)
+>>> sorted(status(job_dir).items())
+[('done', 0), ('leased', 1), ('todo', 2)]
+>>> requeue(job_dir, lease_timeout=0.0)
+1
+>>> work(job_dir)
+3
+>>> [(res['alt_max'], res['limiter']) for res in collect(job_dir)]
+[(5600.0, 1), (6500.0, 1), (6500.0, 1), (6500.0, 1), (6500.0, 1)]
+>>> shutil.rmtree(job_dir)
+"""
+# Standard libs:
+from __future__ import print_function
+import errno
+import json
+import multiprocessing
+import os
+import random
+import socket
+import sys
+import threading
+import time
+# Site-packages:
+import numpy as np
+# Custom libs:
+from balloon import model_free_lift, simulate_free_lift
+from platform import explore_ngon, plot_ngon
+
+
+def free_lift(bal_mass, bal_diam, payload=0.0, gas_mass=None,
+              duration=6*60*60, tstep=1.0, bal_mat='rubber',
+              bal_gas='helium'):
+    """ Функция расчёта варианта: разрыв шара с нагрузкой
+    (simulate_free_lift для одного шара)
+    :param bal_mass ... bal_gas: см. simulate_free_lift
+    :return:         словарь: 'burst_time', 'burst_alt' - момент, с, и
+                     высота, м, разрыва шара; 'alt_max' - максимальная
+                     высота, м (None - шар не взорвался или
+                     интегрирование неустойчиво); 'exit_status':
+                     0 - успешное завершение
+                     3 - ошибка интегрирования (скорость превысила
+                         150 м/с, следует уменьшить шаг tstep)
+
+    >>> res = free_lift(bal_mass=3, bal_diam=2.164, payload=1.05)
+    >>> res['burst_time'], int(res['burst_alt']), res['exit_status']
+    (6091.0, 37906, 0)
+    """
+    res = simulate_free_lift(duration, bal_mass, bal_diam, payload,
+                             gas_mass, bal_mat, bal_gas, tstep=tstep)
+    record = dict((name, _to_number(res[name]))
+                  for name in ('burst_time', 'burst_alt', 'alt_max'))
+    record['exit_status'] = 0 if record['alt_max'] is not None else 3
+    return record
+
+
+def ngon_limits(bal_mass, bal_diam, nbals, side_len, dmin, payload=0.0,
+                alt_step=100.0):
+    """ Функция расчёта варианта: максимальная высота платформы-
+    многоугольника (explore_ngon для одного варианта: высота та же, что у
+    plot_ngon, но без эскиза)
+    :param bal_mass ... alt_step: см. explore_ngon
+    :return:         словарь: 'alt_max' - максимальная высота, м;
+                     'limiter' - код ограничения высоты LIMIT_*; 'span' -
+                     размер платформы, м; 'exit_status' - 0 (успешное
+                     завершение)
+    """
+    design = explore_ngon(bal_mass, bal_diam, nbals, side_len, dmin,
+                          payload, alt_step)[0]
+    return {'alt_max': float(design.alt_max),
+            'limiter': int(design.limiter),
+            'span': float(design.span),
+            'exit_status': 0}
+
+
+# Функции расчёта вариантов по именам
+TASKS = {'free_lift': free_lift,
+         'ngon_limits': ngon_limits,
+         'model_free_lift': model_free_lift,
+         'plot_ngon': plot_ngon}
+
+# Время, после которого не обновлявшаяся аренда части возвращается в
+# очередь, с
+LEASE_TIMEOUT = 60.0
+# Период опроса очереди координатором, с
+POLL_INTERVAL = 1.0
+
+
+def submit(job_dir, task, cases, shard_size=16):
+    """ Создание задания: запись вариантов и очереди частей
+    :param job_dir:    каталог задания (создаётся; доступен всем узлам)
+    :param task:       наименование функции расчёта (см. TASKS)
+    :param cases:      последовательность словарей аргументов функции
+                       расчёта (значения - числа, строки и т.п., сохраняемые
+                       в JSON)
+    :param shard_size: число вариантов в части
+    :return:           число частей
+    """
+    if task not in TASKS:
+        raise ValueError('unknown sweep task {0!r}'.format(task))
+    cases = list(cases)
+    for name in ('todo', 'leases', 'results'):
+        _makedirs(os.path.join(job_dir, name))
+    _write_json(os.path.join(job_dir, 'job.json'),
+                {'task': task, 'cases': cases})
+    nshards = 0
+    for start in range(0, len(cases), shard_size):
+        shard = _shard_name(start, min(start + shard_size, len(cases)))
+        open(os.path.join(job_dir, 'todo', shard), 'w').close()
+        nshards += 1
+    return nshards
+
+
+def work(job_dir, max_shards=None, lease_timeout=LEASE_TIMEOUT):
+    """ Исполнитель: расчёт частей из очереди, пока она не опустеет
+    :param job_dir:       каталог задания
+    :param max_shards:    наибольшее число рассчитываемых частей (None -
+                          без ограничения)
+    :param lease_timeout: время, после которого аренда считается
+                          потерянной, с (аренда обновляется втрое чаще)
+    :return:              число рассчитанных частей
+    """
+    with open(os.path.join(job_dir, 'job.json')) as stream:
+        job = json.load(stream)
+    func = TASKS[job['task']]
+    cases = job['cases']
+    done = 0
+    while max_shards is None or done < max_shards:
+        lease = _claim(job_dir)
+        if lease is None:
+            # Lost leases of other workers are put back before giving up
+            if not requeue(job_dir, lease_timeout):
+                break
+            continue
+        shard = os.path.basename(lease)
+        result_path = _result_path(job_dir, shard)
+        if not os.path.exists(result_path):
+            start, stop = (int(i) for i in shard.split('-'))
+            with _Heartbeat(lease, lease_timeout/3.0):
+                results, errors = _run_cases(func, cases[start:stop])
+            _write_json(result_path, {'start': start, 'stop': stop,
+                                      'owner': _owner(),
+                                      'results': results,
+                                      'errors': errors})
+        _release(lease)
+        done += 1
+    return done
+
+
+def requeue(job_dir, lease_timeout=LEASE_TIMEOUT):
+    """ Возврат в очередь частей, аренда которых не обновлялась дольше
+    lease_timeout
+
+    Возраст аренды - разность локального времени time.time() и времени
+    изменения файла аренды, которое устанавливает узел исполнителя или
+    файловый сервер (NFS). Часы узлов не синхронизируются: при расхождении
+    часов, сравнимом с lease_timeout, живые аренды возвращаются в очередь
+    (часть рассчитывается повторно) или потерянные ждут дольше.
+    lease_timeout следует выбирать с запасом на расхождение часов узлов
+    (или синхронизировать их, например NTP).
+    :param job_dir:       каталог задания
+    :param lease_timeout: время, после которого аренда считается
+                          потерянной, с
+    :return:              число возвращённых частей
+    """
+    leases_dir = os.path.join(job_dir, 'leases')
+    expired = time.time() - lease_timeout
+    count = 0
+    for shard in os.listdir(leases_dir):
+        lease = os.path.join(leases_dir, shard)
+        try:
+            if os.path.getmtime(lease) > expired:
+                continue
+            os.rename(lease, os.path.join(job_dir, 'todo', shard))
+        except OSError as err:
+            # Finished or requeued by another process meanwhile
+            if err.errno != errno.ENOENT:
+                raise
+            continue
+        count += 1
+    return count
+
+
+def status(job_dir):
+    """ Состояние задания
+    :param job_dir: каталог задания
+    :return:        словарь числа частей: 'todo' - в очереди, 'leased' -
+                    рассчитываются, 'done' - рассчитаны
+    """
+    return {'todo': len(os.listdir(os.path.join(job_dir, 'todo'))),
+            'leased': len(os.listdir(os.path.join(job_dir, 'leases'))),
+            'done': len([name for name in
+                         os.listdir(os.path.join(job_dir, 'results'))
+                         if name.endswith('.json')])}
+
+
+def collect(job_dir):
+    """ Результаты задания по вариантам
+    :param job_dir: каталог задания
+    :return:        список результатов функции расчёта (exit_status) в
+                    порядке вариантов; None - вариант не рассчитан или
+                    расчёт завершился исключением
+    """
+    with open(os.path.join(job_dir, 'job.json')) as stream:
+        results = [None]*len(json.load(stream)['cases'])
+    results_dir = os.path.join(job_dir, 'results')
+    for name in os.listdir(results_dir):
+        if not name.endswith('.json'):
+            continue
+        with open(os.path.join(results_dir, name)) as stream:
+            shard = json.load(stream)
+        results[shard['start']:shard['stop']] = shard['results']
+    return results
+
+
+def run(job_dir, task, cases, processes=None, shard_size=16,
+        lease_timeout=LEASE_TIMEOUT):
+    """ Расчёт задания на текущем узле: координатор и processes
+    исполнителей (исполнители на других узлах могут подключаться к тому
+    же каталогу командой python -m aerospace.sweep)
+    :param job_dir:       каталог задания
+    :param task:          наименование функции расчёта (см. TASKS)
+    :param cases:         словари аргументов функции расчёта
+    :param processes:     число процессов-исполнителей. None - по числу
+                          процессоров; 0 - части рассчитывает только
+                          координатор
+    :param shard_size:    число вариантов в части
+    :param lease_timeout: время, после которого аренда считается
+                          потерянной, с
+    :return:              результаты по вариантам (см. collect)
+
+    >>> import shutil, tempfile
+    >>> job_dir = tempfile.mkdtemp()
+    >>> cases = [{'bal_mass': 3, 'bal_diam': 2.164, 'nbals': 3,
+    ...           'side_len': side_len, 'dmin': 0.5, 'payload': 1.05}
+    ...          for side_len in (2.5, 2.7, 2.9, 3.1)]
+    >>> [res['alt_max'] for res in run(job_dir, 'ngon_limits', cases,
+    ...                                processes=0, shard_size=1)]
+    [3000.0, 5600.0, 7900.0, 9800.0]
+    >>> shutil.rmtree(job_dir)
+    """
+    submit(job_dir, task, cases, shard_size)
+    if processes is None:
+        processes = multiprocessing.cpu_count()
+    workers = [multiprocessing.Process(target=work,
+                                       args=(job_dir, None, lease_timeout))
+               for _ in range(processes)]
+    for worker in workers:
+        worker.start()
+    while any(worker.is_alive() for worker in workers):
+        requeue(job_dir, lease_timeout)
+        time.sleep(POLL_INTERVAL)
+    for worker in workers:
+        worker.join()
+    # Shards of failed local workers are finished by the coordinator; the
+    # ones leased by remote workers are waited for
+    while True:
+        work(job_dir, lease_timeout=lease_timeout)
+        if not status(job_dir)['leased']:
+            break
+        time.sleep(POLL_INTERVAL)
+    return collect(job_dir)
+
+
+class _Heartbeat(object):
+    """Обновление времени изменения файла аренды в фоновом потоке"""
+
+    def __init__(self, path, interval):
+        object.__init__(self)
+        self._path = path
+        self._interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='lease')
+        self._thread.daemon = True
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self._interval):
+            try:
+                os.utime(self._path, None)
+            except OSError:
+                # Requeued by the coordinator: the result is still written
+                pass
+
+
+def _claim(job_dir):
+    """ Взятие части из очереди: путь к файлу аренды или None (очередь
+    пуста) """
+    todo_dir = os.path.join(job_dir, 'todo')
+    shards = os.listdir(todo_dir)
+    # Workers try shards in different order to avoid contention
+    random.shuffle(shards)
+    for shard in shards:
+        lease = os.path.join(job_dir, 'leases', shard)
+        try:
+            os.rename(os.path.join(todo_dir, shard), lease)
+            # The renamed file keeps the time of the queued one: it is
+            # renewed before requeue() of another process finds the lease
+            # expired. A lease requeued meanwhile is not recreated
+            os.utime(lease, None)
+            with open(lease, 'r+') as stream:
+                stream.write(_owner())
+                stream.truncate()
+        except (IOError, OSError) as err:
+            if err.errno != errno.ENOENT:
+                raise
+            continue
+        return lease
+    return None
+
+
+def _release(lease):
+    """ Удаление файла аренды, если аренда всё ещё принадлежит процессу
+    (не возвращена в очередь и не взята другим исполнителем) """
+    try:
+        with open(lease) as stream:
+            owner = stream.read()
+    except IOError as err:
+        if err.errno != errno.ENOENT:
+            raise
+        return
+    if owner == _owner():
+        _remove(lease)
+
+
+def _run_cases(func, cases):
+    results = []
+    errors = []
+    for case in cases:
+        try:
+            results.append(func(**case))
+            errors.append(None)
+        except Exception as err:
+            # A failing case must not make its shard requeued forever
+            results.append(None)
+            errors.append('{0}: {1}'.format(type(err).__name__, err))
+    return results, errors
+
+
+def _shard_name(start, stop):
+    return '{0:08d}-{1:08d}'.format(start, stop)
+
+
+def _result_path(job_dir, shard):
+    return os.path.join(job_dir, 'results', shard + '.json')
+
+
+def _owner():
+    return '{0}:{1}'.format(socket.gethostname(), os.getpid())
+
+
+def _write_json(path, data):
+    # Readers on other nodes never see a partially written file
+    tmp_path = '{0}.{1}.{2}.tmp'.format(path, socket.gethostname(),
+                                        os.getpid())
+    with open(tmp_path, 'w') as stream:
+        json.dump(data, stream, default=_to_builtin)
+    if os.name == 'nt' and os.path.exists(path):
+        os.remove(path)
+    os.rename(tmp_path, path)
+
+
+def _to_number(value):
+    """ Число Python из скаляра numpy (None - NaN) """
+    value = float(value)
+    return None if np.isnan(value) else value
+
+
+def _to_builtin(value):
+    # Scalars of numpy
+    if hasattr(value, 'item'):
+        return value.item()
+    raise TypeError('{0!r} is not JSON serializable'.format(value))
+
+
+def _makedirs(path):
+    try:
+        os.makedirs(path)
+    except OSError:
+        if not os.path.isdir(path):
+            raise
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError as err:
+        if err.errno != errno.ENOENT:
+            raise
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print('usage: python -m aerospace.sweep <job_dir>', file=sys.stderr)
+        sys.exit(1)
+    print('{0} shards done'.format(work(sys.argv[1])))
@@ -0,0 +1,221 @@
+# -*- encoding: utf-8 -*-
+""" Калибровка модели подъёма метеошара по телеметрии в полёте
+
+Отсчёты высоты поступают по одному (1-10 Гц); расширенный фильтр Калмана
+(EKF) уточняет по ним состояние шара (высота, скорость) вместе с
+параметрами модели BalloonStatic - эффективным коэффициентом лобового
+сопротивления cx (постоянным) и массой газа. Каждый отсчёт обрабатывается за
+постоянное время: состояние продвигается от предыдущего отсчёта (шаг
+Рунге-Кутты 4 порядка), ковариация - по аналитической матрице Якоби
+(BalloonStatic.get_forces_jacobian), интегрирование от момента запуска не
+повторяется.
+
+Прогноз (FlightCalibrator.forecast) по текущей оценке:
+- высота разрыва - по статической модели разрыва (зависит только от массы
+  газа и предела деформации оболочки);
+- момент разрыва - интеграл dh/v(h) по установившейся скорости подъёма
+  (BalloonStatic.get_ascent_rate) от текущей высоты до высоты разрыва.
+Предел относительной деформации оболочки по телеметрии до разрыва не
+наблюдаем: до разрыва используется значение материала, после
+обнаружения разрыва (снижение высоты) - деформация в высшей точке полёта.
+
+Примеры:
+>>> calibrator = FlightCalibrator(bal_mass=3.0, bal_diam=2.164,
+...                               payload=1.05)
+>>> round(calibrator.forecast()['burst_alt'], -2)
+37900.0
+"""
+# Site-packages:
+import numpy as np
+# Custom libs:
+from balloon import _new_balloon
+import const
+import integrate
+import utils
+
+# Порядок переменных состояния фильтра
+STATE = ('alt', 'vel', 'cx', 'gas_mass')
+
+
+class FlightCalibrator(object):
+    """Оценка состояния и параметров шара по отсчётам высоты (EKF)"""
+
+    def __init__(self, bal_mass, bal_diam, payload=0.0, gas_mass=None,
+                 bal_mat='rubber', bal_gas='helium', atm=None,
+                 alt_sigma=10.0, cx_sigma=0.2, gas_mass_sigma=None,
+                 acc_noise=0.05, max_step=1.0):
+        """
+        :param bal_mass:       масса метеошара, кг
+        :param bal_diam:       диаметр метеошара в состоянии без
+                               растяжения, м
+        :param payload:        полезная нагрузка, кг
+        :param gas_mass:       априорная масса газа, кг. По умолчанию - по
+                               заполнению шара на высоте H=0
+        :param bal_mat:        наименование материала метеошара
+        :param bal_gas:        наименование наполняющего газа
+        :param atm:            модель атмосферы (см. BalloonStatic)
+        :param alt_sigma:      СКО погрешности измерения высоты, м
+        :param cx_sigma:       априорное СКО коэффициента сопротивления
+        :param gas_mass_sigma: априорное СКО массы газа, кг. По умолчанию
+                               - 10% массы газа
+        :param acc_noise:      спектральная плотность шума ускорения
+                               (неучтённые силы, турбулентность), м/с^2/Гц^0.5
+        :param max_step:       наибольший шаг продвижения состояния между
+                               отсчётами, с
+        """
+        object.__init__(self)
+        self._args = (bal_mass, bal_diam, bal_mat, bal_gas, atm)
+        balloon = _new_balloon(bal_mass, bal_diam, gas_mass, bal_mat, bal_gas,
+                               atm)
+        if gas_mass_sigma is None:
+            gas_mass_sigma = 0.1*balloon.gas_mass
+        self._payload = payload
+        self._strain_max = balloon.bal_mat.rel_strain_max
+        # The filter estimates a constant cx: a priori - the sphere
+        # coefficient at the ascent rate of launch
+        cx = balloon.cx
+        if cx is None:
+            cx = float(balloon.get_cx(
+                0.0, balloon.get_ascent_rate(0.0, payload)))
+        self._x = np.array([0.0, 0.0, cx, balloon.gas_mass])
+        self._cov = np.diag([alt_sigma, 1.0, cx_sigma, gas_mass_sigma])**2.0
+        self._noise = np.diag([0.0, acc_noise**2.0, 0.0, 0.0])
+        self._alt_var = alt_sigma**2.0
+        self._max_step = max_step
+        self._time = 0.0
+        self._alt_peak = -np.inf
+        self._burst_time = None
+        self._nsamples = 0
+
+    @property
+    def time(self):
+        return self._time
+
+    @property
+    def nsamples(self):
+        return self._nsamples
+
+    @property
+    def estimate(self):
+        """Текущая оценка: словарь переменных STATE и 'rel_strain_max'"""
+        res = dict(zip(STATE, self._x))
+        res['rel_strain_max'] = self._strain_max
+        return res
+
+    @property
+    def sigma(self):
+        """СКО оценки переменных STATE"""
+        return dict(zip(STATE, np.sqrt(np.diag(self._cov))))
+
+    @property
+    def is_burst(self):
+        return self._burst_time is not None
+
+    def update(self, time, alt):
+        """ Обработка отсчёта телеметрии
+        :param time: момент отсчёта от запуска, с (отсчёты - по
+                     возрастанию времени)
+        :param alt:  измеренная высота, м
+        """
+        self._nsamples += 1
+        if self.is_burst:
+            return
+        if alt < self._alt_peak - 5.0*np.sqrt(self._alt_var):
+            # Descent: the balloon burst at the highest point of the flight
+            self._burst_time = self._time_peak
+            self._strain_max = float(self._new_balloon().get_rel_strain(
+                self._alt_peak))
+            return
+        if alt > self._alt_peak:
+            self._alt_peak, self._time_peak = alt, time
+        self._predict(time - self._time)
+        self._time = time
+        # Measurement of altitude (first state variable)
+        cov = self._cov
+        gain = cov[:, 0]/(cov[0, 0] + self._alt_var)
+        self._x += gain*(alt - self._x[0])
+        self._x[2:] = np.maximum(self._x[2:], 1e-6)
+        # Joseph form keeps the covariance symmetric positive definite
+        i_kh = np.eye(len(STATE))
+        i_kh[:, 0] -= gain
+        self._cov = i_kh.dot(cov).dot(i_kh.T) + \
+            self._alt_var*np.outer(gain, gain)
+
+    def calibrate(self, samples):
+        """ Обработка потока отсчётов с прогнозом после каждого
+        :param samples: итерируемая последовательность пар (время, высота)
+        :return:        генератор прогнозов (см. forecast)
+        """
+        for time, alt in samples:
+            self.update(time, alt)
+            yield self.forecast()
+
+    def forecast(self, nlevels=64):
+        """ Прогноз разрыва по текущей оценке
+        :param nlevels: число высот интегрирования времени подъёма
+        :return:        словарь: 'burst_alt' - высота разрыва, м;
+                        'burst_alt_sigma' - её СКО, м; 'burst_time' -
+                        момент разрыва от запуска, с (после обнаружения
+                        разрыва - высшая точка полёта по телеметрии)
+        """
+        balloon = self._new_balloon()
+        if self.is_burst:
+            return {'burst_alt': self._alt_peak, 'burst_alt_sigma': 0.0,
+                    'burst_time': self._burst_time}
+        alt, vel, cx, gas_mass = self._x
+        burst_alt = float(utils.bisect(
+            lambda h: balloon.get_rel_strain(h) - self._strain_max,
+            0.0, balloon.atm._h[-1], xtol=1e-3))
+        # Static burst model: d(burst_alt)/d(gas_mass) from
+        # V(burst_alt, gas_mass) = const
+        dalt = -1.0/(gas_mass*balloon._get_volume_log_slope(burst_alt))
+        burst_alt_sigma = abs(dalt)*np.sqrt(self._cov[3, 3])
+        alts = np.linspace(min(alt, burst_alt), burst_alt, nlevels)
+        with np.errstate(divide='ignore'):
+            rate = balloon.get_ascent_rate(alts, self._payload)
+            slowness = np.where(rate > 0.0, 1.0/rate, np.inf)
+        burst_time = self._time + np.trapz(slowness, alts)
+        return {'burst_alt': burst_alt, 'burst_alt_sigma': burst_alt_sigma,
+                'burst_time': burst_time}
+
+    def _new_balloon(self):
+        """ Метеошар с текущей оценкой параметров """
+        cx, gas_mass = self._x[2:]
+        bal_mass, bal_diam, bal_mat, bal_gas, atm = self._args
+        return _new_balloon(bal_mass, bal_diam, gas_mass, bal_mat, bal_gas,
+                            atm, cx)
+
+    def _predict(self, duration):
+        """ Продвижение оценки и её ковариации на интервал duration """
+        if duration <= 0.0:
+            return
+        nsteps = int(np.ceil(duration/self._max_step))
+        tstep = duration/nsteps
+        payload = self._payload
+        for _ in range(nsteps):
+            alt, vel, cx, gas_mass = self._x
+            balloon = self._new_balloon()
+            mass = balloon.get_mass() + payload
+
+            def odefun(y, time):
+                f_sum = balloon.get_forces_sum(y[0], y[1]) - payload*const.g
+                return np.array([y[1], f_sum/mass])
+
+            time, y = integrate.rk4(odefun, np.array([[alt], [vel]]),
+                                    [0.0, tstep])
+            # Transition matrix of the linearized model (second order)
+            jac = balloon.get_forces_jacobian(alt, vel)
+            acc = (balloon.get_forces_sum(alt, vel) - payload*const.g)/mass
+            a = np.zeros((len(STATE), len(STATE)))
+            a[0, 1] = 1.0
+            a[1] = [jac['alt']/mass, jac['vel']/mass, jac['cx']/mass,
+                    (jac['gas_mass'] - acc)/mass]
+            a *= tstep
+            phi = np.eye(len(STATE)) + a + a.dot(a)/2.0
+            self._x[:2] = y[:, 0]
+            self._cov = phi.dot(self._cov).dot(phi.T) + self._noise*tstep
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
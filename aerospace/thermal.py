@@ -0,0 +1,242 @@
+# -*- encoding: utf-8 -*-
+""" Тепловая модель подъёма метеошара
+
+Температура газа в шаре (параметр temp моделей BalloonStatic) -
+переменная состояния наряду с высотой и скоростью. Оболочка и газ
+рассматриваются как одно тело с общей температурой; тепловой баланс:
+
+    (m_g*cp_g + m_b*c_b)*dT/dt = Q_sun + Q_ir + Q_conv + V*dp/dt
+
+- Q_sun  - поглощённое солнечное излучение (по площади миделя);
+- Q_ir   - теплообмен излучением с окружающей средой (по поверхности);
+- Q_conv - вынужденная конвекция (обтекание сферы, Nu = 2 + 0.6*Re^0.5*
+           Pr^(1/3));
+- V*dp/dt - работа расширения газа при изменении давления окружающей
+           среды (адиабатическое охлаждение при подъёме).
+
+Теплообмен и сопротивление воздуха делают систему жёсткой: она
+интегрируется линейно-неявным методом Розенброка (integrate.rosenbrock) с
+аналитической матрицей Якоби (ThermalModel.jacobian).
+
+Принятые обозначения и размерности:
+    alt [м] - высота
+    vel [м/с] - вертикальная скорость
+    temp [K] - температура газа в шаре
+
+Примеры:
+>>> res = simulate_thermal_lift(bal_mass=3.0, bal_diam=2.164,
+...                             payload=1.05)
+>>> int(round(res['burst_alt'], -2))
+37300
+>>> res = simulate_thermal_lift(bal_mass=3.0, bal_diam=2.164,
+...                             payload=1.05, solar_flux=0.0)
+>>> int(round(res['burst_alt'], -2))
+37900
+"""
+# Site-packages:
+import numpy as np
+# Custom libs:
+from atmosphere import (viscosity, conductivity, _SUTHERLAND_S,
+                        _CONDUCTIVITY_N)
+from balloon import _new_balloon
+import const
+import gas
+import integrate
+import utils
+
+# Скорость, ниже которой число Рейнольдса конвекции не уменьшается, м/с
+_VEL_CONV_MIN = 0.01
+
+
+class ThermalModel(object):
+    """Уравнения подъёма шара с нагрузкой с учётом теплообмена газа:
+    dy/dt = f(y), y = [alt, vel, temp]"""
+
+    def __init__(self, balloon, payload=0.0, absorptivity=0.2,
+                 emissivity=0.8, solar_flux=const.S0):
+        """
+        :param balloon:      метеошар BalloonStatic
+        :param payload:      полезная нагрузка, кг
+        :param absorptivity: коэффициент поглощения солнечного излучения
+                             оболочкой
+        :param emissivity:   степень черноты оболочки в ИК-диапазоне
+        :param solar_flux:   плотность потока солнечного излучения, Вт/м^2
+                             (0 - ночь)
+        """
+        object.__init__(self)
+        self._balloon = balloon
+        self._mass = balloon.get_mass() + payload
+        self._heat_capacity = (balloon.gas_mass*balloon.gas.cp +
+                               balloon.bal_mass*balloon.bal_mat.c)
+        self._q_sun = absorptivity*solar_flux
+        self._emissivity = emissivity
+        self._conv = 0.6*gas.air.pr**(1.0/3.0)
+
+    @property
+    def balloon(self):
+        return self._balloon
+
+    def odefun(self, y, time):
+        """ Правая часть f(y, t) """
+        return self._evaluate(y)[0]
+
+    def jacobian(self, y, time):
+        """ Матрица Якоби правой части по состоянию: [i, j] = df_i/dy_j """
+        return self._evaluate(y)[1]
+
+    def _evaluate(self, y):
+        """ Правая часть и её производные по высоте, скорости и
+        температуре газа """
+        alt, vel, temp = y
+        bal = self._balloon
+        atm = bal.atm
+        p_air = atm.p(alt)
+        t_air = atm.t(alt)
+        rho = atm.rho(alt)
+        dp_air = utils.interp_slope(alt, atm._h, atm._p)
+        dt_air = utils.interp_slope(alt, atm._h, atm._t)
+        drho = utils.interp_slope(alt, atm._h, atm._rho)
+
+        vol = bal.get_volume(alt, temp)
+        rad = bal.get_radius(alt, temp)
+        # Производные логарифма радиуса по высоте и температуре
+        dlnr_h = -dp_air/(3.0*p_air)
+        dlnr_t = 1.0/(3.0*temp)
+
+        # Силы
+        f_arch = rho*const.g*vol
+        df_arch = np.array([const.g*vol*(drho - rho*dp_air/p_air),
+                            0.0,
+                            f_arch/temp])
+        speed = abs(vel)
+        drag = bal._get_cx(alt, speed, rad)/2.0*rho*const.pi*rad**2.0
+        f_res = -drag*vel*speed
+        # Коэффициент сопротивления зависит от Re = 2*r*|v|/nu
+        dlncx = bal._get_cx_log_slope(alt, speed, rad)
+        dlnnu_h = 0.0
+        if bal.cx is None:
+            dlnnu_h = utils.interp_slope(alt, atm._h, atm._nu)/atm.nu(alt)
+        df_res = np.array([
+            f_res*(drho/rho + 2.0*dlnr_h + dlncx*(dlnr_h - dlnnu_h)),
+            -drag*speed*(2.0 + dlncx),
+            f_res*(2.0 + dlncx)*dlnr_t])
+        acc = (f_arch + f_res)/self._mass - const.g
+        dacc = (df_arch + df_res)/self._mass
+
+        # Тепловые потоки
+        q_sun = self._q_sun*const.pi*rad**2.0
+        dq_sun = 2.0*q_sun*np.array([dlnr_h, 0.0, dlnr_t])
+
+        rad_exchange = self._emissivity*const.sigma*4.0*const.pi*rad**2.0
+        q_ir = rad_exchange*(t_air**4.0 - temp**4.0)
+        dq_ir = np.array([
+            2.0*q_ir*dlnr_h + 4.0*rad_exchange*t_air**3.0*dt_air,
+            0.0,
+            2.0*q_ir*dlnr_t - 4.0*rad_exchange*temp**3.0])
+
+        k_air = conductivity(t_air)
+        speed_conv = max(speed, _VEL_CONV_MIN)
+        re_root = np.sqrt(2.0*rad*speed_conv*rho/viscosity(t_air))
+        nusselt = 2.0 + self._conv*re_root
+        dlnmu_h = (1.5/t_air - 1.0/(t_air + _SUTHERLAND_S))*dt_air
+        dlnre = np.array([
+            dlnr_h + drho/rho - dlnmu_h,
+            1.0/vel if speed > _VEL_CONV_MIN else 0.0,
+            dlnr_t])
+        dnusselt = 0.5*self._conv*re_root*dlnre
+        # Q_conv = h*4*pi*r^2*(T_air - T), h = Nu*k/(2*r)
+        conv = 2.0*const.pi*rad*k_air
+        q_conv = conv*(t_air - temp)*nusselt
+        dq_conv = (q_conv*np.array([dlnr_h + _CONDUCTIVITY_N*dt_air/t_air,
+                                    0.0,
+                                    dlnr_t]) +
+                   conv*nusselt*np.array([dt_air, 0.0, -1.0]) +
+                   conv*(t_air - temp)*dnusselt)
+
+        # Работа расширения V*dp/dt (давление - кусочно-линейная функция
+        # высоты, его вторая производная равна нулю)
+        work = vol*dp_air*vel
+        dwork = np.array([-work*dp_air/p_air, vol*dp_air, work/temp])
+
+        dtemp = (q_sun + q_ir + q_conv + work)/self._heat_capacity
+        ddtemp = (dq_sun + dq_ir + dq_conv + dwork)/self._heat_capacity
+
+        func = np.array([vel, acc, dtemp])
+        jac = np.array([[0.0, 1.0, 0.0], dacc, ddtemp])
+        return func, jac
+
+
+def simulate_thermal_lift(bal_mass, bal_diam, payload=0.0, gas_mass=None,
+                          bal_mat='rubber', bal_gas='helium',
+                          absorptivity=0.2, emissivity=0.8,
+                          solar_flux=const.S0, temp=None, atm=None,
+                          max_duration=6*60*60, rtol=1e-4, atol=1e-3):
+    """ Моделирование подъёма шара с полезной нагрузкой с учётом
+    теплообмена газа до разрыва шара (по модели BalloonStatic.is_burst с
+    температурой газа)
+    ---------------------------------------------------------------------------
+    :param bal_mass:     масса метеошара, кг
+    :param bal_diam:     диаметр метеошара в состоянии без растяжения, м
+    :param payload:      полезная нагрузка, кг
+    :param gas_mass:     масса газа, кг. По умолчанию - по заполнению шара
+                         на высоте H=0
+    :param bal_mat:      наименование материала метеошара
+    :param bal_gas:      наименование наполняющего газа
+    :param absorptivity: см. ThermalModel
+    :param emissivity:   см. ThermalModel
+    :param solar_flux:   см. ThermalModel
+    :param temp:         температура газа при запуске, K. По умолчанию -
+                         температура окружающей среды
+    :param atm:          модель атмосферы (см. BalloonStatic)
+    :param max_duration: наибольшая продолжительность подъёма, с
+    :param rtol:         относительная допустимая погрешность шага
+    :param atol:         абсолютная допустимая погрешность шага
+    ---------------------------------------------------------------------------
+    :return:             словарь:
+                         'time', 'alt', 'vel', 'temp' - решение в моменты
+                         принятых шагов (с, м, м/с, K);
+                         'temp_air' - температура окружающей среды, K;
+                         'burst_time', 'burst_alt' - момент и высота
+                         разрыва шара (NaN - шар не взорвался);
+                         'nfev', 'njev' - число вычислений правой части и
+                         матрицы Якоби
+    """
+    balloon = _new_balloon(bal_mass, bal_diam, gas_mass, bal_mat, bal_gas,
+                           atm)
+    model = ThermalModel(balloon, payload, absorptivity, emissivity,
+                         solar_flux)
+    strain_max = balloon.bal_mat.rel_strain_max
+    if temp is None:
+        temp = balloon.atm.t(0.0)
+    y0 = np.array([0.0, 0.0, temp])
+    if model.odefun(y0, 0.0)[1] <= 0.0:
+        # No free lift: the balloon stays on the ground
+        return {'time': np.zeros(1), 'alt': y0[:1], 'vel': y0[1:2],
+                'temp': y0[2:], 'temp_air': balloon.atm.t(y0[:1]),
+                'burst_time': np.nan, 'burst_alt': np.nan,
+                'nfev': 1, 'njev': 0}
+
+    def burst(y, time):
+        return balloon.get_rel_strain(y[0], y[2]) - strain_max
+
+    def landing(y, time):
+        return -y[0]
+
+    time, y, event, nfev, njev = integrate.rosenbrock(
+        model.odefun, model.jacobian, y0, 0.0, max_duration,
+        events=[burst, landing], rtol=rtol, atol=atol)
+    is_burst = event == 0
+    return {'time': time,
+            'alt': y[:, 0],
+            'vel': y[:, 1],
+            'temp': y[:, 2],
+            'temp_air': balloon.atm.t(y[:, 0]),
+            'burst_time': time[-1] if is_burst else np.nan,
+            'burst_alt': y[-1, 0] if is_burst else np.nan,
+            'nfev': nfev,
+            'njev': njev}
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
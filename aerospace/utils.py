@@ -2,7 +2,7 @@
 Low-level utilities for ``aerospace`` package
 """
 import sys
-import math
+import numpy as np
 
 
 def get_font():
@@ -26,15 +26,141 @@ def get_font():
 
 def cart2pol(x, y):
     """ Convert cartesian coordinates to polar
+    (accepts scalars or numpy arrays)
     """
-    theta = math.atan2(y, x)
-    rho = math.sqrt(x**2 + y**2)
+    theta = np.arctan2(y, x)
+    rho = np.sqrt(x**2 + y**2)
     return theta, rho
 
 
 def pol2cart(theta, rho):
     """ Convert polar coordinates to cartesian
+    (accepts scalars or numpy arrays)
     """
-    x = rho * math.sin(theta)  # turn radial grid points into (x, y)
-    y = rho * math.cos(theta)
-    return x, y
\ No newline at end of file
+    x = rho * np.sin(theta)  # turn radial grid points into (x, y)
+    y = rho * np.cos(theta)
+    return x, y
+
+
+def pareto_front(costs, block=64):
+    """ Boolean mask of Pareto-optimal (non-dominated) rows of <costs>
+
+    Every column is a cost to minimize. A row is dominated if another row
+    is not worse in every column and better in at least one. Equal rows
+    are all kept.
+    :param costs: 2-D array, one row per candidate
+    :param block: number of candidates checked against the rest at once
+    :return:      boolean array, True for non-dominated rows
+    """
+    # Equal rows share the result: search among unique rows only
+    costs, inverse = np.unique(np.asarray(costs, dtype=float), axis=0,
+                               return_inverse=True)
+    # A dominating row has smaller sum of (normalized) costs, so after
+    # sorting by it every row can be dominated only by preceding rows
+    spread = np.ptp(costs, axis=0)
+    spread[spread == 0] = 1.0
+    candidates = np.argsort((costs/spread).sum(axis=1), kind='mergesort')
+    i = 0
+    while i < candidates.size:
+        pivots = costs[candidates[i:i + block], np.newaxis, :]
+        rest = costs[np.newaxis, candidates, :]
+        dominated = np.any(np.all(pivots <= rest, axis=2) &
+                           np.any(pivots < rest, axis=2), axis=0)
+        candidates = candidates[~dominated]
+        i = np.count_nonzero(~dominated[:i + block])
+    mask = np.zeros(costs.shape[0], dtype=bool)
+    mask[candidates] = True
+    return mask[inverse]
+
+
+def bisect(func, lower, upper, xtol=1e-12, rtol=1e-10, maxiter=200):
+    """ Vectorized bisection: roots of func(x) = 0 for arrays of brackets
+
+    All brackets are halved together, each step costs one call of <func>
+    on the whole array, so thousands of equations are solved for the price
+    of one.
+    :param func:    function of an array x returning array of the same shape
+    :param lower:   lower bounds of brackets (scalar or array)
+    :param upper:   upper bounds of brackets (scalar or array)
+    :param xtol:    absolute tolerance of the root
+    :param rtol:    relative tolerance of the root
+    :param maxiter: maximum number of halvings
+    :return:        array of roots; NaN where func(lower) and func(upper)
+                    have the same sign (root is not bracketed)
+
+    >>> bisect(lambda x: x**2 - 2.0, 0.0, [2.0, 1.0])
+    array([1.41421356,        nan])
+    """
+    lower, upper = np.broadcast_arrays(np.asarray(lower, dtype=float),
+                                       np.asarray(upper, dtype=float))
+    lower = lower.copy()
+    upper = upper.copy()
+    f_lower = np.asarray(func(lower), dtype=float)
+    f_upper = np.asarray(func(upper), dtype=float)
+    is_bracketed = np.sign(f_lower) * np.sign(f_upper) <= 0
+    for _ in range(maxiter):
+        mid = 0.5*(lower + upper)
+        if np.all(upper - lower <= xtol + rtol*np.abs(mid)):
+            break
+        f_mid = np.asarray(func(mid), dtype=float)
+        # Root is in the upper half
+        is_upper = np.sign(f_mid) == np.sign(f_lower)
+        lower = np.where(is_upper, mid, lower)
+        f_lower = np.where(is_upper, f_mid, f_lower)
+        upper = np.where(is_upper, upper, mid)
+    root = 0.5*(lower + upper)
+    return np.where(is_bracketed, root, np.nan)[()]
+
+
+def interp_slope(x, xp, fp):
+    """ Derivative of the piecewise-linear interpolant np.interp(x, xp, fp)
+    (the slope of the segment containing x; zero outside of xp, where
+    np.interp is constant)
+
+    >>> interp_slope([0.5, 1.5, 3.0], [0.0, 1.0, 2.0], [0.0, 2.0, 3.0])
+    array([2., 1., 0.])
+    """
+    xp = np.asarray(xp, dtype=float)
+    fp = np.asarray(fp, dtype=float)
+    x = np.asarray(x, dtype=float)
+    i = np.clip(np.searchsorted(xp, x, side='right') - 1, 0, xp.size - 2)
+    slope = (fp[i + 1] - fp[i])/(xp[i + 1] - xp[i])
+    return np.where((x >= xp[0]) & (x <= xp[-1]), slope, 0.0)[()]
+
+
+def interp_inverse(y, xp, fp):
+    """ Inverse of the piecewise-linear interpolant np.interp(x, xp, fp):
+    the smallest x in [xp[0], xp[-1]] where it equals <y>
+
+    Elementwise, so a long stream of values may be converted by chunks.
+    For monotonic <fp> this is a single np.interp over the swapped table,
+    and np.interp(interp_inverse(y, xp, fp), xp, fp) reproduces <y> up to
+    rounding errors.
+    :param y:  values of the interpolant (scalar or array)
+    :param xp: increasing x-coordinates of the table
+    :param fp: values of the table
+    :return:   array of x; NaN where <y> is out of the range of <fp>
+
+    >>> interp_inverse([5.0, 0.5, 11.0], [0.0, 1.0, 2.0], [10.0, 0.0, 10.0])
+    array([0.5 , 0.95,  nan])
+    """
+    xp = np.asarray(xp, dtype=float)
+    fp = np.asarray(fp, dtype=float)
+    y = np.asarray(y, dtype=float)
+    dfp = np.diff(fp)
+    if np.all(dfp > 0):
+        return np.interp(y, fp, xp, left=np.nan, right=np.nan)[()]
+    if np.all(dfp < 0):
+        return np.interp(y, fp[::-1], xp[::-1],
+                         left=np.nan, right=np.nan)[()]
+    # Not monotonic: segments from the top down, lower ones overwrite
+    x = np.full(y.shape, np.nan)
+    for i in range(dfp.size - 1, -1, -1):
+        f_lo, f_hi = sorted((fp[i], fp[i + 1]))
+        is_inside = (y >= f_lo) & (y <= f_hi)
+        if dfp[i] == 0.0:
+            x[is_inside] = xp[i]
+        else:
+            x[is_inside] = xp[i] + (y[is_inside] - fp[i]) * \
+                (xp[i + 1] - xp[i])/dfp[i]
+    return x[()]
@@ -0,0 +1,267 @@
+# -*- encoding: utf-8 -*-
+""" Горизонтальный дрейф метеошаров в поле ветра
+
+Поле ветра задаётся на сетке (время, высота, широта, долгота) и хранится в
+двоичном файле .npy: массив формы (nt, nalt, nlat, nlon, 2) - восточная (u)
+и северная (v) составляющие скорости ветра, м/с. Узлы сетки по осям
+хранятся рядом, в файле <имя>.axes.npz. Файл поля отображается в память и
+не загружается целиком: при интерполяции читаются только узлы, окружающие
+положения шаров, поэтому поле может быть больше оперативной памяти.
+
+Шар переносится ветром по горизонтали (горизонтальная скорость шара равна
+скорости ветра), вертикальное движение рассчитывается по модели
+BalloonStatic, как в simulate_free_lift().
+
+Принятые обозначения и размерности:
+    time [с] - время
+    alt [м] - высота над уровнем моря
+    lat, lon [град] - широта и долгота
+    u, v [м/с] - восточная и северная составляющие скорости ветра
+
+Примеры:
+>>> import os, tempfile
+>>> path = os.path.join(tempfile.mkdtemp(), 'wind.npy')
+>>> field = create_wind_field(path, time=[0.0, 86400.0],
+...                           alt=[0.0, 50000.0],
+...                           lat=[-10.0, 10.0], lon=[-10.0, 10.0])
+>>> field[..., 0] = 10.0    # восточный ветер 10 м/с
+>>> field[..., 1] = 0.0
+>>> field.flush()
+>>> res = simulate_drift(duration=180*60, bal_mass=3.0, bal_diam=2.164,
+...                      lat=0.0, lon=0.0, wind=WindField(path),
+...                      payload=[0.5, 1.05])
+>>> res['burst_time']
+array([5224., 6091.])
+>>> np.round(res['lon'], 3)
+array([0.469, 0.546])
+"""
+# Standard libs:
+import os
+# Site-packages:
+import numpy as np
+# Custom libs:
+from balloon import _new_balloon
+import const
+import integrate
+
+# Наименования осей сетки поля ветра (порядок осей массива поля)
+AXES = ('time', 'alt', 'lat', 'lon')
+
+# Типы данных поля и соответствующие им типы узлов u + i*v
+_NODE_DTYPES = {np.dtype(np.float32): np.complex64,
+                np.dtype(np.float64): np.complex128}
+
+
+class WindField(object):
+    """Поле ветра на сетке (время, высота, широта, долгота), отображаемое в
+    память из файла (см. create_wind_field)"""
+
+    def __init__(self, path):
+        """
+        :param path: путь к файлу поля ветра .npy
+        """
+        object.__init__(self)
+        with np.load(_axes_path(path)) as axes:
+            self._axes = [np.asarray(axes[name], dtype=float)
+                          for name in AXES]
+        data = np.load(path, mmap_mode='r')
+        if data.shape != tuple(axis.size for axis in self._axes) + (2,):
+            raise ValueError('wind field shape does not match its axes')
+        if data.dtype not in _NODE_DTYPES or \
+                not data.flags['C_CONTIGUOUS']:
+            raise ValueError('wind field must be a C-ordered float32 or '
+                             'float64 array')
+        # Узлы - элементы одномерного представления массива поля в виде
+        # комплексных чисел u + i*v (выборка узлов одной операцией take);
+        # узлы, окружающие точку, отстоят от левого нижнего на постоянные
+        # смещения
+        self._nodes = np.asarray(data).view(_NODE_DTYPES[data.dtype]).ravel()
+        strides = np.cumprod([1] + [axis.size for axis in self._axes[:0:-1]])
+        self._strides = strides[::-1]
+        # (угол ячейки, ось): 0 - левый узел по оси, 1 - правый
+        self._corners = (np.arange(2**len(AXES))[:, np.newaxis] >>
+                         np.arange(len(AXES))[::-1]) & 1
+        self._offsets = self._corners.dot(self._strides)
+
+    @property
+    def axes(self):
+        return dict(zip(AXES, self._axes))
+
+    def get_wind(self, time, alt, lat, lon):
+        """ Скорость ветра в точках (интерполяция по 4 осям сетки; вне сетки
+        - значение на её границе)
+        :param time: время, с
+        :param alt:  высота над уровнем моря, м
+        :param lat:  широта, град
+        :param lon:  долгота, град
+        :return:     u, v - восточная и северная составляющие скорости
+                     ветра, м/с
+        (параметры - числа или массивы, согласуемые по правилам
+        broadcasting)
+        """
+        coords = np.broadcast_arrays(time, alt, lat, lon)
+        shape = coords[0].shape
+        base = 0
+        weights = 1.0
+        for axis, x, stride, corner in zip(self._axes, coords,
+                                           self._strides, self._corners.T):
+            i, w = _axis_weights(axis, x.ravel())
+            base = base + i*stride
+            weights = weights*np.where(corner[:, np.newaxis], w, 1.0 - w)
+        nodes = self._nodes.take(base + self._offsets[:, np.newaxis])
+        wind = np.einsum('kn,kn->n', weights, nodes).reshape(shape)
+        return wind.real[()], wind.imag[()]
+
+
+def create_wind_field(path, time, alt, lat, lon, dtype=np.float32):
+    """ Создание файла поля ветра
+
+    Создаёт файлы поля и узлов сетки и возвращает массив поля, отображённый
+    в память для записи: поле, большее оперативной памяти, заполняется по
+    частям (например, по моментам времени) - field[i] = ...
+    :param path:  путь к файлу поля ветра .npy
+    :param time:  узлы сетки по времени, с (по возрастанию)
+    :param alt:   узлы сетки по высоте, м (по возрастанию)
+    :param lat:   узлы сетки по широте, град (по возрастанию)
+    :param lon:   узлы сетки по долготе, град (по возрастанию)
+    :param dtype: тип данных поля: np.float32 или np.float64
+    :return:      массив поля формы (nt, nalt, nlat, nlon, 2)
+    """
+    axes = dict(zip(AXES, (np.asarray(axis, dtype=float)
+                           for axis in (time, alt, lat, lon))))
+    for name in AXES:
+        axis = axes[name]
+        if axis.ndim != 1 or axis.size < 2 or np.any(np.diff(axis) <= 0):
+            raise ValueError('wind field axis {0} must be increasing and '
+                             'have at least 2 nodes'.format(name))
+    if np.dtype(dtype) not in _NODE_DTYPES:
+        raise ValueError('wind field dtype must be float32 or float64')
+    np.savez(_axes_path(path), **axes)
+    shape = tuple(axes[name].size for name in AXES) + (2,)
+    return np.lib.format.open_memmap(path, mode='w+', dtype=dtype,
+                                     shape=shape)
+
+
+def simulate_drift(duration, bal_mass, bal_diam, lat, lon, wind,
+                   payload=0.0, gas_mass=None,
+                   bal_mat='rubber', bal_gas='helium',
+                   start_time=0.0, tstep=1.0, track_step=None, atm=None):
+    """ Моделирование подъёма набора шаров с дрейфом в поле ветра
+
+    Трёхмерный вариант simulate_free_lift(): к высоте и вертикальной
+    скорости добавлены широта и долгота шара. Член набора останавливается
+    при разрыве шара, падении на землю или расходимости интегрирования.
+    ---------------------------------------------------------------------------
+    :param duration:   продолжительность моделируемого процесса, с
+    :param bal_mass:   масса метеошара, кг
+    :param bal_diam:   диаметр метеошара в состоянии без растяжения, м
+    :param lat:        широта точки запуска, град
+    :param lon:        долгота точки запуска, град
+    :param wind:       поле ветра WindField
+    :param payload:    полезная нагрузка, кг
+    :param gas_mass:   масса газа, кг. По умолчанию - по заполнению шара на
+                       высоте H=0
+    :param bal_mat:    наименование материала метеошара
+    :param bal_gas:    наименование наполняющего газа
+    :param start_time: время запуска на оси времени поля ветра, с
+    :param tstep:      шаг интегрирования, с
+    :param track_step: шаг записи траекторий, с (по умолчанию траектории
+                       не записываются)
+    :param atm:        модель атмосферы (см. BalloonStatic)
+    (bal_mass, bal_diam, lat, lon, payload, gas_mass, start_time - числа
+    или массивы, согласуемые по правилам broadcasting; форма результата -
+    их общая форма)
+    ---------------------------------------------------------------------------
+    :return:           словарь массивов:
+                       'burst_time', 'burst_alt', 'alt_max' - см.
+                       simulate_free_lift;
+                       'lat', 'lon' - широта и долгота шара в момент
+                       остановки, град (NaN - расходимость);
+                       при заданном track_step: 'track_time' - моменты
+                       записи, с; 'track_alt', 'track_lat', 'track_lon' -
+                       траектории формы (len(track_time), ...)
+    """
+    shape = np.broadcast(bal_mass, bal_diam, lat, lon, payload, start_time,
+                         0.0 if gas_mass is None else gas_mass).shape
+    members = int(np.prod(shape))
+
+    def flat(value):
+        return np.broadcast_to(value, shape).astype(float).ravel()
+
+    bal_mass, bal_diam, payload, start_time = (
+        flat(value) for value in (bal_mass, bal_diam, payload, start_time))
+    if gas_mass is not None:
+        gas_mass = flat(gas_mass)
+    balloon = _new_balloon(bal_mass, bal_diam, gas_mass, bal_mat, bal_gas,
+                           atm)
+    mass = balloon.get_mass() + payload
+    weight_payload = payload*const.g
+
+    def odefun(y, time):
+        alt, vel, lat, lon = y
+        f_sum = balloon.get_forces_sum(alt, vel) - weight_payload
+        u, v = wind.get_wind(start_time + time, alt, lat, lon)
+        rad = const.R_earth + alt
+        return np.array([vel, f_sum/mass,
+                         np.degrees(v/rad),
+                         np.degrees(u/(rad*np.cos(np.radians(lat))))])
+
+    def terminator(y, t):
+        alt = y[0]
+        vel = y[1]
+        return balloon.is_burst(alt) | (alt < 0.0) | ~(np.abs(vel) <= 150.0)
+
+    y0 = np.zeros((4, members))
+    y0[2] = flat(lat)
+    y0[3] = flat(lon)
+
+    alt_max = np.zeros(members)
+    track_every = None if track_step is None else \
+        max(int(round(track_step/tstep)), 1)
+    track_time = [0.0]
+    track = [y0[[0, 2, 3]]]
+    # Number of steps made (list to be updated in recorder())
+    steps = [0]
+
+    def recorder(y_prev, y, t_prev, t, active):
+        np.maximum(alt_max, y[0], out=alt_max)
+        steps[0] += 1
+        if track_every is not None and steps[0] % track_every == 0:
+            track_time.append(t)
+            track.append(y[[0, 2, 3]])
+
+    time_points = np.arange(0, duration, tstep)
+    with np.errstate(over='ignore', invalid='ignore'):
+        t_stop, y = integrate.rk4(odefun, y0, time_points,
+                                  terminate=terminator, callback=recorder)
+    is_valid = np.abs(y[1]) <= 150.0
+    is_burst = balloon.is_burst(y[0]) & is_valid
+    alt_max[~is_valid] = np.nan
+    res = {'burst_time': np.where(is_burst, t_stop, np.nan).reshape(shape),
+           'burst_alt': np.where(is_burst, y[0], np.nan).reshape(shape),
+           'alt_max': alt_max.reshape(shape),
+           'lat': np.where(is_valid, y[2], np.nan).reshape(shape),
+           'lon': np.where(is_valid, y[3], np.nan).reshape(shape)}
+    if track_every is not None:
+        res['track_time'] = np.array(track_time)
+        track = np.array(track)
+        for i, name in enumerate(('track_alt', 'track_lat', 'track_lon')):
+            res[name] = track[:, i].reshape((-1,) + shape)
+    return res
+
+
+def _axes_path(path):
+    return os.path.splitext(path)[0] + '.axes.npz'
+
+
+def _axis_weights(axis, x):
+    """ Индексы левых узлов оси и веса линейной интерполяции (вне оси -
+    значение на границе) """
+    i = np.clip(np.searchsorted(axis, x, side='right') - 1, 0, axis.size - 2)
+    w = np.clip((x - axis[i])/(axis[i + 1] - axis[i]), 0.0, 1.0)
+    return i, w
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
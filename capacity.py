@@ -56,6 +56,16 @@ def odefun(time, y, balloon, payload):
     return [vel, f_sum/mass]
 
 
+def jacobian(time, y, balloon, payload):
+    """ Матрица Якоби правой части odefun по состоянию [alt, vel] """
+    alt = y[0]
+    vel = y[1]
+    jac = balloon.get_forces_jacobian(alt, vel)
+    mass = balloon.get_mass() + payload
+    return [[0.0, 1.0],
+            [jac['alt']/mass, jac['vel']/mass]]
+
+
 def terminator(y, t, step_no):
     # Функция, останавливающая интегрирование при разрыве метеошара
     h = y[step_no][0]
@@ -83,8 +93,9 @@ def free_lift_scipy_ode(duration, bal_mass, bal_diam, payload, plot_save_as):
     # Create solver
     y0 = [0, 0]
     t0 = 0
-    r = ode(odefun).set_integrator('vode', method='bdf')
+    r = ode(odefun, jacobian).set_integrator('vode', method='bdf')
     r.set_initial_value(y0, t0).set_f_params(balloon, payload)
+    r.set_jac_params(balloon, payload)
     dt = 1
     while r.successful() and r.t < duration:
         r.integrate(r.t+dt)
@@ -22,3 +22,14 @@ kwargs = {'bal_mass': 3,
           'payload': 1.05,
           'plot_show': True}
 exit_code = aerospace.platform.plot_ngon(**kwargs)
+
+# Platform lift model:
+# platform lifted by a group of balloons with individual gas masses
+kwargs = {'duration': 180*60,
+          'bal_mass': 3.0,
+          'bal_diam': 2.164,
+          'nbals': 6,
+          'gas_mass': [0.8, 0.85, 0.9, 0.9, 0.95, 1.0],
+          'payload': 5.0,
+          'plot_save_as': 'example_platform.png'}
+exit_code = aerospace.platform.model_platform_lift(**kwargs)
@@ -1,6 +1,8 @@
+import os
 import sys
 # from setuptools import setup
 from distutils.core import setup
+from distutils.command.build_py import build_py
 from aerospace.version import version
 
 py_version = sys.version_info[:2]
@@ -8,13 +10,25 @@ if not py_version == (2, 7):
     raise RuntimeError('Requires Python version 2.7 but '
                        ' ({}.{} detected).'.format(*py_version))
 
+
+class BuildPy(build_py):
+    """Build also the flight envelope index of the balloon catalog"""
+    def run(self):
+        build_py.run(self)
+        if not self.dry_run:
+            from aerospace import catalog
+            catalog.build(os.path.join(self.build_lib, 'aerospace',
+                                       'catalog.npz'))
+
+
 setup(
     name='Aerospace',
+    cmdclass={'build_py': BuildPy},
     version=version,
     packages=['aerospace'],
     install_requires=[
         'matplotlib>=1.4.2',
-        'numpy>=1.9.1',
+        'numpy>=1.13.0',
         'odespy>=0.3.0'
     ],
     url='https://github.com/zokalo/aerospace',